@@ -0,0 +1,4 @@
+"""
+Benchmarks for the performance sensitive parts of sythe. Each module
+can be run directly, e.g. `python -m benchmarks.tokenizer_benchmark`
+"""
@@ -0,0 +1,60 @@
+"""
+Compares the memory held by a fleet of EC2Instances against the same
+fleet projected down to the values that the benchmark rules need, and
+as CompactEC2Instances, and the time to evaluate the rules over each
+"""
+
+import argparse
+import time
+import tracemalloc
+import sythe.parsing.strings as strings
+import sythe.analysis as analysis
+from sythe.resources.compact import CompactEC2Instance, get_fields
+from sythe.resources.ec2_resources import EC2Instance, iter_ec2_instance_pages
+from sythe.resources.ec2_resources import build_ec2_instance_projection
+from benchmarks.condition_benchmark import RULES
+from benchmarks.fleet import FakePaginatedEC2Client
+
+def measure(client, make_instance):
+    """
+    Returns the memory held by every instance the client serves, built
+    with `make_instance`, and the instances themselves
+    """
+    tracemalloc.start()
+    instances = [instance for page in iter_ec2_instance_pages(client, make_instance=make_instance)
+                 for instance in page]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, instances
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks compact instances')
+    parser.add_argument('--instances', type=int, default=200000,
+                        help='The number of instances in the fake fleet')
+    args = parser.parse_args()
+
+    rules = strings.parse_rules_from_string(RULES)
+    functions = [rule.condition.compile() for rule in rules]
+    paths = analysis.required_paths(rules, EC2Instance)
+    project = build_ec2_instance_projection(paths)
+    fields = get_fields(paths)
+    modes = [
+        ('full', EC2Instance),
+        ('projected', lambda data, client: EC2Instance(project(data), client)),
+        ('compact', lambda data, client: CompactEC2Instance(project(data), client, fields))
+    ]
+
+    print('{:>10} {:>10} {:>14}'.format('mode', 'held MiB', 'evaluation'))
+    for name, make_instance in modes:
+        client = FakePaginatedEC2Client(args.instances)
+        held, instances = measure(client, make_instance)
+        start = time.perf_counter()
+        for function in functions:
+            for instance in instances:
+                function(instance)
+        print('{:>10} {:>10.1f} {:>13.3f}s'.format(
+            name, held / 2 ** 20, time.perf_counter() - start))
+        del instances
+
+if __name__ == '__main__':
+    main()
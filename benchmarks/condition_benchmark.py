@@ -0,0 +1,85 @@
+"""
+Compares evaluating rule conditions by walking the condition
+tree against evaluating their compiled callables, against
+evaluating them a column at a time over the whole fleet, and against
+looking the instances they could match up in indexes
+"""
+
+import argparse
+import timeit
+import sythe.parsing.strings as strings
+from sythe.resources.store import IndexedRule, InventoryStore
+from sythe.resources.table import ResourceTable
+from benchmarks.fleet import generate_instances
+
+RULES = '''
+ec2_instance(State.Name = "running" & tag:team = "team-3") {}
+ec2_instance(State.Name = "stopped" | tag:env = "dev" & tag:owner = "nobody") {}
+ec2_instance((tag:env = "test" | tag:env = "qa") & LaunchIndex > 2 & State.Name = "running") {}
+'''
+
+def time_evaluation(functions, instances, repeat):
+    """
+    Returns the best time of running every function over every instance
+    """
+    def run():
+        for function in functions:
+            for instance in instances:
+                function(instance)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+def time_batch_evaluation(conditions, instances, repeat):
+    """
+    Returns the best time of evaluating every condition over a
+    table of the instances, including building the table's columns
+    """
+    def run():
+        table = ResourceTable(instances)
+        for condition in conditions:
+            condition.execute_batch(table)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+def time_indexed_evaluation(rules, instances, repeat):
+    """
+    Returns the best time of selecting the instances every rule
+    matches from a store of the instances, including building its indexes
+    """
+    indexed_rules = [IndexedRule(rule) for rule in rules]
+    def run():
+        store = InventoryStore(instances)
+        for indexed_rule in indexed_rules:
+            indexed_rule.select(store)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks condition evaluation')
+    parser.add_argument('--instances', type=int, default=100000,
+                        help='The number of instances to evaluate conditions over')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each mode')
+    args = parser.parse_args()
+
+    instances = generate_instances(args.instances)
+    rules = strings.parse_rules_from_string(RULES)
+    conditions = [rule.condition for rule in rules]
+    evaluations = len(conditions) * len(instances)
+
+    modes = [
+        ('interpreted', [condition.execute for condition in conditions]),
+        ('compiled', [condition.compile() for condition in conditions])
+    ]
+    for name, functions in modes:
+        elapsed = time_evaluation(functions, instances, args.repeat)
+        print('{:>12}: {:.4f}s ({:.0f} ns/evaluation)'.format(
+            name, elapsed, elapsed * 1e9 / evaluations))
+
+    elapsed = time_batch_evaluation(conditions, instances, args.repeat)
+    print('{:>12}: {:.4f}s ({:.0f} ns/evaluation)'.format(
+        'batch', elapsed, elapsed * 1e9 / evaluations))
+
+    elapsed = time_indexed_evaluation(rules, instances, args.repeat)
+    print('{:>12}: {:.4f}s ({:.0f} ns/evaluation)'.format(
+        'indexed', elapsed, elapsed * 1e9 / evaluations))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Generators for synthetic rule corpora over the fleets from `fleet`,
+with conditions of a given depth
+"""
+
+import random
+from benchmarks.fleet import STATES, ENVIRONMENTS, INSTANCE_TYPES
+
+COMPARISONS = [
+    lambda rand: 'State.Name = "{}"'.format(rand.choice(STATES)),
+    lambda rand: 'tag:env = "{}"'.format(rand.choice(ENVIRONMENTS)),
+    lambda rand: 'tag:team = "team-{}"'.format(rand.randint(0, 9)),
+    lambda rand: 'tag:owner = "user-{}"'.format(rand.randint(0, 99)),
+    lambda rand: 'InstanceType = "{}"'.format(rand.choice(INSTANCE_TYPES)),
+    lambda rand: 'LaunchIndex > {}'.format(rand.randint(0, 5)),
+    lambda rand: 'LaunchIndex < {}'.format(rand.randint(0, 5))
+]
+
+def generate_condition(rand, depth):
+    """
+    Generates a condition which is a tree of `&` and `|` operators
+    `depth` levels deep, with a comparison at each leaf
+    """
+    if depth <= 1:
+        return rand.choice(COMPARISONS)(rand)
+    return '({} {} {})'.format(generate_condition(rand, depth - 1), rand.choice(['&', '|']),
+                               generate_condition(rand, depth - 1))
+
+def generate_rule_corpus(count, depth, seed=0):
+    """
+    Generates a rules script of `count` rules, each with a condition
+    `depth` levels deep and a tag action
+    """
+    rand = random.Random(seed)
+    return ''.join('ec2_instance({}) {{\n    tag(key: "rule-{}", value: "matched")\n}}\n'.format(
+        generate_condition(rand, depth), i) for i in range(count))
@@ -0,0 +1,104 @@
+"""
+Generators for synthetic EC2 fleets, and a fake paginated EC2
+client that serves them, modelled on the MockEC2Client in the tests
+"""
+
+import random
+import threading
+import time
+from sythe.resources.ec2_resources import EC2Instance
+
+STATES = ['pending', 'running', 'stopping', 'stopped', 'terminated']
+ENVIRONMENTS = ['prod', 'dev', 'test', 'qa']
+INSTANCE_TYPES = ['t2.micro', 't2.large', 'm4.large', 'c4.xlarge', 'r4.2xlarge']
+
+def generate_instance_data(index, rand, extra_tags=0):
+    """
+    Generates the describe_instances payload of a single instance, with
+    a randomised state and tags. Every instance has team, env and owner
+    tags, and `extra_tags` more named label-0, label-1 and so on
+    """
+    data = {
+        'InstanceId': 'i-{:017x}'.format(index),
+        'ImageId': 'ami-{:08x}'.format(rand.randint(0, 50)),
+        'InstanceType': rand.choice(INSTANCE_TYPES),
+        'LaunchIndex': rand.randint(0, 5),
+        'PrivateIpAddress': '10.{}.{}.{}'.format(index >> 16 & 255, index >> 8 & 255, index & 255),
+        'Placement': {'AvailabilityZone': 'ap-southeast-2a', 'Tenancy': 'default'},
+        'State': {'Code': 16, 'Name': rand.choice(STATES)},
+        'SubnetId': 'subnet-{:08x}'.format(rand.randint(0, 20)),
+        'VpcId': 'vpc-{:08x}'.format(rand.randint(0, 3)),
+        'SecurityGroups': [{'GroupId': 'sg-{:08x}'.format(rand.randint(0, 100)),
+                            'GroupName': 'group'}],
+        'Tags': [
+            {'Key': 'team', 'Value': 'team-{}'.format(rand.randint(0, 9))},
+            {'Key': 'env', 'Value': rand.choice(ENVIRONMENTS)},
+            {'Key': 'owner', 'Value': 'user-{}'.format(rand.randint(0, 99))}
+        ]
+    }
+    for i in range(extra_tags):
+        data['Tags'].append({'Key': 'label-{}'.format(i),
+                             'Value': 'value-{}'.format(rand.randint(0, 9))})
+    return data
+
+def generate_instances(count, seed=0, extra_tags=0):
+    """
+    Generates `count` EC2Instances with randomised
+    states and tags
+    """
+    rand = random.Random(seed)
+    return [EC2Instance(generate_instance_data(i, rand, extra_tags), None) for i in range(count)]
+
+class FakePaginatedEC2Client(object):
+    """
+    A fake EC2 client which serves a synthetic fleet of `count`
+    instances, `page_size` at a time. Pages are generated as they're
+    asked for, so the whole fleet is never held in memory by the client
+    """
+    def __init__(self, count, page_size=1000, seed=0, extra_tags=0):
+        self.count = count
+        self.page_size = page_size
+        self.seed = seed
+        self.extra_tags = extra_tags
+        self.calls = 0
+
+    def describe_instances(self, NextToken=0): # pylint: disable=invalid-name
+        self.calls += 1
+        start = NextToken
+        end = min(start + self.page_size, self.count)
+        rand = random.Random(self.seed + start)
+        return {
+            'Reservations': [
+                {
+                    'Instances': [generate_instance_data(i, rand, self.extra_tags)
+                                  for i in range(start, end)]
+                }
+            ],
+            'NextToken': end if end < self.count else None
+        }
+
+class FakeActionEC2Client(object):
+    """
+    A fake EC2 client which counts the resources that actions are performed
+    on, taking `latency` seconds per call like a real API call would
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.resources = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def record(self, resource_ids):
+        """
+        Counts a call for the given resources, after the call's latency
+        """
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            self.resources += len(resource_ids)
+
+    def create_tags(self, Resources, Tags): # pylint: disable=invalid-name,unused-argument
+        self.record(Resources)
+
+    def terminate_instances(self, InstanceIds): # pylint: disable=invalid-name
+        self.record(InstanceIds)
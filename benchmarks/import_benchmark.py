@@ -0,0 +1,62 @@
+"""
+Measures how long starting sythe takes, using `python -X importtime`
+to break down the import time of its modules. boto3 and parsedatetime
+should only be imported once they're needed, so `--check` never imports them
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_RULES = os.path.join(ROOT, 'examples', 'delete_untagged_instances.sr')
+LAZY_MODULES = ['boto3', 'parsedatetime']
+
+def get_import_times(code):
+    """
+    Returns the cumulative import time in microseconds of every
+    module imported by running the given code in a new interpreter
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+def time_check(repeat):
+    """
+    Returns the best wall time of running `sythe.py --check` over the example rules
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'sythe.py', '--check', '--no-rule-cache', EXAMPLE_RULES],
+                       cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks startup time')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='The number of times to run sythe --check')
+    args = parser.parse_args()
+
+    cli_times = get_import_times('import sythe.cli')
+    eager_times = get_import_times('import sythe.cli, {}'.format(', '.join(LAZY_MODULES)))
+    print('import sythe.cli: {:.1f}ms'.format(cli_times['sythe.cli'] / 1000))
+    for module in LAZY_MODULES:
+        print('{:>14}: {}, {:.1f}ms when imported'.format(
+            module, 'imported' if module in cli_times else 'not imported',
+            eager_times[module] / 1000))
+    print('sythe.py --check: {:.1f}ms'.format(time_check(args.repeat) * 1000))
+
+if __name__ == '__main__':
+    main()
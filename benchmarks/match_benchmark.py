@@ -0,0 +1,66 @@
+"""
+Compares matching owners with a `~` pattern against the equivalent
+chain of | equalities, with and without the literal prefix pre-check,
+and against looking the pattern up in an index of the fleet
+"""
+
+import argparse
+import timeit
+import sythe.parsing.optimizer as optimizer
+import sythe.parsing.strings as strings
+from sythe.resources.store import IndexedRule, InventoryStore
+from benchmarks.fleet import generate_instances
+
+#Owners user-40 to user-49, as a pattern and as the equivalent equalities.
+#The group hides the pattern's prefix, so it has no pre-check
+PATTERN = '^user-4[0-9]$'
+UNPREFIXED_PATTERN = '^(?:user-4)[0-9]$'
+OWNERS = ['user-{}'.format(i) for i in range(40, 50)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks pattern matching')
+    parser.add_argument('--instances', type=int, default=50000,
+                        help='The number of instances to match')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each mode')
+    args = parser.parse_args()
+
+    chain = ' | '.join('tag:owner = "{}"'.format(owner) for owner in OWNERS)
+    rules = strings.parse_rules_from_string(''.join(
+        'ec2_instance({}) {{}}\n'.format(condition) for condition in [
+            chain, 'tag:owner ~ "{}"'.format(PATTERN), 'tag:owner ~ "{}"'.format(UNPREFIXED_PATTERN)
+        ]
+    ))
+    chain_condition, pattern_condition, unprefixed_condition = [rule.condition for rule in rules]
+    instances = generate_instances(args.instances)
+
+    modes = [
+        ('or chain', chain_condition),
+        ('in list', optimizer.optimize(chain_condition)),
+        ('pattern', pattern_condition),
+        ('no prefix', unprefixed_condition)
+    ]
+    expected = None
+    for name, condition in modes:
+        function = condition.compile()
+        def run():
+            return [instance for instance in instances if function(instance)]
+        matched = run()
+        if expected is not None and matched != expected:
+            raise AssertionError('{} matched differently'.format(name))
+        expected = matched
+        elapsed = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{:>12}: {:.4f}s ({:.0f} ns/instance)'.format(
+            name, elapsed, elapsed * 1e9 / len(instances)))
+
+    indexed_rule = IndexedRule(rules[1])
+    def run_indexed():
+        return indexed_rule.select(InventoryStore(instances))
+    if run_indexed() != expected:
+        raise AssertionError('indexed matched differently')
+    elapsed = min(timeit.repeat(run_indexed, number=1, repeat=args.repeat))
+    print('{:>12}: {:.4f}s ({:.0f} ns/instance, including building the index)'.format(
+        'indexed', elapsed, elapsed * 1e9 / len(instances)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares evaluating an allow-list written as a chain of | equalities
+against the same allow-list as an `in` list, and against the chain
+once the optimizer has rewritten it into an `in` list
+"""
+
+import argparse
+import timeit
+import sythe.parsing.optimizer as optimizer
+import sythe.parsing.strings as strings
+from benchmarks.fleet import generate_instances
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks set membership')
+    parser.add_argument('--values', type=int, default=300,
+                        help='The number of owners in the allow-list')
+    parser.add_argument('--instances', type=int, default=20000,
+                        help='The number of instances to evaluate the rule over')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each mode')
+    args = parser.parse_args()
+
+    owners = ['"user-{}"'.format(i) for i in range(0, args.values * 2, 2)]
+    chain = ' | '.join('tag:owner = {}'.format(owner) for owner in owners)
+    listed = 'tag:owner in [{}]'.format(', '.join(owners))
+    chain_condition, list_condition = [
+        rule.condition for rule in strings.parse_rules_from_string(
+            'ec2_instance({}) {{}}\nec2_instance({}) {{}}'.format(chain, listed)
+        )
+    ]
+    instances = generate_instances(args.instances)
+
+    modes = [
+        ('or chain', chain_condition),
+        ('in list', list_condition),
+        ('rewritten', optimizer.optimize(chain_condition))
+    ]
+    for name, condition in modes:
+        function = condition.compile()
+        def run():
+            for instance in instances:
+                function(instance)
+        elapsed = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{:>12}: {:.4f}s ({:.0f} ns/evaluation)'.format(
+            name, elapsed, elapsed * 1e9 / len(instances)))
+
+if __name__ == '__main__':
+    main()
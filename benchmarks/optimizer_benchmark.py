@@ -0,0 +1,55 @@
+"""
+Compares evaluating the compiled conditions of a rule corpus as written
+against evaluating them after optimizing, with static estimates and
+with match rates measured on a sample of the fleet
+"""
+
+import argparse
+import timeit
+import sythe.parsing.optimizer as optimizer
+import sythe.parsing.strings as strings
+from sythe.resources.ec2_resources import EC2_INSTANCE_FILTERS
+from benchmarks.corpus import generate_rule_corpus
+from benchmarks.fleet import generate_instances
+
+#How many instances match rates are measured on
+SAMPLE_SIZE = 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks condition optimization')
+    parser.add_argument('--rules', type=int, default=100,
+                        help='The number of rules to evaluate')
+    parser.add_argument('--depth', type=int, default=4,
+                        help='The depth of rule conditions')
+    parser.add_argument('--instances', type=int, default=10000,
+                        help='The number of instances to evaluate rules over')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each mode')
+    args = parser.parse_args()
+
+    instances = generate_instances(args.instances)
+    conditions = [rule.condition for rule in strings.parse_rules_from_string(
+        generate_rule_corpus(args.rules, args.depth)
+    )]
+    match_rates = optimizer.measure_match_rates(conditions, instances[:SAMPLE_SIZE])
+
+    modes = [
+        ('as written', conditions),
+        ('static', [optimizer.optimize(condition, known_variables=EC2_INSTANCE_FILTERS)
+                    for condition in conditions]),
+        ('measured', [optimizer.optimize(condition, match_rates,
+                                         known_variables=EC2_INSTANCE_FILTERS)
+                      for condition in conditions])
+    ]
+    for name, mode_conditions in modes:
+        functions = [condition.compile() for condition in mode_conditions]
+        def run():
+            for function in functions:
+                for instance in instances:
+                    function(instance)
+        elapsed = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{:>12}: {:.4f}s ({:.0f} ns/evaluation)'.format(
+            name, elapsed, elapsed * 1e9 / (len(functions) * len(instances))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Measures how parsing scales with the number of rules in a script.
+Time per rule should stay flat as the script grows
+"""
+
+import argparse
+import timeit
+import sythe.parsing.strings as strings
+import sythe.parsing.tokenizer as tokenizer
+import sythe.resources.ec2_resources # pylint: disable=unused-import
+from benchmarks.tokenizer_benchmark import RULE_TEMPLATE
+
+RULE_COUNTS = [10, 100, 1000, 10000, 50000]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the rule parser')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each size')
+    args = parser.parse_args()
+
+    print('{:>8} {:>10} {:>10} {:>10}'.format('rules', 'tokens', 'parse', 'us/rule'))
+    for count in RULE_COUNTS:
+        rules = ''.join(RULE_TEMPLATE.format(i) for i in range(count))
+        tokens = tokenizer.tokenize_string(rules)
+        elapsed = min(timeit.repeat(
+            lambda: strings.parse_rules_from_string(rules), number=1, repeat=args.repeat
+        ))
+        print('{:>8} {:>10} {:>10} {:>10}'.format(
+            count, len(tokens), '{:.4f}s'.format(elapsed),
+            '{:.1f}'.format(elapsed * 1e6 / count)))
+
+if __name__ == '__main__':
+    main()
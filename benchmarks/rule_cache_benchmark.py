@@ -0,0 +1,46 @@
+"""
+Compares starting up with a cold rule cache, which tokenizes and
+parses the rules script and caches the rules, against a warm one,
+which loads the parsed rules from the cache
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import sythe.fileio as fileio
+import sythe.resources.ec2_resources # pylint: disable=unused-import
+from benchmarks.tokenizer_benchmark import RULE_TEMPLATE
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the parsed rule cache')
+    parser.add_argument('--rules', type=int, default=10000,
+                        help='The number of rules in the script')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to start up with each cache')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        rules_path = os.path.join(directory, 'rules.sr')
+        with open(rules_path, 'w') as rules_file:
+            rules_file.write(''.join(RULE_TEMPLATE.format(i) for i in range(args.rules)))
+
+        cold = []
+        warm = []
+        for i in range(args.repeat):
+            cache_dir = os.path.join(directory, 'cache-{}'.format(i))
+            for times in (cold, warm):
+                start = time.perf_counter()
+                fileio.parse_rules_from_file(rules_path, cache_dir)
+                times.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory)
+
+    print('{:>6} {:>10} {:>10}'.format('cache', 'startup', 'us/rule'))
+    for name, times in [('cold', cold), ('warm', warm)]:
+        print('{:>6} {:>9.4f}s {:>10.1f}'.format(name, min(times), min(times) * 1e6 / args.rules))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares evaluating many rules which share predicates one rule at a
+time against evaluating them together as a RuleSet
+"""
+
+import argparse
+import timeit
+import sythe.parsing.strings as strings
+from sythe.ruleset import RuleSet
+from benchmarks.fleet import generate_instances, ENVIRONMENTS
+
+RULE_TEMPLATE = 'ec2_instance(State.Name = "running" & tag:env = "{}" & tag:team = "team-{}") {{}}\n'
+
+def generate_rules(count):
+    """
+    Generates `count` rules, which all share their state predicate
+    and share their environment predicate with a quarter of the others
+    """
+    return ''.join(RULE_TEMPLATE.format(ENVIRONMENTS[i % len(ENVIRONMENTS)], i)
+                   for i in range(count))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks shared rule evaluation')
+    parser.add_argument('--rules', type=int, default=300,
+                        help='The number of rules to evaluate')
+    parser.add_argument('--instances', type=int, default=2000,
+                        help='The number of instances to evaluate rules over')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each mode')
+    args = parser.parse_args()
+
+    instances = generate_instances(args.instances)
+    rules = strings.parse_rules_from_string(generate_rules(args.rules))
+    functions = [rule.condition.compile() for rule in rules]
+    rule_set = RuleSet(rules)
+    print('Deduplicated {} of {} predicates'.format(
+        rule_set.deduplicated, rule_set.predicate_count))
+
+    def run_compiled():
+        for function in functions:
+            for instance in instances:
+                function(instance)
+
+    def run_shared():
+        for instance in instances:
+            rule_set.matching_rules(instance)
+
+    for name, run in [('compiled', run_compiled), ('shared', run_shared)]:
+        elapsed = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{:>12}: {:.4f}s ({:.0f} ns/rule/instance)'.format(
+            name, elapsed, elapsed * 1e9 / (len(rules) * len(instances))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the peak memory and time to first evaluation of fetching the
+whole fleet before applying rules, against applying rules to each
+page of the fleet as it arrives
+"""
+
+import argparse
+import time
+import tracemalloc
+import sythe.discovery as discovery
+import sythe.parsing.strings as strings
+from sythe.cli import apply_rules
+from sythe.resources.ec2_resources import get_ec2_instances, iter_ec2_instance_pages
+from benchmarks.condition_benchmark import RULES
+from benchmarks.fleet import FakePaginatedEC2Client
+
+def run_collected(client, rules, on_first_page):
+    """
+    Fetches every instance, then applies the rules to them all
+    """
+    instances = get_ec2_instances(client)
+    on_first_page()
+    apply_rules(rules, instances, 'compiled')
+
+def run_streaming(client, rules, on_first_page):
+    """
+    Applies the rules to each page of instances as it's fetched
+    """
+    pages = discovery.discover_resource_pages(
+        iter_ec2_instance_pages, discovery.get_targets([None], ['fake']), lambda target: client
+    )
+    for page in pages:
+        on_first_page()
+        apply_rules(rules, page, 'compiled')
+
+def measure(run, client, rules):
+    """
+    Returns the peak traced memory, time to first evaluation
+    and total time of the given run function
+    """
+    first_page = []
+    start = time.perf_counter()
+    def on_first_page():
+        if not first_page:
+            first_page.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(client, rules, on_first_page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, first_page[0], time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks streaming evaluation')
+    parser.add_argument('--instances', type=int, default=500000,
+                        help='The number of instances in the fake fleet')
+    parser.add_argument('--page-size', type=int, default=1000,
+                        help='The number of instances in each page')
+    args = parser.parse_args()
+
+    rules = strings.parse_rules_from_string(RULES)
+    for rule in rules:
+        rule.compile()
+
+    print('{:>10} {:>12} {:>14} {:>10}'.format('mode', 'peak MiB', 'first page', 'total'))
+    for name, run in [('collected', run_collected), ('streaming', run_streaming)]:
+        client = FakePaginatedEC2Client(args.instances, args.page_size)
+        peak, first_page, total = measure(run, client, rules)
+        print('{:>10} {:>12.1f} {:>13.3f}s {:>9.2f}s'.format(
+            name, peak / 2 ** 20, first_page, total))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Runs a benchmark of each stage of a run, over a synthetic fleet and rule
+corpus: tokenizing, parsing, evaluating conditions, discovering resources
+and dispatching actions. Results are throughputs, so higher is better, and
+can be written to a baseline file and compared against it on later commits
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import sythe.discovery as discovery
+import sythe.parsing.nodes as nodes
+import sythe.parsing.strings as strings
+import sythe.parsing.tokenizer as tokenizer
+from sythe.batching import BatchingEC2Client
+from sythe.executor import ActionExecutor
+from sythe.resources.ec2_resources import iter_ec2_instance_pages
+from sythe.resources.store import IndexedRule, InventoryStore
+from sythe.resources.table import ResourceTable
+from sythe.ruleset import RuleSet
+from benchmarks.corpus import generate_rule_corpus
+from benchmarks.fleet import FakeActionEC2Client, FakePaginatedEC2Client, generate_instances
+
+PRESETS = {
+    'small': {'instances': 10000, 'rules': 100, 'depth': 3, 'extra_tags': 2},
+    'medium': {'instances': 100000, 'rules': 300, 'depth': 4, 'extra_tags': 5},
+    'large': {'instances': 1000000, 'rules': 1000, 'depth': 5, 'extra_tags': 10}
+}
+
+#The most instances that conditions are evaluated over and actions are
+#dispatched for, so that large fleets and corpora finish in reasonable time
+SAMPLE_SIZE = 10000
+
+#How many times slower than the baseline a result can be before it's a regression
+DEFAULT_THRESHOLD = 0.1
+
+def best_time(run, repeat):
+    """
+    Returns the best time in seconds of calling `run` `repeat` times
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def benchmark_tokenizer(text, repeat):
+    """
+    Returns how many bytes of rules are tokenized per second
+    """
+    return len(text) / best_time(lambda: tokenizer.tokenize_string(text), repeat)
+
+def benchmark_parser(text, repeat):
+    """
+    Returns how many rules are parsed per second from already tokenized rules
+    """
+    tokens = tokenizer.tokenize_string(text)
+    def parse():
+        stream = tokenizer.TokenStream(tokens)
+        rules = []
+        while len(stream) > 0:
+            rules.append(nodes.RuleNode(stream))
+        return rules
+    return len(parse()) / best_time(parse, repeat)
+
+def benchmark_evaluation(rules, instances, repeat):
+    """
+    Returns how many rule evaluations per second each evaluation mode manages
+    """
+    evaluations = len(rules) * len(instances)
+    functions = [rule.condition.compile() for rule in rules]
+    rule_set = RuleSet(rules)
+    indexed_rules = [IndexedRule(rule) for rule in rules]
+
+    def run_compiled():
+        for function in functions:
+            for instance in instances:
+                try:
+                    function(instance)
+                except TypeError:
+                    pass
+
+    def run_shared():
+        for instance in instances:
+            try:
+                rule_set.matching_rules(instance)
+            except TypeError:
+                pass
+
+    def run_batch():
+        table = ResourceTable(instances)
+        for rule in rules:
+            try:
+                rule.condition.execute_batch(table)
+            except TypeError:
+                pass
+
+    def run_indexed():
+        store = InventoryStore(instances)
+        for indexed_rule in indexed_rules:
+            try:
+                indexed_rule.select(store)
+            except TypeError:
+                pass
+
+    return {
+        'evaluation_compiled_per_second': evaluations / best_time(run_compiled, repeat),
+        'evaluation_shared_per_second': evaluations / best_time(run_shared, repeat),
+        'evaluation_batch_per_second': evaluations / best_time(run_batch, repeat),
+        'evaluation_indexed_per_second': evaluations / best_time(run_indexed, repeat)
+    }
+
+def benchmark_discovery(instances, extra_tags, targets, repeat):
+    """
+    Returns how many resources per second are discovered from fake
+    paginated clients, with the fleet spread over the given number of targets
+    """
+    discovery_targets = discovery.get_targets([None], ['region-{}'.format(i) for i in range(targets)])
+    def discover():
+        clients = dict((target, FakePaginatedEC2Client(instances // targets, seed=i,
+                                                       extra_tags=extra_tags))
+                       for i, target in enumerate(discovery_targets))
+        for _ in discovery.discover_resource_pages(iter_ec2_instance_pages, discovery_targets,
+                                                   clients.__getitem__):
+            pass
+    return (instances // targets * targets) / best_time(discover, repeat)
+
+def benchmark_dispatch(instances, workers, latency, repeat):
+    """
+    Returns how many tag actions per second are dispatched through the
+    action executor and batched into calls to a fake client
+    """
+    action = strings.parse_rules_from_string(
+        'ec2_instance(true) { tag(key: "benchmark", value: "yes") }'
+    )[0].actions[0]
+    def dispatch():
+        client = BatchingEC2Client(FakeActionEC2Client(latency))
+        executor = ActionExecutor(workers)
+        for instance in instances:
+            instance.client = client
+            executor.submit(None, instance, action)
+        executor.shutdown()
+        client.flush()
+    return len(instances) / best_time(dispatch, repeat)
+
+def get_commit():
+    """
+    Returns the commit the benchmarks are being run on, if it's known
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], universal_newlines=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(parameters, repeat):
+    """
+    Runs every benchmark with the given parameters, returning their results
+    """
+    text = generate_rule_corpus(parameters['rules'], parameters['depth'])
+    rules = strings.parse_rules_from_string(text)
+    sample = generate_instances(min(parameters['instances'], SAMPLE_SIZE),
+                                extra_tags=parameters['extra_tags'])
+
+    results = {
+        'tokenizer_bytes_per_second': benchmark_tokenizer(text, repeat),
+        'parser_rules_per_second': benchmark_parser(text, repeat)
+    }
+    results.update(benchmark_evaluation(rules, sample, repeat))
+    results['discovery_resources_per_second'] = benchmark_discovery(
+        parameters['instances'], parameters['extra_tags'], parameters['targets'], repeat
+    )
+    results['dispatch_actions_per_second'] = benchmark_dispatch(
+        sample, parameters['workers'], parameters['latency'], repeat
+    )
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Prints each result against its baseline, returning the names
+    of the results that are more than `threshold` slower
+    """
+    regressions = []
+    print('{:>34} {:>14} {:>14} {:>8}'.format('benchmark', 'baseline', 'current', 'ratio'))
+    for name, value in sorted(results.items()):
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print('{:>34} {:>14} {:>14.1f} {:>8}'.format(name, '-', value, '-'))
+            continue
+        ratio = value / previous
+        flag = ''
+        if ratio < 1 - threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('{:>34} {:>14.1f} {:>14.1f} {:>7.2f}x{}'.format(name, previous, value, ratio, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                        help='The size of the fleet and rule corpus')
+    parser.add_argument('--instances', type=int, help='Overrides the size of the fleet')
+    parser.add_argument('--rules', type=int, help='Overrides the number of rules')
+    parser.add_argument('--depth', type=int, help='Overrides the depth of rule conditions')
+    parser.add_argument('--extra-tags', type=int,
+                        help='Overrides the number of extra tags on each instance')
+    parser.add_argument('--targets', type=int, default=4,
+                        help='The number of regions to spread the fleet over for discovery')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='The number of threads to dispatch actions on')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='The seconds each fake action API call takes')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each benchmark')
+    parser.add_argument('--output', help='A file to write the results to, as a baseline')
+    parser.add_argument('--compare', help='A baseline file to compare the results against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='How much slower than the baseline a result can be, as a '
+                             'fraction, before it counts as a regression')
+    args = parser.parse_args()
+
+    parameters = dict(PRESETS[args.preset])
+    for name in ['instances', 'rules', 'depth', 'extra_tags']:
+        if getattr(args, name) is not None:
+            parameters[name] = getattr(args, name)
+    parameters.update(targets=args.targets, workers=args.workers, latency=args.latency)
+
+    results = run_suite(parameters, args.repeat)
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'parameters': parameters,
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('parameters') != parameters:
+            print('Warning: the baseline was run with different parameters')
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        for name, value in sorted(results.items()):
+            print('{:>34} {:>14.1f}'.format(name, value))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures how the tokenizer scales with the size of the rules script.
+Time per byte should stay flat as the input grows from 1KB to 10MB
+"""
+
+import argparse
+import timeit
+import regex
+from sythe.parsing import tokenizer
+
+RULE_TEMPLATE = '''ec2_instance(State.Name = "stopped" & tag:team = "team-{0}" | tag:Name = "a (b) {0}") {{
+    mark_for_deletion(after: "3 days, 2 hours")
+    notify(transport: "ses", to: tag:owner, from: "sythe@company.com")
+}}
+'''
+
+SIZES = [1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+def legacy_tokenize_string(string):
+    """
+    The lookahead based splitter that the single pass
+    tokenizer replaced, kept here for comparison
+    """
+    split_anchors = [r'\s+(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)',
+                     r'(?=[()\[\]{};=&\|,])(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)',
+                     r'(?<=[()\[\]{};=&\|,])(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)']
+    border_regex = '|'.join(split_anchors)
+    tokens = regex.split(border_regex, string, flags=regex.VERSION1)
+    return [token for token in tokens if token]
+
+def generate_rules(size):
+    """
+    Generates a rules script of at least the given size in bytes
+    """
+    rules = []
+    length = 0
+    i = 0
+    while length < size:
+        rule = RULE_TEMPLATE.format(i)
+        rules.append(rule)
+        length += len(rule)
+        i += 1
+    return ''.join(rules)
+
+def time_tokenizer(function, rules, repeat):
+    """
+    Returns the best time of `repeat` runs of the given tokenizer
+    """
+    return min(timeit.repeat(lambda: function(rules), number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the rule tokenizer')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each size')
+    parser.add_argument('--legacy-limit', type=int, default=100 * 1024,
+                        help='The largest input to run the legacy tokenizer over')
+    args = parser.parse_args()
+
+    print('{:>10} {:>12} {:>10} {:>12} {:>10}'.format(
+        'bytes', 'single-pass', 'ns/byte', 'legacy', 'ns/byte'))
+    for size in SIZES:
+        rules = generate_rules(size)
+        assert size > args.legacy_limit or \
+            tokenizer.tokenize_string(rules) == legacy_tokenize_string(rules)
+
+        elapsed = time_tokenizer(tokenizer.tokenize_string, rules, args.repeat)
+        legacy = ''
+        legacy_per_byte = ''
+        if size <= args.legacy_limit:
+            legacy_elapsed = time_tokenizer(legacy_tokenize_string, rules, args.repeat)
+            legacy = '{:.4f}s'.format(legacy_elapsed)
+            legacy_per_byte = '{:.1f}'.format(legacy_elapsed * 1e9 / len(rules))
+        print('{:>10} {:>12} {:>10} {:>12} {:>10}'.format(
+            len(rules), '{:.4f}s'.format(elapsed),
+            '{:.1f}'.format(elapsed * 1e9 / len(rules)), legacy, legacy_per_byte))
+
+if __name__ == '__main__':
+    main()
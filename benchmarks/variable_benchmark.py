@@ -0,0 +1,58 @@
+"""
+Compares looking up variables in resources with getters built
+once at parse time against splitting and walking the variable's
+path on every lookup, as VariableNode used to
+"""
+
+import argparse
+import timeit
+import sythe.parsing.errors as errors
+import sythe.parsing.nodes as nodes
+from benchmarks.fleet import generate_instances
+
+PATHS = ['tag:team', 'State.Name', 'Placement.Missing.Key']
+
+def legacy_execute(variable_name, resource):
+    """
+    The per-lookup path walking that VariableNode used to do
+    """
+    path = variable_name.split('.')
+    value = resource
+    for path_item in path:
+        try:
+            value = value[path_item]
+        except KeyError:
+            value = None
+            break
+
+    allowed_types = (str, int, bool, type(None))
+    if isinstance(value, allowed_types):
+        return value
+    else:
+        raise errors.ParsingError('Unknown datatype: {}'.format(type(value)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks variable lookups')
+    parser.add_argument('--instances', type=int, default=100000,
+                        help='The number of instances to look variables up in')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times to run each path')
+    args = parser.parse_args()
+
+    instances = generate_instances(args.instances)
+    print('{:>24} {:>14} {:>14}'.format('path', 'before ns/op', 'after ns/op'))
+    for path in PATHS:
+        node = nodes.VariableNode(path)
+        before = min(timeit.repeat(
+            lambda: [legacy_execute(path, instance) for instance in instances],
+            number=1, repeat=args.repeat
+        ))
+        after = min(timeit.repeat(
+            lambda: [node.execute(instance) for instance in instances],
+            number=1, repeat=args.repeat
+        ))
+        print('{:>24} {:>14.0f} {:>14.0f}'.format(
+            path, before * 1e9 / len(instances), after * 1e9 / len(instances)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+This module works out which values of resources parsed rules need, so that
+everything else can be dropped as soon as resources are fetched
+"""
+
+import sythe.parsing.nodes as nodes
+
+def get_referenced_variables(nodes_to_search):
+    """
+    Returns the names of every variable referenced in the given nodes,
+    sorted so they can be compared between runs
+    """
+    names = set()
+    stack = list(nodes_to_search)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, nodes.VariableNode):
+            names.add(node.variable_name)
+        stack.extend(node.children())
+    return sorted(names)
+
+def get_rule_variables(rules):
+    """
+    Returns the names of every variable referenced in the conditions
+    and action arguments of the given rules
+    """
+    return get_referenced_variables(
+        [rule.condition for rule in rules] +
+        [argument for rule in rules for action in rule.actions
+         for argument in action.arguments.values()]
+    )
+
+def required_paths(rules, resource_class):
+    """
+    Returns the paths of keys, e.g. `('State', 'Name')`, of every value that
+    the given rules need from resources of the given class. That's every
+    variable the rules reference, the key that identifies the resources,
+    and any variables that the rules' actions look up themselves
+    """
+    names = set(get_rule_variables(rules))
+    if resource_class.id_key is not None:
+        names.add(resource_class.id_key)
+    for rule in rules:
+        for action in rule.actions:
+            names.update(resource_class.action_variables.get(action.action_name, ()))
+    return frozenset(nodes.VariableNode(name).path for name in names)
+
+def build_path_tree(paths):
+    """
+    Builds a tree of the given paths, as nested dicts of keys. A key maps to
+    None when the whole value under it is needed, e.g. both `('State',)` and
+    `('State', 'Name')` give `{'State': None}`
+    """
+    tree = {}
+    for path in sorted(paths, key=len):
+        subtree = tree
+        for key in path[:-1]:
+            if subtree.get(key, {}) is None:
+                break
+            subtree = subtree.setdefault(key, {})
+        else:
+            subtree[path[-1]] = None
+    return tree
+
+def project(value, tree):
+    """
+    Returns a copy of the given value with only the keys in the given path
+    tree. Values that aren't dicts can't be looked into, so are kept whole
+    """
+    if tree is None or not isinstance(value, dict):
+        return value
+    return dict((key, project(value[key], subtree))
+                for key, subtree in tree.items() if key in value)
@@ -1,4 +1,14 @@
-import boto3
+DEFAULT_REGION = 'ap-southeast-2'
 
-def get_ec2_client():
-    return boto3.client('ec2', region_name='ap-southeast-2')
+def get_ec2_client(region_name=DEFAULT_REGION, profile_name=None):
+    """
+    Returns an EC2 client for the given region, using the
+    credentials of the given profile if one is given. Every client
+    gets a session of its own, since clients are created on many
+    threads at once and boto3 sessions aren't thread safe
+    """
+    #boto3 takes longer to import than the rest of sythe put together,
+    #so it's only imported once a client is actually needed
+    import boto3.session
+    session = boto3.session.Session(profile_name=profile_name)
+    return session.client('ec2', region_name=region_name)
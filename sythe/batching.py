@@ -0,0 +1,114 @@
+"""
+This module provides a wrapper around EC2 clients which coalesces the
+calls that actions make for individual resources into as few API calls
+as possible
+"""
+
+from collections import namedtuple, OrderedDict
+import threading
+from sythe.ratelimit import get_error_code
+
+#The most resource IDs to send in a single API call
+MAX_BATCH_SIZE = 1000
+
+#Prefixes of the error codes AWS uses to say that some of the resources in
+#a call can't have the operation performed on them, rather than that the
+#call as a whole failed, e.g. because it was throttled
+RESOURCE_ERROR_PREFIXES = ('InvalidInstanceID.', 'InvalidID', 'IncorrectInstanceState',
+                           'OperationNotPermitted')
+
+#The outcome of a queued operation on a single resource.
+#`error` is None if the operation succeeded
+ActionResult = namedtuple('ActionResult', ['operation', 'resource_id', 'error'])
+
+def freeze(value):
+    """
+    Converts the given API arguments into a hashable value, so that
+    calls with identical arguments can be grouped together
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class BatchingEC2Client(object):
+    """
+    Wraps an EC2 client, queueing `create_tags`, `delete_tags` and
+    `terminate_instances` calls rather than making them. Queued calls with
+    identical arguments, other than the resources they apply to, are made
+    together in as few calls as possible by `flush`. Everything else is
+    passed straight through to the wrapped client
+    """
+    def __init__(self, client, max_batch_size=MAX_BATCH_SIZE):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def create_tags(self, Resources, Tags): # pylint: disable=invalid-name
+        self.queue('create_tags', 'Resources', Resources, {'Tags': Tags})
+
+    def delete_tags(self, Resources, Tags=None): # pylint: disable=invalid-name
+        arguments = {} if Tags is None else {'Tags': Tags}
+        self.queue('delete_tags', 'Resources', Resources, arguments)
+
+    def terminate_instances(self, InstanceIds): # pylint: disable=invalid-name
+        self.queue('terminate_instances', 'InstanceIds', InstanceIds, {})
+
+    def queue(self, operation, ids_argument, resource_ids, arguments):
+        """
+        Queues a call to the given operation for the given resource IDs. The IDs
+        are passed in the `ids_argument` argument, along with `arguments`
+        """
+        key = (operation, freeze(arguments))
+        with self.lock:
+            if key not in self.pending:
+                self.pending[key] = (ids_argument, arguments, OrderedDict())
+            for resource_id in resource_ids:
+                self.pending[key][2][resource_id] = True
+
+    def flush(self):
+        """
+        Makes every queued call, grouping calls with identical arguments
+        into chunks of at most `max_batch_size` resources. If a chunk fails
+        because of some of its resources, it's split in half and each half is
+        retried, to find which ones failed. If it fails for any other reason,
+        every resource in it is reported as failing without being retried
+        Returns:
+            A list of ActionResults, one per resource per queued operation
+        """
+        with self.lock:
+            pending = self.pending
+            self.pending = OrderedDict()
+
+        results = []
+        for (operation, _), (ids_argument, arguments, resource_ids) in pending.items():
+            resource_ids = list(resource_ids)
+            for start in range(0, len(resource_ids), self.max_batch_size):
+                chunk = resource_ids[start:start + self.max_batch_size]
+                results.extend(self.call(operation, ids_argument, arguments, chunk))
+        return results
+
+    def call(self, operation, ids_argument, arguments, resource_ids):
+        """
+        Calls the given operation on the wrapped client for the given
+        resource IDs, returning an ActionResult for each
+        """
+        call_arguments = dict(arguments)
+        call_arguments[ids_argument] = resource_ids
+        try:
+            getattr(self.client, operation)(**call_arguments)
+        except Exception as err: # pylint: disable=broad-except
+            code = get_error_code(err)
+            if len(resource_ids) == 1 or code is None or \
+               not code.startswith(RESOURCE_ERROR_PREFIXES):
+                return [ActionResult(operation, resource_id, err)
+                        for resource_id in resource_ids]
+            middle = len(resource_ids) // 2
+            return self.call(operation, ids_argument, arguments, resource_ids[:middle]) + \
+                self.call(operation, ids_argument, arguments, resource_ids[middle:])
+        return [ActionResult(operation, resource_id, None) for resource_id in resource_ids]
@@ -0,0 +1,150 @@
+"""
+This module provides a local cache of the resources in each region of each
+account, so that repeated runs, and runs while writing rules, don't
+have to fetch every resource from AWS again
+"""
+
+import json
+import os
+import time
+
+DEFAULT_TTL = 600
+DEFAULT_PAGE_SIZE = 1000
+
+#How the cache is used. USE serves resources from the cache while they're
+#fresher than the TTL, REFRESH always fetches resources and caches them, and
+#OFFLINE only ever serves resources from the cache, however old they are
+USE = 'use'
+REFRESH = 'refresh'
+OFFLINE = 'offline'
+MODES = [USE, REFRESH, OFFLINE]
+
+#The account name used in paths for the default credentials
+DEFAULT_ACCOUNT = 'default'
+
+class CacheMissError(Exception):
+    """
+    Raised when resources that aren't cached are needed offline
+    """
+    pass
+
+def get_record(resource):
+    """
+    Returns what to cache for the given resource, which is its data without
+    the `tag:` keys that resources add, since those are added again on loading
+    """
+    return dict((key, value) for key, value in resource.data.items()
+                if not key.startswith('tag:'))
+
+def get_mode(mode, rules):
+    """
+    Returns the mode to use the cache in for the given rules. Cached resources
+    don't show what actions have done to them since they were fetched, e.g. the
+    tag that mark_for_deletion sets, so using them would perform actions again
+    on every run within the TTL. Rules with actions always fetch resources instead
+    """
+    if mode == USE and any(rule.actions for rule in rules):
+        return REFRESH
+    return mode
+
+class InventoryCache(object):
+    """
+    A cache of the resources of one type, in a directory with a JSON lines
+    segment per region of each account. The first line of each segment
+    records when it was fetched, and every following line is the data of one
+    resource. Values which aren't JSON types, like datetimes, are cached as strings
+    """
+    def __init__(self, directory, resource_type, resource_class, ttl=DEFAULT_TTL,
+                 mode=USE, clock=time.time, page_size=DEFAULT_PAGE_SIZE):
+        self.directory = directory
+        self.resource_type = resource_type
+        self.resource_class = resource_class
+        self.ttl = ttl
+        self.mode = mode
+        self.clock = clock
+        self.page_size = page_size
+
+    def get_segment_path(self, target):
+        """
+        Returns the path of the segment of the given DiscoveryTarget
+        """
+        return os.path.join(self.directory, target.account or DEFAULT_ACCOUNT,
+                            target.region, '{}.jsonl'.format(self.resource_type))
+
+    def get_fetched_at(self, target):
+        """
+        Returns when the segment of the given DiscoveryTarget was
+        fetched, or None if it isn't cached
+        """
+        try:
+            with open(self.get_segment_path(target), 'r') as segment:
+                return json.loads(segment.readline())['fetched_at']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def is_fresh(self, target):
+        """
+        Returns whether the segment of the given DiscoveryTarget is younger than the TTL
+        """
+        fetched_at = self.get_fetched_at(target)
+        return fetched_at is not None and self.clock() - fetched_at < self.ttl
+
+    def pages(self, target, fetch_pages, client_factory):
+        """
+        Returns the pages of resources in the given DiscoveryTarget, from the
+        cache if the mode allows it and from `fetch_pages` otherwise. Fetched
+        pages are cached as they're consumed. Offline, resources have no client
+        """
+        if self.mode == OFFLINE:
+            if self.get_fetched_at(target) is None:
+                raise CacheMissError('No cached {} resources in {}'.format(
+                    self.resource_type, self.get_segment_path(target)
+                ))
+            return self.read_pages(target, None)
+        client = client_factory(target)
+        if self.mode == USE and self.is_fresh(target):
+            return self.read_pages(target, client)
+        return self.write_pages(target, fetch_pages(client))
+
+    def read_pages(self, target, client):
+        """
+        Yields the cached resources of the given DiscoveryTarget a page at a time
+        """
+        with open(self.get_segment_path(target), 'r') as segment:
+            segment.readline()
+            page = []
+            for line in segment:
+                page.append(self.resource_class(json.loads(line), client))
+                if len(page) == self.page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+    def write_pages(self, target, pages):
+        """
+        Yields the given pages of resources, caching them for the given
+        DiscoveryTarget. The segment is only replaced once every page has
+        been consumed, so stopping early leaves the cache as it was
+        """
+        path = self.get_segment_path(target)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        completed = False
+        try:
+            with open(temp_path, 'w') as segment:
+                segment.write(json.dumps({'fetched_at': self.clock()}))
+                segment.write('\n')
+                for page in pages:
+                    for resource in page:
+                        segment.write(json.dumps(get_record(resource), default=str))
+                        segment.write('\n')
+                    yield page
+            os.replace(temp_path, path)
+            completed = True
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -1,16 +1,402 @@
 import argparse
+import cProfile
+import pstats
+import sythe.analysis as analysis
+import sythe.cache as cache
 import sythe.fileio as fileio
-from sythe.resources.ec2_resources import get_ec2_instances
+import sythe.parsing.optimizer as optimizer
+import sythe.discovery as discovery
+import sythe.planner as planner
+import sythe.ratelimit as ratelimit
+from sythe.batching import BatchingEC2Client
+from sythe.executor import ActionExecutor
+from sythe.incremental import IncrementalEngine
+from sythe.instrumentation import recorder
+from sythe.registry import resource_registry
+from sythe.aws import DEFAULT_REGION
+from sythe.resources.store import IndexedRule, InventoryStore
+from sythe.resources.table import ResourceTable
+from sythe.ruleset import RuleSet
+
+#How many of the most expensive functions --profile prints
+PROFILE_LINES = 25
 
 def main():
     parser = argparse.ArgumentParser(description='A rule engine for resources')
     parser.add_argument('config', help='The config file containing rules')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check that the config file parses, without '
+                             'finding any resources')
+    parser.add_argument('--evaluation', choices=['compiled', 'interpreted', 'batch', 'shared',
+                                                 'indexed'],
+                        default='compiled',
+                        help='Whether to compile rule conditions into Python callables, '
+                             'interpret them by walking the condition tree, evaluate '
+                             'them a column at a time over all resources, compile '
+                             'all rules together so predicates they share are only '
+                             'evaluated once per resource, or look up the resources '
+                             'each rule could match in indexes of the values its '
+                             'equalities compare with')
+    parser.add_argument('--region', action='append', dest='regions',
+                        help='A region to find resources in. Can be given many times '
+                             '(default: {})'.format(DEFAULT_REGION))
+    parser.add_argument('--account', action='append', dest='accounts',
+                        help='The name of a credentials profile for an account to find '
+                             'resources in. Can be given many times (default: the '
+                             'default credentials)')
+    parser.add_argument('--concurrency', type=int, default=discovery.DEFAULT_CONCURRENCY,
+                        help='The most regions and accounts to find resources in at once')
+    parser.add_argument('--read-rate', type=float, default=ratelimit.DEFAULT_READ_RATE,
+                        help='The most describe calls to make to AWS per second')
+    parser.add_argument('--mutate-rate', type=float, default=ratelimit.DEFAULT_MUTATE_RATE,
+                        help='The most calls that change resources to make to AWS per second')
+    parser.add_argument('--no-pushdown', action='store_false', dest='pushdown',
+                        help='Fetch every resource for every rule, rather than pushing '
+                             'equality conditions down into describe_instances filters')
+    parser.add_argument('--no-optimize', action='store_false', dest='optimize',
+                        help='Evaluate rule conditions as written, rather than flattening '
+                             'chains of & and | and evaluating their cheapest and most '
+                             'decisive operands first')
+    parser.add_argument('--dump-ast', action='store_true',
+                        help='Print the condition tree of every rule as parsed '
+                             'and as optimized')
+    parser.add_argument('--state-file',
+                        help='A file to remember which resources matched each rule in, so '
+                             'that later runs only evaluate resources that have changed and '
+                             'only tag resources that have started matching')
+    parser.add_argument('--cache-dir',
+                        help='A directory to cache the resources found in, so that later '
+                             'runs can use them rather than finding them again')
+    parser.add_argument('--cache-ttl', type=float, default=cache.DEFAULT_TTL,
+                        help='How many seconds cached resources are used for')
+    parser.add_argument('--cache-mode', choices=cache.MODES, default=cache.USE,
+                        help='Whether to use cached resources younger than the TTL, to '
+                             'always find resources again and cache them, or to only use '
+                             'cached resources, reporting which match each rule rather '
+                             'than performing actions on them. Resources are always found '
+                             'again when rules have actions, rather than performing them '
+                             'on cached resources')
+    parser.add_argument('--project', action='store_true',
+                        help='Drop every value of instances that rules don\'t need as '
+                             'soon as they\'re fetched')
+    parser.add_argument('--compact', action='store_true',
+                        help='Keep the values of instances that rules need in a compact '
+                             'form, describing an instance again if an action needs the '
+                             'rest. Implies --project')
+    parser.add_argument('--rule-cache-dir', default=fileio.get_default_rule_cache_dir(),
+                        help='A directory to cache parsed rules in, so that they\'re only '
+                             'parsed again when the config file changes (default: %(default)s)')
+    parser.add_argument('--no-rule-cache', action='store_const', const=None,
+                        dest='rule_cache_dir', help='Parse the rules every time')
+    parser.add_argument('--action-workers', type=int, default=0,
+                        help='Perform the actions of matched rules on this many threads. '
+                             'The actions of each rule are performed on every resource it '
+                             'matches in a page at once, and finish before the next rule is '
+                             'evaluated, so later rules see what they changed '
+                             '(default: %(default)s)')
+    parser.add_argument('--metrics-json',
+                        help='A file to write counters and latency histograms for '
+                             'parsing, discovery, rule evaluation and AWS calls to, as JSON')
+    parser.add_argument('--metrics-prometheus',
+                        help='A file to write the same metrics as --metrics-json to, in '
+                             'Prometheus\' text format')
+    parser.add_argument('--profile',
+                        help='A file to dump cProfile stats of the whole run to')
     args = parser.parse_args()
+    if (args.project or args.compact) and args.cache_dir:
+        parser.error('--project and --compact can\'t be used with --cache-dir, since '
+                     'the cache holds whole instances')
+    if args.dump_ast and not args.optimize:
+        parser.error('--dump-ast shows how rules are optimized, so it can\'t be '
+                     'used with --no-optimize')
+    if args.cache_mode == cache.OFFLINE and not args.cache_dir:
+        parser.error('--cache-mode offline needs a --cache-dir')
+    if args.cache_mode == cache.OFFLINE and args.state_file:
+        parser.error('--state-file can\'t be used offline, since no actions are performed')
+    if args.state_file and args.evaluation in ('batch', 'shared', 'indexed'):
+        parser.error('--state-file evaluates rules one resource at a time, so it can\'t be '
+                     'used with {} evaluation'.format(args.evaluation))
+
+    if args.metrics_json or args.metrics_prometheus:
+        recorder.enable()
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(run, args)
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    else:
+        run(args)
 
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as metrics_file:
+            metrics_file.write(recorder.to_json())
+    if args.metrics_prometheus:
+        with open(args.metrics_prometheus, 'w') as metrics_file:
+            metrics_file.write(recorder.to_prometheus())
+
+def run(args):
+    """
+    Applies the rules in the config file to every resource found, as the given
+    command line arguments say
+    """
     config_file_path = args.config
-    rules = fileio.parse_rules_from_file(config_file_path)
-    resources = get_ec2_instances()
-    for rule in rules:
+    rules = fileio.parse_rules_from_file(config_file_path, args.rule_cache_dir)
+    parsed_count = len(rules)
+    #Optimizing needs the resource modules, so checking only
+    #optimizes when it has to show how rules are optimized
+    if args.optimize and (args.dump_ast or not args.check):
+        rules = optimize_rules(rules, args.dump_ast)
+    if args.check:
+        print("Parsed {} rules from {}".format(parsed_count, config_file_path))
+        return
+    if not rules:
+        return
+
+    #Resource modules are only imported once resources are going to be found
+    from sythe.resources.compact import CompactEC2Instance, get_fields
+    from sythe.resources.ec2_resources import EC2_INSTANCE_FILTERS
+    from sythe.resources.ec2_resources import build_ec2_instance_projection
+    from sythe.resources.ec2_resources import iter_ec2_instance_pages
+    EC2Instance = resource_registry['ec2_instance'] # pylint: disable=invalid-name
+    for number, rule in enumerate(rules, 1):
         print("Applying rule: {}".format(rule))
+        #Rules are copied when they're planned, so this is how
+        #metrics for the copies are tied back to the rule
+        rule.label = str(number)
+
+    #Cached segments hold every resource, so the rules can't be
+    #split up by what fetching them could be filtered on
+    if args.pushdown and not args.cache_dir:
+        rule_groups = planner.group_rules_by_filters(rules, EC2_INSTANCE_FILTERS)
+    else:
+        rule_groups = [([], rules)]
+
+    if args.evaluation == 'compiled':
+        for _, group in rule_groups:
+            for rule in group:
+                rule.compile()
+
+    if recorder.enabled and args.evaluation in ('compiled', 'interpreted'):
+        for _, group in rule_groups:
+            for rule in group:
+                recorder.instrument_rule(rule, rule.label)
+
+    if args.evaluation == 'shared':
+        rule_groups = [(filters, RuleSet(group)) for filters, group in rule_groups]
+        print("Deduplicated {} of {} predicates".format(
+            sum(rule_set.deduplicated for _, rule_set in rule_groups),
+            sum(rule_set.predicate_count for _, rule_set in rule_groups)
+        ))
+
+    if args.evaluation == 'indexed':
+        rule_groups = [(filters, [IndexedRule(rule) for rule in group])
+                       for filters, group in rule_groups]
+
+    limiter = ratelimit.RateLimiter(args.read_rate, args.mutate_rate)
+    clients = {}
+    def get_client(target):
+        """
+        Returns a rate limited client for the given target which batches up
+        the calls that actions make, remembering it so it can be flushed
+        """
+        if target not in clients:
+            clients[target] = BatchingEC2Client(ratelimit.RateLimitedClient(
+                discovery.get_target_client(target), limiter
+            ))
+        return clients[target]
+
+    engine = IncrementalEngine.load(args.state_file) if args.state_file else None
+    executor = ActionExecutor(args.action_workers) if args.action_workers > 0 else None
+    perform = executor.submit if executor is not None else None
+    outcome_totals = {'performed': 0, 'failed': 0, 'duration': 0.0, 'slowest': 0.0}
+
+    inventory_cache = None
+    if args.cache_dir:
+        cache_mode = cache.get_mode(args.cache_mode, rules)
+        if cache_mode != args.cache_mode:
+            print("Fetching resources again rather than using the cache, "
+                  "since rules have actions")
+        inventory_cache = cache.InventoryCache(
+            args.cache_dir, 'ec2_instance', EC2Instance,
+            ttl=args.cache_ttl, mode=cache_mode
+        )
+
+    make_instance = EC2Instance
+    if args.project or args.compact:
+        paths = analysis.required_paths(rules, EC2Instance)
+        project = build_ec2_instance_projection(paths)
+        if args.compact:
+            fields = get_fields(paths)
+            make_instance = lambda data, client: CompactEC2Instance(project(data), client, fields)
+        else:
+            make_instance = lambda data, client: EC2Instance(project(data), client)
+
+    targets = discovery.get_targets(args.accounts or [None], args.regions or [DEFAULT_REGION])
+    for filters, group in rule_groups:
+        fetch_pages = lambda client, filters=filters: iter_ec2_instance_pages(
+            client, filters, make_instance
+        )
+        pages = discovery.discover_resource_pages(
+            fetch_pages, targets, get_client, max_workers=args.concurrency,
+            cache=inventory_cache
+        )
+        for page in pages:
+            outcomes = []
+            if args.cache_mode == cache.OFFLINE:
+                report_matches(group, page, args.evaluation)
+            elif engine is not None:
+                for rule in group:
+                    engine.apply(rule, page, perform)
+                    if executor is not None and rule.actions:
+                        #Later rules have to see what this rule's actions changed
+                        outcomes.extend(executor.wait())
+            elif executor is not None:
+                for rule, matched in iter_rule_matches(group, page, args.evaluation):
+                    for resource in matched:
+                        for action in rule.actions:
+                            executor.submit(rule, resource, action)
+                    if matched and rule.actions:
+                        outcomes.extend(executor.wait())
+            else:
+                apply_rules(group, page, args.evaluation)
+            if executor is not None:
+                outcomes.extend(executor.wait())
+                report_outcomes(outcomes, outcome_totals)
+                if engine is not None:
+                    engine.record_outcomes(outcomes)
+            for client in list(clients.values()):
+                results = client.flush()
+                report_results(results)
+                if engine is not None:
+                    engine.record_results(results)
+
+    if executor is not None:
+        executor.shutdown()
+        print("Performed {performed} actions, {failed} failed, taking {duration:.2f}s "
+              "in total and {slowest:.2f}s at most".format(**outcome_totals))
+
+    if engine is not None:
+        engine.save(args.state_file)
+        print("Evaluated {} resources, reused {} results from the previous run".format(
+            engine.evaluated, engine.reused
+        ))
+
+    for budget, metrics in sorted(limiter.metrics.as_dict().items()):
+        print("{} calls: {calls}, throttled: {throttle_events}, retried: {retries}, "
+              "waited: {wait_time:.2f}s".format(budget, **metrics))
+
+def optimize_rules(rules, dump_ast=False):
+    """
+    Optimizes the condition of every rule, returning the rules
+    that could match any resource. If `dump_ast`, prints the tree
+    of every condition before and after it's optimized. Operands are
+    ordered by static estimates, with the variables that describe_instances
+    can filter on known to be strings
+    """
+    from sythe.resources.ec2_resources import EC2_INSTANCE_FILTERS
+    optimized = []
+    for rule in rules:
+        parsed = rule.condition
+        parsed_text = str(rule)
+        optimizer.optimize_rule(rule, known_variables=EC2_INSTANCE_FILTERS)
+        if dump_ast:
+            print("Parsed condition:\n{}\nOptimized condition:\n{}".format(
+                optimizer.dump_tree(parsed), optimizer.dump_tree(rule.condition)
+            ))
+        if optimizer.never_matches(rule.condition):
+            print("Skipping rule which can never match: {}".format(parsed_text))
+        else:
+            optimized.append(rule)
+    return optimized
+
+def report_results(results):
+    """
+    Prints the operations in the given ActionResults that failed
+    """
+    for result in results:
+        if result.error is not None:
+            print("Failed to {} {}: {}".format(result.operation, result.resource_id, result.error))
+
+def report_outcomes(outcomes, totals):
+    """
+    Prints the actions in the given ActionOutcomes that failed,
+    adding them to the given running totals
+    """
+    for outcome in outcomes:
+        totals['performed'] += 1
+        totals['duration'] += outcome.duration
+        totals['slowest'] = max(totals['slowest'], outcome.duration)
+        if outcome.error is not None:
+            totals['failed'] += 1
+            print("Failed to {} {}: {}".format(outcome.action_name, outcome.resource, outcome.error))
+
+def iter_rule_matches(rules, resources, evaluation):
+    """
+    Yields each rule with the list of the given resources that it matches,
+    in order, using the given evaluation mode. Each rule is only evaluated
+    once the previous one has been consumed, and if that rule has actions,
+    what's known about the resources is dropped first, so the actions
+    can be performed in between and the rule sees what they changed
+    """
+    if evaluation == 'shared':
+        memos = [rules.new_memo() for _ in resources]
+        for i, rule in enumerate(rules.rules):
+            matched = [resource for resource, memo in zip(resources, memos)
+                       if rules.matches(i, resource, memo)]
+            yield rule, matched
+            if matched and rule.actions:
+                memos = [rules.new_memo() for _ in resources]
+    elif evaluation == 'batch':
+        table = ResourceTable(resources)
+        for rule in rules:
+            matched = table.select(rule.condition.execute_batch(table))
+            yield rule, matched
+            if matched and rule.actions:
+                table.invalidate()
+    elif evaluation == 'indexed':
+        store = InventoryStore(resources)
+        for indexed_rule in rules:
+            matched = indexed_rule.select(store)
+            yield indexed_rule.rule, matched
+            if matched and indexed_rule.rule.actions:
+                store.invalidate()
+    else:
+        for rule in rules:
+            yield rule, [resource for resource in resources if rule.evaluate(resource)]
+
+def get_matches(rules, resources, evaluation):
+    """
+    Returns a (rule, resource) pair for every resource that each rule
+    matches, using the given evaluation mode, without performing any actions
+    """
+    return [(rule, resource) for rule, matched in iter_rule_matches(rules, resources, evaluation)
+            for resource in matched]
+
+def report_matches(rules, resources, evaluation):
+    """
+    Prints the resources that match each rule, rather than performing the rule's actions
+    """
+    for rule, resource in get_matches(rules, resources, evaluation):
+        print("{} matches rule: {}".format(resource, rule.condition))
+
+def apply_rules(rules, resources, evaluation):
+    """
+    Applies every rule to the given resources, using the given evaluation
+    mode. For shared evaluation the rules are a RuleSet, and
+    for indexed evaluation they are IndexedRules
+    """
+    if evaluation == 'shared':
         for resource in resources:
-            rule.execute(resource)
+            rules.execute(resource)
+    elif evaluation == 'batch':
+        table = ResourceTable(resources)
+        for rule in rules:
+            rule.execute_batch(table)
+    elif evaluation == 'indexed':
+        store = InventoryStore(resources)
+        for indexed_rule in rules:
+            indexed_rule.execute(store)
+    else:
+        for rule in rules:
+            for resource in resources:
+                rule.execute(resource)
@@ -0,0 +1,137 @@
+"""
+This module handles finding resources across many regions and accounts
+at once, fanning the requests for each out across a pool of threads
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from sythe.aws import get_ec2_client
+from sythe.instrumentation import recorder
+
+DEFAULT_CONCURRENCY = 8
+
+#How long producers wait for room in the page queue before
+#checking whether the consumer has stopped
+PUT_TIMEOUT = 0.1
+
+#A region of an account to discover resources in. Accounts are
+#identified by the name of the credentials profile used to access them
+DiscoveryTarget = namedtuple('DiscoveryTarget', ['account', 'region'])
+
+#Kinds of message that producers send to the consumer
+PAGE = 'page'
+DONE = 'done'
+FAILED = 'failed'
+
+def get_targets(accounts, regions):
+    """
+    Returns a DiscoveryTarget for every region of every account given
+    """
+    return [DiscoveryTarget(account, region) for account in accounts for region in regions]
+
+def get_target_client(target):
+    """
+    Returns an EC2 client for the given DiscoveryTarget
+    """
+    return get_ec2_client(region_name=target.region, profile_name=target.account)
+
+def discover_resource_pages(fetch_pages, targets, client_factory=get_target_client,
+                            max_workers=DEFAULT_CONCURRENCY, max_pending_pages=None,
+                            cache=None):
+    """
+    Fetches pages of resources from all the given DiscoveryTargets concurrently,
+    yielding each page as soon as it arrives. Each resource is tagged with
+    the region and account it was found in. Fetching carries on in the
+    background while pages are being consumed, but stops once
+    `max_pending_pages` pages are waiting, so only that many pages are
+    ever held in memory at once
+    Arguments:
+        fetch_pages - A function which takes a client and returns an iterable of
+                      the pages of resources it can see, e.g. `iter_ec2_instance_pages`
+        targets - The DiscoveryTargets to fetch resources from
+        client_factory - A function which returns a client for a DiscoveryTarget
+        max_workers - The most targets to fetch from at once
+        max_pending_pages - The most fetched pages to hold before they are consumed.
+                            Defaults to `max_workers`
+        cache - An InventoryCache to serve pages from, and cache fetched pages in
+    Returns:
+        A generator of lists of resources
+    """
+    pages = queue.Queue(maxsize=max_pending_pages or max_workers)
+    stopped = threading.Event()
+
+    def put(message):
+        """
+        Sends the given message to the consumer, returning False
+        if the consumer stopped before there was room for it
+        """
+        while not stopped.is_set():
+            try:
+                pages.put(message, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(target):
+        """
+        Fetches every page from the given target, sending them to the consumer
+        """
+        try:
+            if cache is None:
+                target_pages = fetch_pages(client_factory(target))
+            else:
+                target_pages = cache.pages(target, fetch_pages, client_factory)
+            labels = {'account': target.account or 'default', 'region': target.region}
+            fetch_start = recorder.clock()
+            for page in target_pages:
+                recorder.observe('sythe_discovery_page_seconds',
+                                 recorder.clock() - fetch_start, **labels)
+                recorder.increment('sythe_discovered_resources_total', len(page), **labels)
+                for resource in page:
+                    resource.region = target.region
+                    resource.account = target.account
+                if not put((PAGE, page)):
+                    return
+                fetch_start = recorder.clock()
+            put((DONE, None))
+        except Exception as err: # pylint: disable=broad-except
+            put((FAILED, err))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for target in targets:
+            executor.submit(produce, target)
+
+        try:
+            remaining = len(targets)
+            while remaining > 0:
+                kind, page = pages.get()
+                if kind == PAGE:
+                    yield page
+                elif kind == DONE:
+                    remaining -= 1
+                else:
+                    raise page
+        finally:
+            stopped.set()
+
+def discover_resources(fetch, targets, client_factory=get_target_client,
+                       max_workers=DEFAULT_CONCURRENCY):
+    """
+    Fetches resources from all the given DiscoveryTargets concurrently,
+    yielding them as each target finishes
+    Arguments:
+        fetch - A function which takes a client and returns the resources it can see,
+                e.g. `get_ec2_instances`
+        targets - The DiscoveryTargets to fetch resources from
+        client_factory - A function which returns a client for a DiscoveryTarget
+        max_workers - The most targets to fetch from at once
+    Returns:
+        A generator of the resources in every target
+    """
+    fetch_pages = lambda client: [fetch(client)]
+    for page in discover_resource_pages(fetch_pages, targets, client_factory, max_workers):
+        for resource in page:
+            yield resource
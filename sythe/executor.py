@@ -0,0 +1,99 @@
+"""
+This module performs the actions of matched rules on a pool of threads,
+so that slow actions don't hold up evaluating rules against other resources
+"""
+
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+DEFAULT_CONCURRENCY = 8
+
+#The outcome of performing one action on one resource. `error` is
+#None if the action succeeded, and `duration` is in seconds
+ActionOutcome = namedtuple('ActionOutcome', ['rule', 'resource', 'action_name', 'error', 'duration'])
+
+class ActionExecutor(object):
+    """
+    Performs actions on a bounded pool of threads. Each resource has its
+    own lane, so actions on the same resource are performed one at a time
+    in the order they were submitted, while actions on different resources
+    run concurrently. An action raising an error is recorded in its outcome
+    rather than stopping any other action. Submitting blocks while
+    `max_pending` actions are waiting to be performed
+    """
+    def __init__(self, max_workers=DEFAULT_CONCURRENCY, max_pending=None, clock=time.perf_counter):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_pending = max_pending or max_workers * 100
+        self.clock = clock
+        self.lanes = {}
+        self.pending = 0
+        self.outcomes = []
+        self.condition = threading.Condition()
+
+    def submit(self, rule, resource, action):
+        """
+        Queues the given action of the given rule to be performed on the given resource
+        """
+        with self.condition:
+            while self.pending >= self.max_pending:
+                self.condition.wait()
+            self.pending += 1
+            lane = self.lanes.get(id(resource))
+            if lane is not None:
+                lane.append((rule, resource, action))
+                return
+            self.lanes[id(resource)] = deque([(rule, resource, action)])
+        self.pool.submit(self.run_lane, id(resource))
+
+    def run_lane(self, lane_key):
+        """
+        Performs the actions in the given lane until it's empty
+        """
+        while True:
+            with self.condition:
+                lane = self.lanes[lane_key]
+                if not lane:
+                    del self.lanes[lane_key]
+                    return
+                rule, resource, action = lane[0]
+
+            outcome = self.perform(rule, resource, action)
+            with self.condition:
+                lane.popleft()
+                self.outcomes.append(outcome)
+                self.pending -= 1
+                self.condition.notify_all()
+
+    def perform(self, rule, resource, action):
+        """
+        Performs the given action, returning its ActionOutcome
+        """
+        start = self.clock()
+        error = None
+        try:
+            action.execute(resource)
+        except Exception as err: # pylint: disable=broad-except
+            error = err
+        return ActionOutcome(rule, resource, action.action_name, error, self.clock() - start)
+
+    def wait(self):
+        """
+        Waits for every submitted action to be performed
+        Returns:
+            The ActionOutcomes of the actions performed since the last wait
+        """
+        with self.condition:
+            while self.pending > 0:
+                self.condition.wait()
+            outcomes = self.outcomes
+            self.outcomes = []
+        return outcomes
+
+    def shutdown(self):
+        """
+        Waits for every submitted action, then stops the pool's threads
+        """
+        self.wait()
+        self.pool.shutdown()
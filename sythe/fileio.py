@@ -3,15 +3,108 @@ This module provides IO operations for moving rules between text
 representations and internal AST representations
 """
 
+import functools
+import gc
+import hashlib
+import os
+import pickle
+import sythe
 import sythe.parsing.strings as strings
 
-def parse_rules_from_file(file_path):
+def get_default_rule_cache_dir():
+    """
+    Returns the directory that parsed rules are cached in by default
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(cache_home, 'sythe', 'rules')
+
+@functools.lru_cache(maxsize=None)
+def get_parser_digest():
+    """
+    Returns a digest of the source of every module in sythe.parsing, which
+    decides what rules parse into. The same text can parse differently once
+    they change, e.g. when a new operator is added, even if the version doesn't
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(strings.__file__)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as source_file:
+                digest.update(name.encode('utf-8'))
+                digest.update(b'\0')
+                digest.update(source_file.read())
+    return digest.hexdigest()
+
+def get_rule_cache_key(raw_file_contents):
+    """
+    Returns what parsed rules are cached under. Rules are parsed again
+    whenever the file, the version of sythe or the parser changes
+    """
+    digest = hashlib.sha256()
+    digest.update(sythe.__version__.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(get_parser_digest().encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(raw_file_contents.encode('utf-8'))
+    return digest.hexdigest()
+
+def parse_rules_from_file(file_path, cache_dir=None):
     """
     This function reads the given file and parses
     all the rule definitions, throwing a ParsingError
-    if they are incorrect
+    if they are incorrect. If `cache_dir` is given, the
+    parsed rules are cached there and reused until the
+    file changes
     """
     with open(file_path, 'r') as rule_file:
         raw_file_contents = rule_file.read()
 
-    return strings.parse_rules_from_string(raw_file_contents)
+    if cache_dir is None:
+        return strings.parse_rules_from_string(raw_file_contents)
+
+    cache_path = os.path.join(cache_dir, '{}.pickle'.format(
+        get_rule_cache_key(raw_file_contents)
+    ))
+    rules = load_cached_rules(cache_path)
+    if rules is None:
+        rules = strings.parse_rules_from_string(raw_file_contents)
+        save_cached_rules(cache_path, rules)
+    return rules
+
+def load_cached_rules(cache_path):
+    """
+    Returns the rules cached at the given path, or None
+    if they aren't cached or can't be loaded
+    """
+    #Loading rules creates a lot of objects and no garbage, so the
+    #collector would only slow it down by scanning them over and over
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            return pickle.load(cache_file)
+    except Exception: # pylint: disable=broad-except
+        #Cache files may be broken or written by other code in any way,
+        #so failing to load one for any reason means parsing again
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def save_cached_rules(cache_path, rules):
+    """
+    Caches the given rules at the given path. Caching is
+    best effort, so failing to cache rules isn't an error
+    """
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump(rules, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (IOError, OSError, RuntimeError, pickle.PicklingError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
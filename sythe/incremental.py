@@ -0,0 +1,188 @@
+"""
+This module provides incremental rule evaluation for repeated runs. The
+match results of every rule are remembered between runs, keyed by the
+values of the variables that the rule references, so that a resource whose
+referenced values haven't changed isn't evaluated again, and actions which
+only need performing once aren't performed again on resources which matched last time
+"""
+
+import json
+import os
+import sythe.parsing.nodes as nodes
+from sythe.analysis import get_referenced_variables
+
+STATE_VERSION = 2
+
+#Actions which only need performing when a resource starts matching a rule.
+#Every other action is performed on every run that the resource matches, e.g.
+#mark_for_deletion, which has to check each run whether the resource is due for deletion
+EDGE_TRIGGERED_ACTIONS = frozenset(['tag'])
+
+def build_getters(variables):
+    """
+    Returns the getter of a VariableNode for each of the given variable names
+    """
+    return [nodes.VariableNode(name).getter for name in variables]
+
+def fingerprint(resource, getters):
+    """
+    Returns the values of the variables with the given getters in the given
+    resource, as a list so that it compares equal to one loaded from JSON.
+    Variables only ever have values of JSON types, so the values are
+    compared themselves rather than a digest of them
+    """
+    return [getter(resource) for getter in getters]
+
+def get_resource_key(resource):
+    """
+    Returns what identifies the given resource between runs, or
+    None if its type of resource has no identifier
+    """
+    id_key = getattr(resource, 'id_key', None)
+    if id_key is None or id_key not in resource:
+        return None
+    return '{}/{}/{}'.format(resource.account, resource.region, resource[id_key])
+
+class RuleState(object):
+    """
+    What's known about a rule from previous runs: for every resource it was
+    evaluated against, the fingerprints of the variables its condition and
+    actions reference, and whether the resource matched. The getters of those
+    variables are built once per rule rather than once per resource
+    """
+    def __init__(self, rule):
+        self.rule = rule
+        self.condition_getters = build_getters(get_referenced_variables([rule.condition]))
+        self.action_getters = build_getters(get_referenced_variables(
+            argument for action in rule.actions for argument in action.arguments.values()
+        ))
+        self.edge_triggered = any(action.action_name in EDGE_TRIGGERED_ACTIONS
+                                  for action in rule.actions)
+
+    def fingerprints(self, resource):
+        """
+        Returns the condition and action fingerprints of the given resource
+        """
+        return (fingerprint(resource, self.condition_getters),
+                fingerprint(resource, self.action_getters))
+
+class IncrementalEngine(object):
+    """
+    Applies rules to resources, evaluating conditions only for resources whose
+    referenced values have changed since the previous run, and performing
+    edge triggered actions only on resources which have started matching.
+    `state` is what a previous engine's `finish` returned
+    """
+    def __init__(self, state=None):
+        if state is None or state.get('version') != STATE_VERSION:
+            state = {'version': STATE_VERSION, 'rules': {}}
+        self.previous = state['rules']
+        self.current = {}
+        self.rule_states = {}
+        #The (rule key, resource key) of every match that edge triggered
+        #actions were performed for, by the ID of the resource
+        self.performed = {}
+        self.evaluated = 0
+        self.reused = 0
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Returns an engine using the state saved in the given file,
+        or one with no state if the file doesn't exist
+        """
+        try:
+            with open(file_path, 'r') as state_file:
+                return cls(json.load(state_file))
+        except (IOError, OSError):
+            return cls()
+
+    def save(self, file_path):
+        """
+        Saves the state of this run to the given file, replacing it
+        as a whole so an interrupted save doesn't lose the previous state
+        """
+        temp_path = '{}.tmp'.format(file_path)
+        with open(temp_path, 'w') as state_file:
+            json.dump(self.finish(), state_file)
+        os.replace(temp_path, file_path)
+
+    def finish(self):
+        """
+        Returns the state of this run. Resources which weren't
+        seen this run are forgotten
+        """
+        return {'version': STATE_VERSION, 'rules': self.current}
+
+    def get_rule_state(self, rule):
+        """
+        Returns the RuleState of the given rule
+        """
+        if id(rule) not in self.rule_states:
+            self.rule_states[id(rule)] = RuleState(rule)
+        return self.rule_states[id(rule)]
+
+    def apply(self, rule, resources, perform=None):
+        """
+        Applies the given rule to the given resources. Actions are performed
+        by calling `perform` with the rule, resource and ActionNode if it's
+        given, e.g. `ActionExecutor.submit`, and directly otherwise
+        """
+        rule_key = str(rule)
+        rule_state = self.get_rule_state(rule)
+        previous = self.previous.get(rule_key, {})
+        current = self.current.setdefault(rule_key, {})
+        for resource in resources:
+            resource_key = get_resource_key(resource)
+            condition_print, action_print = rule_state.fingerprints(resource)
+            known = previous.get(resource_key)
+            if known is not None and known[0] == condition_print:
+                matched = known[2]
+                self.reused += 1
+            else:
+                matched = bool(rule.evaluate(resource))
+                self.evaluated += 1
+            if resource_key is not None:
+                current[resource_key] = [condition_print, action_print, matched]
+            if not matched:
+                continue
+
+            was_matched = known is not None and known[2] and known[1] == action_print
+            if rule_state.edge_triggered and not was_matched and resource_key is not None:
+                self.performed.setdefault(resource[resource.id_key], []).append(
+                    (rule_key, resource_key)
+                )
+            for action in rule.actions:
+                if was_matched and action.action_name in EDGE_TRIGGERED_ACTIONS:
+                    continue
+                if perform is None:
+                    action.execute(resource)
+                else:
+                    perform(rule, resource, action)
+
+    def forget(self, rule_key, resource_key):
+        """
+        Forgets whether the given resource matched the given rule, so that
+        it's evaluated and its actions are performed again next run
+        """
+        self.current.get(rule_key, {}).pop(resource_key, None)
+
+    def record_results(self, results):
+        """
+        Forgets the matches of resources that the given ActionResults, e.g.
+        from `BatchingEC2Client.flush`, say an operation failed on, so that
+        edge triggered actions which failed aren't skipped on later runs
+        """
+        for result in results:
+            if result.error is not None:
+                for rule_key, resource_key in self.performed.pop(result.resource_id, ()):
+                    self.forget(rule_key, resource_key)
+
+    def record_outcomes(self, outcomes):
+        """
+        Forgets the matches that the given ActionOutcomes, e.g. from
+        `ActionExecutor.wait`, say an action failed for
+        """
+        for outcome in outcomes:
+            if outcome.error is not None:
+                self.forget(str(outcome.rule), get_resource_key(outcome.resource))
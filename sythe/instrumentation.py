@@ -0,0 +1,217 @@
+"""
+This module records counters and latency histograms from the hot paths of
+a run: tokenizing, parsing, discovering pages of resources, evaluating rules
+and calling AWS. Recording is off until it's enabled, so it costs next to
+nothing unless a report has been asked for
+"""
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+#The upper bounds in seconds of the buckets that latencies are counted in
+LATENCY_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+def freeze_labels(labels):
+    """
+    Returns the given labels as a hashable, ordered tuple of pairs
+    """
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def format_labels(labels, extra=()):
+    """
+    Returns the given label pairs in Prometheus' text format
+    """
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    ))
+
+class Histogram(object):
+    """
+    Counts observed values into buckets with the given upper bounds,
+    keeping their count and sum
+    """
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.bucket_counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Counts the given value
+        """
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def cumulative_counts(self):
+        """
+        Returns the number of values at or below each bound
+        """
+        counts = []
+        total = 0
+        for count in self.bucket_counts:
+            total += count
+            counts.append(total)
+        return counts
+
+class Instrumentation(object):
+    """
+    Counters and histograms, each identified by a name and a set of
+    labels, e.g. the rule or operation they were recorded for
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.enabled = False
+        self.clock = clock
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def enable(self):
+        """
+        Starts recording
+        """
+        self.enabled = True
+
+    def reset(self):
+        """
+        Forgets everything recorded so far
+        """
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Adds the given amount to a counter
+        """
+        if not self.enabled:
+            return
+        key = (name, freeze_labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Counts a value, e.g. a latency in seconds, in a histogram
+        """
+        if not self.enabled:
+            return
+        histogram = self.get_histogram(name, labels)
+        with self.lock:
+            histogram.observe(value)
+
+    def get_histogram(self, name, labels):
+        """
+        Returns the histogram with the given name and labels, creating it if needed
+        """
+        key = (name, freeze_labels(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            return self.histograms[key]
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        A context manager which observes how long its body takes in a histogram
+        """
+        if not self.enabled:
+            yield
+            return
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self.clock() - start, **labels)
+
+    def as_dict(self):
+        """
+        Returns everything recorded as a dict of JSON types
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            report = {'counters': [], 'histograms': []}
+            for (name, labels), value in counters:
+                report['counters'].append({'name': name, 'labels': dict(labels), 'value': value})
+            for (name, labels), histogram in histograms:
+                report['histograms'].append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else None,
+                    'buckets': dict((str(bound), count) for bound, count
+                                    in zip(histogram.bounds, histogram.cumulative_counts()))
+                })
+        return report
+
+    def to_json(self):
+        """
+        Returns everything recorded as a JSON report
+        """
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Returns everything recorded in Prometheus' text exposition format
+        """
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append('# TYPE {} counter'.format(name))
+                    typed.add(name)
+                lines.append('{}{} {}'.format(name, format_labels(labels), value))
+            for (name, labels), histogram in sorted(self.histograms.items(),
+                                                    key=lambda item: item[0]):
+                if name not in typed:
+                    lines.append('# TYPE {} histogram'.format(name))
+                    typed.add(name)
+                for bound, count in zip(histogram.bounds, histogram.cumulative_counts()):
+                    lines.append('{}_bucket{} {}'.format(
+                        name, format_labels(labels, [('le', repr(bound))]), count))
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels, [('le', '+Inf')]), histogram.count))
+                lines.append('{}_sum{} {!r}'.format(name, format_labels(labels), histogram.sum))
+                lines.append('{}_count{} {}'.format(name, format_labels(labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def instrument_rule(self, rule, label):
+        """
+        Wraps the given rule's evaluate function so that every evaluation is
+        timed and counted, and every match is counted, under the given label
+        """
+        evaluate = rule.evaluate
+        clock = self.clock
+        lock = self.lock
+        #Looked up once rather than per evaluation, since this is the hottest path
+        histogram = self.get_histogram('sythe_rule_evaluation_seconds', {'rule': label})
+        matches_key = ('sythe_rule_matches_total', freeze_labels({'rule': label}))
+        def timed_evaluate(resource):
+            """
+            Evaluates the rule's condition, recording how long it took
+            """
+            start = clock()
+            matched = evaluate(resource)
+            elapsed = clock() - start
+            with lock:
+                histogram.observe(elapsed)
+                if matched:
+                    self.counters[matches_key] = self.counters.get(matches_key, 0) + 1
+            return matched
+        rule.evaluate = timed_evaluate
+
+#What the rest of sythe records into
+recorder = Instrumentation()
@@ -1,7 +1,32 @@
 import sythe.parsing.errors as errors
+from sythe.parsing.tokenizer import as_token_stream, describe_position
 from sythe.registry import resource_registry, operator_registry
+from sythe.instrumentation import recorder
+import copy
+import functools
+import itertools
+import operator
 import regex
 
+ACTION_PARAMETER_REGEX = regex.compile(r'^[a-zA-Z0-9]+:$')
+INT_LITERAL_REGEX = regex.compile(r'^[0-9]+$')
+STRING_LITERAL_REGEX = regex.compile(r'^(".*")|(\'.*\')$')
+BOOLEAN_LITERAL_REGEX = regex.compile(r'^true|false$')
+VARIABLE_REGEX = regex.compile(r'^[a-zA-Z0-9_:\.]+$')
+
+#The types of values that a variable can take in a rule
+VARIABLE_TYPES = (str, int, bool, type(None))
+VARIABLE_TYPE_SET = frozenset(VARIABLE_TYPES)
+DICT_TYPE_SET = frozenset([dict])
+EMPTY_RECORD = {}
+
+#Characters which have a special meaning in regular expressions
+PATTERN_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+PATTERN_QUANTIFIERS = frozenset('*+?{')
+
+#The most patterns built while evaluating rules to keep compiled
+PATTERN_CACHE_SIZE = 256
+
 class Node(object):
     """
     The top most node object. Basically just defines
@@ -13,31 +38,130 @@ class Node(object):
         """
         raise NotImplementedError()
 
+    def compile(self):
+        """
+        Returns a callable which takes a resource and returns the same
+        value as `execute`, built from a single Python expression so that
+        evaluating it doesn't walk the tree. Falls back to `execute` if
+        the expression is too deeply nested for Python to compile
+        """
+        namespace = {}
+        try:
+            source = 'lambda resource: {}'.format(self.to_source(namespace))
+            return eval(compile(source, '<condition>', 'eval'), namespace) # pylint: disable=eval-used
+        except (SyntaxError, RuntimeError, MemoryError):
+            return self.execute
+
+    def to_source(self, namespace):
+        """
+        Returns a Python expression, in terms of `resource`, which
+        evaluates to the same value as `execute`. Any values it refers to
+        are bound into the given namespace. By default, just calls `execute`
+        """
+        return '{}(resource)'.format(bind(namespace, self.execute))
+
+    def execute_batch(self, table):
+        """
+        Executes this node over every resource in the given ResourceTable,
+        returning a list of the values `execute` would return for each.
+        By default, just calls `execute` for each resource
+        """
+        return [self.execute(resource) for resource in table.resources]
+
+    def children(self):
+        """
+        Returns the nodes that this node is made up of
+        """
+        return ()
+
+    def with_children(self, children):
+        """
+        Returns a copy of this node made up of the given nodes
+        instead of its own children
+        """
+        return self
+
+    def signature(self):
+        """
+        Returns a hashable value identifying what this node computes from
+        its children. Nodes with equal signatures and equal children always
+        compute the same value. By default, every node is unique
+        """
+        return (Node, id(self))
+
+class OperatorNode(Node):
+    """
+    The base of nodes which combine the values of a
+    left and a right node in a condition
+    """
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def children(self):
+        return (self.left, self.right)
+
+    def with_children(self, children):
+        node = copy.copy(self)
+        node.left, node.right = children
+        return node
+
+    def signature(self):
+        return type(self)
+
 class RuleNode(Node):
     """
     A node that defines a rule, basically a coupling of a resource type,
     a condition and a set of actions to apply to matching resources
     """
     def __init__(self, tokens):
+        tokens = as_token_stream(tokens)
         try:
             self.resource = ResourceNode(tokens)
             condition_length = isolate_condition(tokens)
-            condition_tokens = tokens[:condition_length]
-            del tokens[:condition_length]
-            self.condition = parse_condition_to_ast(condition_tokens)
-            expect('{', tokens)
+            self.condition = parse_condition_to_ast(tokens)
+            tokens.advance(condition_length)
+            tokens.expect('{')
             self.actions = []
-            while tokens[0] != '}':
+            while tokens.peek() != '}':
                 self.actions.append(ActionNode(tokens))
-            expect('}', tokens)
+            tokens.expect('}')
         except IndexError:
             raise errors.ParsingError('EOF found while parsing')
+        self.evaluate = self.condition.execute
+
+    def compile(self):
+        """
+        Compiles the condition of this rule into a single callable,
+        which is then used in place of walking the condition tree
+        """
+        self.evaluate = self.condition.compile()
+        return self.execute
+
+    def __getstate__(self):
+        #Compiled conditions can't be pickled, so they're compiled again after loading
+        state = dict(self.__dict__)
+        del state['evaluate']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.evaluate = self.condition.execute
 
     def execute(self, resource):
-        if self.condition.execute(resource):
+        if self.evaluate(resource):
             for action in self.actions:
                 action.execute(resource)
 
+    def execute_batch(self, table):
+        matched = table.select(self.condition.execute_batch(table))
+        for resource in matched:
+            for action in self.actions:
+                action.execute(resource)
+        if matched and self.actions:
+            #Actions may have changed the resources, e.g. by tagging them
+            table.invalidate()
+
     def __str__(self):
         actions_str = ['\n\t{}'.format(str(action)) for action in self.actions]
         return '{}({}){{{}\n}}'.format(self.resource, self.condition, ''.join(actions_str))
@@ -48,12 +172,15 @@ class ResourceNode(Node):
     that a rule operates over
     """
     def __init__(self, tokens):
-        resource = tokens[0]
+        tokens = as_token_stream(tokens)
+        resource = tokens.peek()
         if resource in resource_registry:
-            self.resource_name = resource
-            tokens.pop(0)
+            self.resource_name = str(resource)
+            tokens.advance()
         else:
-            raise errors.ParsingError('Invalid resource type: {}'.format(resource))
+            raise errors.ParsingError('Invalid resource type: {}{}'.format(
+                resource, describe_position(resource)
+            ))
 
     def execute(self, resource):
         raise NotImplementedError()
@@ -67,22 +194,23 @@ class ActionNode(Node):
     resource. Executing this node performs that action
     """
     def __init__(self, tokens):
-        self.action_name = tokens.pop(0)
+        tokens = as_token_stream(tokens)
+        self.action_name = str(tokens.advance())
         expect('(', tokens)
         self.arguments = {}
         try:
-            while tokens[0] != ')':
-                if not regex.match(r'^[a-zA-Z0-9]+:$', tokens[0]):
-                    raise errors.ParsingError(
-                        'Invalid action parameter {}'.format(tokens[0])
-                    )
-                argument_name = tokens.pop(0)[:-1]
-                argument_value = parse_operand(tokens.pop(0))
+            while tokens.peek() != ')':
+                if not ACTION_PARAMETER_REGEX.match(tokens.peek()):
+                    raise errors.ParsingError('Invalid action parameter {}{}'.format(
+                        tokens.peek(), describe_position(tokens.peek())
+                    ))
+                argument_name = str(tokens.advance())[:-1]
+                argument_value = parse_operand(tokens.advance())
                 self.arguments[argument_name] = argument_value
-                if tokens[0] != ')':
-                    expect(',', tokens)
+                if tokens.peek() != ')':
+                    tokens.expect(',')
 
-            expect(')', tokens)
+            tokens.expect(')')
         except IndexError:
             raise errors.ParsingError('Reach EOF parsing Action')
 
@@ -95,104 +223,294 @@ class ActionNode(Node):
         resolved_arguments = {}
         for arg_name, arg_node in self.arguments.items():
             resolved_arguments[arg_name] = arg_node.execute(resource)
-        method(resolved_arguments)
+        with recorder.timer('sythe_action_seconds', action=self.action_name):
+            method(resolved_arguments)
 
     def __str__(self):
         arguments_str = ['{}: {}'.format(arg_name, arg_value)
                          for arg_name, arg_value in self.arguments.items()]
         return '{}({})'.format(self.action_name, ', '.join(arguments_str))
 
+class ChainNode(Node):
+    """
+    The base of nodes which combine the values of any number of operands
+    with the same logical operator, e.g. `a & b & c` as one node rather
+    than two nested ones. These aren't parsed from rules, but built from
+    chains of parsed nodes by the optimizer
+    """
+    separator = None
+    keyword = None
+
+    def __init__(self, operands):
+        self.operands = tuple(operands)
+
+    def children(self):
+        return self.operands
+
+    def with_children(self, children):
+        node = copy.copy(self)
+        node.operands = tuple(children)
+        return node
+
+    def signature(self):
+        return type(self)
+
+    def to_source(self, namespace):
+        keyword = ' {} '.format(self.keyword)
+        return '({})'.format(keyword.join(operand.to_source(namespace)
+                                          for operand in self.operands))
+
+    def __str__(self):
+        separator = ' {} '.format(self.separator)
+        return '({})'.format(separator.join(str(operand) for operand in self.operands))
+
+class AllNode(ChainNode):
+    """
+    A conjunction of any number of operands. Like a chain of &
+    nodes, returns the first falsy operand, or else the last one
+    """
+    separator = '&'
+    keyword = 'and'
+
+    def execute(self, resource):
+        for operand in self.operands:
+            value = operand.execute(resource)
+            if not value:
+                return value
+        return value
+
+    def execute_batch(self, table):
+        values = self.operands[0].execute_batch(table)
+        for operand in self.operands[1:]:
+            values = short_circuit_batch(operand, table, values, values)
+        return values
+
+class AnyNode(ChainNode):
+    """
+    A disjunction of any number of operands. Like a chain of |
+    nodes, returns the first truthy operand, or else the last one
+    """
+    separator = '|'
+    keyword = 'or'
+
+    def execute(self, resource):
+        for operand in self.operands:
+            value = operand.execute(resource)
+            if value:
+                return value
+        return value
+
+    def execute_batch(self, table):
+        values = self.operands[0].execute_batch(table)
+        for operand in self.operands[1:]:
+            values = short_circuit_batch(operand, table, values, map(operator.not_, values))
+        return values
+
 @operator_registry.register('&')
-class AndNode(Node):
+class AndNode(OperatorNode):
     """
     A node that forms a conjunction in a condition. Takes
     two condition components and returns True if both are True
     """
     precedence = 12
     associativity = 'left'
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-
     def execute(self, resource):
         return self.left.execute(resource) and self.right.execute(resource)
 
+    def to_source(self, namespace):
+        return chain_to_source(self, AndNode, 'and', namespace)
+
+    def execute_batch(self, table):
+        left = self.left.execute_batch(table)
+        return short_circuit_batch(self.right, table, left, left)
+
     def __str__(self):
         return '({} & {})'.format(self.left, self.right)
 
 @operator_registry.register('|')
-class OrNode(Node):
+class OrNode(OperatorNode):
     """
     A node that forms a disjunction in a condition. Takes
     two condition components and returns True if either are True
     """
     precedence = 13
-    associativity = '|'
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-
+    associativity = 'left'
     def execute(self, resource):
         return self.left.execute(resource) or self.right.execute(resource)
 
+    def to_source(self, namespace):
+        return chain_to_source(self, OrNode, 'or', namespace)
+
+    def execute_batch(self, table):
+        left = self.left.execute_batch(table)
+        return short_circuit_batch(self.right, table, left, map(operator.not_, left))
+
     def __str__(self):
         return '({} | {})'.format(self.left, self.right)
 
 @operator_registry.register('=')
-class EqualsNode(Node):
+class EqualsNode(OperatorNode):
     """
     A comparison node that takes two terminal nodes and
     returns True if they are equal
     """
     precedence = 8
     associativity = 'left'
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-
     def execute(self, resource):
         return self.left.execute(resource) == self.right.execute(resource)
 
+    def to_source(self, namespace):
+        return '({} == {})'.format(self.left.to_source(namespace),
+                                  self.right.to_source(namespace))
+
+    def execute_batch(self, table):
+        return list(map(operator.eq, self.left.execute_batch(table),
+                        self.right.execute_batch(table)))
+
     def __str__(self):
         return '({} = {})'.format(self.left, self.right)
 
 @operator_registry.register('>')
-class GreaterThanNode(Node):
+class GreaterThanNode(OperatorNode):
     """
     A comparison node that takes two terminal nodes and
     returns True if the first is greater than the second
     """
     precedence = 7
     associativity = 'left'
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-
     def execute(self, resource):
         return self.left.execute(resource) > self.right.execute(resource)
 
+    def to_source(self, namespace):
+        return '({} > {})'.format(self.left.to_source(namespace),
+                                  self.right.to_source(namespace))
+
+    def execute_batch(self, table):
+        return list(map(operator.gt, self.left.execute_batch(table),
+                        self.right.execute_batch(table)))
+
     def __str__(self):
         return '({} > {})'.format(self.left, self.right)
 
 @operator_registry.register('<')
-class LessThanNode(Node):
+class LessThanNode(OperatorNode):
     """
     A comparison node that takes two terminal nodes and
     returns True if the first is less than the second
     """
     precedence = 7
     associativity = 'left'
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-
     def execute(self, resource):
         return self.left.execute(resource) < self.right.execute(resource)
 
+    def to_source(self, namespace):
+        return '({} < {})'.format(self.left.to_source(namespace),
+                                  self.right.to_source(namespace))
+
+    def execute_batch(self, table):
+        return list(map(operator.lt, self.left.execute_batch(table),
+                        self.right.execute_batch(table)))
+
     def __str__(self):
         return '({} < {})'.format(self.left, self.right)
 
-class IntLiteralNode(Node):
+@operator_registry.register('in')
+class InNode(OperatorNode):
+    """
+    A comparison node that takes a terminal node and a list
+    literal, and returns True if the value is in the list
+    """
+    precedence = 8
+    associativity = 'left'
+    def __init__(self, left, right):
+        if not isinstance(right, ListLiteralNode):
+            raise errors.ParsingError('Expected a list after in, got {}'.format(right))
+        OperatorNode.__init__(self, left, right)
+
+    def execute(self, resource):
+        return self.left.execute(resource) in self.right.value
+
+    def to_source(self, namespace):
+        return '({} in {})'.format(self.left.to_source(namespace),
+                                  self.right.to_source(namespace))
+
+    def execute_batch(self, table):
+        values = self.right.value
+        return [value in values for value in self.left.execute_batch(table)]
+
+    def __str__(self):
+        return '({} in {})'.format(self.left, self.right)
+
+@operator_registry.register('~')
+class MatchNode(OperatorNode):
+    """
+    A comparison node that takes a terminal node and a regular
+    expression, and returns True if the value is a string that the
+    expression matches anywhere. Patterns given as string literals
+    are compiled once, when the rule is parsed
+    """
+    precedence = 8
+    associativity = 'left'
+    def __init__(self, left, right):
+        OperatorNode.__init__(self, left, right)
+        self.pattern = None
+        if isinstance(right, StringLiteralNode):
+            self.pattern = Pattern(right.value)
+
+    def __getstate__(self):
+        #Compiled patterns are compiled again after loading
+        state = dict(self.__dict__)
+        del state['pattern']
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['left'], state['right'])
+
+    def with_children(self, children):
+        return type(self)(*children)
+
+    def execute(self, resource):
+        if self.pattern is not None:
+            return self.pattern.matches(self.left.execute(resource))
+        return get_pattern_match(self.left.execute(resource), self.right.execute(resource))
+
+    def to_source(self, namespace):
+        if self.pattern is None:
+            return '{}({}, {})'.format(bind(namespace, get_pattern_match),
+                                       self.left.to_source(namespace),
+                                       self.right.to_source(namespace))
+        return '{}({})'.format(bind(namespace, self.pattern.matches),
+                               self.left.to_source(namespace))
+
+    def execute_batch(self, table):
+        values = self.left.execute_batch(table)
+        if self.pattern is not None:
+            return list(map(self.pattern.matches, values))
+        return list(map(get_pattern_match, values, self.right.execute_batch(table)))
+
+    def __str__(self):
+        return '({} ~ {})'.format(self.left, self.right)
+
+class LiteralNode(Node):
+    """
+    The base of nodes which represent a constant `value`
+    in a Rule, which can be compared etc with other values
+    """
+    value = None
+
+    def execute(self, resource):
+        return self.value
+
+    def to_source(self, namespace):
+        return bind(namespace, self.value)
+
+    def signature(self):
+        return (type(self), type(self.value), self.value)
+
+    def execute_batch(self, table):
+        return [self.value] * len(table)
+
+class IntLiteralNode(LiteralNode):
     """
     Represents an integer in a Rule which can be compared
     etc with other values
@@ -203,13 +521,10 @@ class IntLiteralNode(Node):
         except:
             raise errors.ParsingError('Invalid int literal: {}'.format(token))
 
-    def execute(self, resource):
-        return self.value
-
     def __str__(self):
         return '{}'.format(self.value)
 
-class StringLiteralNode(Node):
+class StringLiteralNode(LiteralNode):
     """
     Represents an string in a Rule which can be compared
     etc with other values
@@ -217,16 +532,13 @@ class StringLiteralNode(Node):
     def __init__(self, token):
         self.value = token[1:-1]
 
-    def execute(self, resource):
-        return self.value
-
     def __str__(self):
         return '"{}"'.format(self.value)
 
     def __eq__(self, other):
         return self.value == other.value
 
-class BooleanLiteralNode(Node):
+class BooleanLiteralNode(LiteralNode):
     """
     Represents an boolean in a Rule which can be compared
     etc with other values
@@ -241,23 +553,35 @@ class BooleanLiteralNode(Node):
         else:
             raise errors.ParsingError('Invalid boolean literal: {}'.format(token))
 
-    def execute(self, resource):
-        return self.value
-
     def __str__(self):
         return '{}'.format(self.value)
 
-class NoneNode(Node):
+class NoneNode(LiteralNode):
     """
     Represents a None value in a Rule which can be compared
     etc with other values
     """
-    def execute(self, resource):
-        return None
-
     def __str__(self):
         return 'None'
 
+class ListLiteralNode(LiteralNode):
+    """
+    Represents a list of literals in a Rule, which values can
+    be looked up in. The list's value is a frozenset of the
+    literals' values, so looking a value up is constant time
+    """
+    def __init__(self, items):
+        self.items = []
+        seen = set()
+        for item in items:
+            if item.signature() not in seen:
+                seen.add(item.signature())
+                self.items.append(item)
+        self.value = frozenset(item.value for item in self.items)
+
+    def __str__(self):
+        return '[{}]'.format(', '.join(str(item) for item in self.items))
+
 class VariableNode(Node):
     """
     Represents an variable in a Rule which can be compared
@@ -265,38 +589,224 @@ class VariableNode(Node):
     values in a resource
     """
     def __init__(self, variable_name):
-        self.variable_name = variable_name
+        self.variable_name = str(variable_name)
+        self.path = tuple(self.variable_name.split('.'))
+        self.getter = build_variable_getter(self.path)
 
     def execute(self, resource):
-        path = self.variable_name.split('.')
-        value = resource
-        for path_item in path:
+        return self.getter(resource)
+
+    def __getstate__(self):
+        return {'variable_name': self.variable_name}
+
+    def __setstate__(self, state):
+        self.__init__(state['variable_name'])
+
+    def to_source(self, namespace):
+        return '{}(resource)'.format(bind(namespace, self.getter))
+
+    def signature(self):
+        return (VariableNode, self.variable_name)
+
+    def execute_batch(self, table):
+        return table.column(self.variable_name, self.build_column)
+
+    def build_column(self, table):
+        """
+        Looks this variable up in every resource in the given ResourceTable.
+        In tables of plain dicts, each key of the path is looked up in the
+        whole column with `dict.get`, and the values are type checked for
+        the whole column at once
+        """
+        if not table.records_are_dicts:
+            return list(map(self.getter, table.records))
+
+        column = table.records
+        for key in self.path[:-1]:
+            column = [value.get(key, EMPTY_RECORD) for value in column]
+            if not DICT_TYPE_SET.issuperset(map(type, column)):
+                return list(map(self.getter, table.records))
+
+        key = self.path[-1]
+        column = [value.get(key) for value in column]
+        if VARIABLE_TYPE_SET.issuperset(map(type, column)):
+            return column
+        return [check_variable_type(value) for value in column]
+
+    def __str__(self):
+        return '{}'.format(self.variable_name)
+
+def check_variable_type(value):
+    """
+    Returns the given variable value if it's of a type that
+    can be used in a rule, raising a ParsingError otherwise
+    """
+    if type(value) in VARIABLE_TYPE_SET or isinstance(value, VARIABLE_TYPES): # pylint: disable=unidiomatic-typecheck
+        return value
+    raise errors.ParsingError('Unknown datatype: {}'.format(type(value)))
+
+def build_variable_getter(path):
+    """
+    Builds a function which looks up the given path of keys in a
+    resource, returning None if any of the keys is missing. Paths with
+    one or two keys, e.g. `tag:Name` or `State.Name`, get a specialised
+    function that doesn't loop over the path
+    """
+    if len(path) == 1:
+        key = path[0]
+        def get_variable(resource):
+            try:
+                value = resource[key]
+            except KeyError:
+                return None
+            return check_variable_type(value)
+    elif len(path) == 2:
+        first, second = path
+        def get_variable(resource):
+            try:
+                value = resource[first][second]
+            except KeyError:
+                return None
+            return check_variable_type(value)
+    else:
+        def get_variable(resource):
+            value = resource
             try:
-                value = value[path_item]
+                for key in path:
+                    value = value[key]
             except KeyError:
-                value = None
-                break
+                return None
+            return check_variable_type(value)
+    return get_variable
+
+class Pattern(object):
+    """
+    A compiled regular expression, which only matches strings. Patterns
+    that every match has to start with, or contain, some literal text
+    check for it with a string method before running the expression
+    """
+    def __init__(self, source):
+        try:
+            self.regex = regex.compile(source)
+        except regex.error as err:
+            raise errors.ParsingError('Invalid pattern {}: {}'.format(source, err))
+        self.source = source
+        self.prefix, self.anchored = get_literal_prefix(source)
 
-        allowed_types = (str, int, bool, type(None))
-        if isinstance(value, allowed_types):
-            return value
+    def __getstate__(self):
+        return {'source': self.source}
+
+    def __setstate__(self, state):
+        self.__init__(state['source'])
+
+    def matches(self, value):
+        """
+        Returns whether this pattern matches anywhere in the given value
+        """
+        if not isinstance(value, str):
+            return False
+        if self.prefix:
+            if self.anchored:
+                if not value.startswith(self.prefix):
+                    return False
+            elif self.prefix not in value:
+                return False
+        return self.regex.search(value) is not None
+
+def get_literal_prefix(source):
+    """
+    Returns the literal text that every match of the given regular
+    expression starts with, and whether the expression is anchored to the
+    start of the string, so that the text has to start the string rather
+    than just be in it. The text is empty if it isn't obvious what it is
+    """
+    anchored = source.startswith('^')
+    if '|' in source or '(?' in source:
+        return '', anchored
+    start = 1 if anchored else 0
+    end = start
+    while end < len(source) and source[end] not in PATTERN_METACHARACTERS:
+        end += 1
+    prefix = source[start:end]
+    if end < len(source) and source[end] in PATTERN_QUANTIFIERS:
+        #The quantifier applies to the last character, which may not appear
+        prefix = prefix[:-1]
+    return prefix, anchored
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def get_pattern(source):
+    """
+    Returns the Pattern with the given source, or None if it isn't a valid
+    regular expression. Patterns built from values while evaluating rules are
+    compiled once, in a cache shared by every rule and bounded in size, and
+    so are the failures to compile them
+    """
+    try:
+        return Pattern(source)
+    except errors.ParsingError:
+        return None
+
+def get_pattern_match(value, source):
+    """
+    Returns whether the pattern with the given source matches anywhere in
+    the given value. Neither matches anything unless it's a string, and
+    a pattern which isn't a valid regular expression matches nothing, so
+    that one resource's bad value can't stop every rule being evaluated
+    """
+    if not isinstance(source, str):
+        return False
+    pattern = get_pattern(source)
+    return pattern is not None and pattern.matches(value)
+
+def bind(namespace, value):
+    """
+    Binds the given value to a new name in the given
+    namespace for generated source, returning the name
+    """
+    name = '_{}'.format(len(namespace))
+    namespace[name] = value
+    return name
+
+def chain_to_source(node, node_class, keyword, namespace):
+    """
+    Returns the source of a chain of nodes of the same logical
+    operator as one flat expression, e.g. `(a or b or c)` rather than
+    `((a or b) or c)`, so that long chains don't nest too deeply
+    """
+    operands = []
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, node_class):
+            pending.append(current.right)
+            pending.append(current.left)
         else:
-            raise errors.ParsingError('Unknown datatype: {}'.format(type(value)))
+            operands.append(current.to_source(namespace))
+    return '({})'.format(' {} '.format(keyword).join(operands))
 
-    def __str__(self):
-        return '{}'.format(self.variable_name)
+def short_circuit_batch(right, table, left, undecided):
+    """
+    Finishes executing a batch of & or | nodes given the values of their
+    left side. `right` is only executed over the resources whose entry in
+    `undecided` is truthy, just as `execute` would only execute it for them
+    """
+    positions = list(itertools.compress(range(len(left)), undecided))
+    if not positions:
+        return left
+    if len(positions) == len(left):
+        return right.execute_batch(table)
+
+    values = list(left)
+    for position, value in zip(positions, right.execute_batch(table.subset(positions))):
+        values[position] = value
+    return values
 
 def expect(token, tokens):
     """
     Raises a Parsing error if the given token is not the first
-    token in the given tokens queue. Otherwise, pops it from the
-    tokens array
+    token in the given tokens stream. Otherwise, consumes it
     """
-    if tokens[0] != token:
-        raise errors.ParsingError(
-            'Invalid next token. Expected {}, got {}'.format(token, tokens[0])
-        )
-    tokens.pop(0)
+    as_token_stream(tokens).expect(token)
 
 def isolate_condition(tokens):
     """
@@ -306,7 +816,9 @@ def isolate_condition(tokens):
     start with a condition
     """
     if tokens[0] != '(':
-        raise errors.ParsingError('Invalid start to condition: {}'.format(tokens[0]))
+        raise errors.ParsingError('Invalid start to condition: {}{}'.format(
+            tokens[0], describe_position(tokens[0])
+        ))
 
     open_brackets = 0
     i = 0
@@ -331,13 +843,20 @@ def parse_condition_to_postfix(tokens):
     Parses a postfix expression out of the given tokens array, raising
     a ParsingError if the tokens array starts with an invalid condition
     """
-    condition = tokens[:isolate_condition(tokens)]
+    tokens = as_token_stream(tokens)
+    condition_length = isolate_condition(tokens)
 
     operator_stack = []
     output_queue = []
-    while len(condition) > 0:
-        token = condition.pop(0)
-        if token in operator_registry:
+    i = 0
+    while i < condition_length:
+        token = tokens[i]
+        i += 1
+        if token == '[':
+            list_length = isolate_list(tokens, i - 1, condition_length)
+            output_queue.append(parse_list(tokens, i - 1, list_length))
+            i += list_length - 1
+        elif token in operator_registry:
             operator1 = operator_registry[token]
             while operator_stack[-1] in operator_registry and \
                 ((operator1.associativity == 'left' and \
@@ -365,6 +884,48 @@ def parse_condition_to_postfix(tokens):
         output_queue.append(token)
     return output_queue
 
+def isolate_list(tokens, start, end):
+    """
+    Returns the length of the list literal starting at the given position
+    in the given tokens, up to and including its closing bracket, raising
+    a ParsingError if it isn't closed before the given end of the condition
+    """
+    for i in range(start + 1, end):
+        if tokens[i] == ']':
+            return i - start + 1
+        if tokens[i] in ('(', ')', '['):
+            break
+    raise errors.ParsingError('Unterminated list in condition{}'.format(
+        describe_position(tokens[start])
+    ))
+
+def parse_list(tokens, start, length):
+    """
+    Parses a ListLiteralNode out of the list literal of the given length
+    starting at the given position in the given tokens. Lists are comma
+    separated literals, e.g. `["a", "b"]`
+    """
+    items = []
+    contents = [tokens[i] for i in range(start + 1, start + length - 1)]
+    for i, token in enumerate(contents):
+        if i % 2 == 1:
+            if token != ',':
+                raise errors.ParsingError('Expected , in list, got {}{}'.format(
+                    token, describe_position(token)
+                ))
+            continue
+        item = parse_operand(token)
+        if not isinstance(item, LiteralNode):
+            raise errors.ParsingError('Lists can only contain literals, got {}{}'.format(
+                token, describe_position(token)
+            ))
+        items.append(item)
+    if contents and len(contents) % 2 == 0:
+        raise errors.ParsingError('Superfluous comma in list{}'.format(
+            describe_position(contents[-1])
+        ))
+    return ListLiteralNode(items)
+
 def parse_condition_to_ast(tokens):
     """
     Parses a condition node out of the given tokens array, raising
@@ -374,14 +935,21 @@ def parse_condition_to_ast(tokens):
 
     ast = []
     for token in output_queue:
-        if token in operator_registry:
+        if isinstance(token, ListLiteralNode):
+            ast.append(token)
+        elif token in operator_registry:
             operand1 = ast.pop()
             operand2 = ast.pop()
+            if isinstance(operand2, ListLiteralNode) or \
+               (isinstance(operand1, ListLiteralNode) and operator_registry[token] is not InNode):
+                raise errors.ParsingError('Lists can only be used after in{}'.format(
+                    describe_position(token)
+                ))
             ast.append(operator_registry[token](operand2, operand1))
         else:
             ast.append(parse_operand(token))
 
-    if len(ast) != 1:
+    if len(ast) != 1 or isinstance(ast[0], ListLiteralNode):
         raise errors.ParsingError('Invalid expression')
     return ast[0]
 
@@ -391,13 +959,13 @@ def parse_operand(operand_token):
     raising a ParsingError if we don't understand
     it
     """
-    if regex.match(r'^[0-9]+$', operand_token):
+    if INT_LITERAL_REGEX.match(operand_token):
         return IntLiteralNode(operand_token)
-    elif regex.match(r'^(".*")|(\'.*\')$', operand_token):
+    elif STRING_LITERAL_REGEX.match(operand_token):
         return StringLiteralNode(operand_token)
-    elif regex.match(r'^true|false$', operand_token):
+    elif BOOLEAN_LITERAL_REGEX.match(operand_token):
         return BooleanLiteralNode(operand_token)
-    elif regex.match(r'^[a-zA-Z0-9_:\.]+$', operand_token):
+    elif VARIABLE_REGEX.match(operand_token):
         return VariableNode(operand_token)
     else:
         raise errors.ParsingError('Invalid Operand: {}'.format(operand_token))
@@ -0,0 +1,402 @@
+"""
+This module rewrites parsed conditions into equivalent ones which are
+cheaper to evaluate. Chains of & and | nodes are flattened into single
+nodes, comparisons of literals are folded into their result, operands
+which can't change the result of a chain are removed, equalities with
+the same variable in | chains are merged into one set lookup, and the
+rest are reordered so that the ones most likely to decide the chain cheaply
+are evaluated first
+"""
+
+import operator
+import sythe.parsing.errors as errors
+import sythe.parsing.nodes as nodes
+
+#The chain node that each logical operator node is flattened into
+CHAIN_CLASSES = {
+    nodes.AndNode: nodes.AllNode,
+    nodes.AllNode: nodes.AllNode,
+    nodes.OrNode: nodes.AnyNode,
+    nodes.AnyNode: nodes.AnyNode
+}
+
+#Nodes which always evaluate to True or False
+COMPARISON_CLASSES = (nodes.EqualsNode, nodes.GreaterThanNode, nodes.LessThanNode,
+                      nodes.InNode, nodes.MatchNode)
+
+#Nodes which raise a TypeError when comparing values of different types
+ORDERING_CLASSES = (nodes.GreaterThanNode, nodes.LessThanNode)
+
+#Resources add their tags as variables with this prefix, whose values are
+#always strings. Other variables raise a ParsingError if their values are
+#lists or dicts, unless they're known not to be
+TAG_PREFIX = 'tag:'
+
+#Static estimates of how often predicates are true, when there are no
+#match rates measured for them. Resources rarely have the one value
+#that an equality is looking for
+EQUALITY_SELECTIVITY = 0.1
+DEFAULT_SELECTIVITY = 0.5
+
+#Static estimates of the cost of evaluating nodes, relative to each
+#other. Running a regular expression costs a few comparisons
+LITERAL_COST = 0.0
+VARIABLE_COST = 1.0
+OPERATOR_COST = 1.0
+PATTERN_COST = 4.0
+
+def get_chain_operands(condition, chain_class):
+    """
+    Returns the operands of the given chain of logical operator nodes, in
+    order, looking through every nested node that flattens into the same
+    chain class
+    """
+    operands = []
+    pending = [condition]
+    while pending:
+        node = pending.pop()
+        if CHAIN_CLASSES.get(type(node)) is chain_class:
+            pending.extend(reversed(node.children()))
+        else:
+            operands.append(node)
+    return operands
+
+def flatten(condition):
+    """
+    Returns a copy of the given condition with every chain of & nodes
+    replaced by an AllNode, and every chain of | nodes by an AnyNode
+    """
+    chain_class = CHAIN_CLASSES.get(type(condition))
+    if chain_class is not None:
+        return chain_class([flatten(operand)
+                            for operand in get_chain_operands(condition, chain_class)])
+    children = condition.children()
+    if not children:
+        return condition
+    return condition.with_children([flatten(child) for child in children])
+
+def get_key(node):
+    """
+    Returns a hashable value which is equal for nodes
+    that always evaluate to the same value
+    """
+    return (node.signature(), tuple(get_key(child) for child in node.children()))
+
+def fold(node):
+    """
+    Returns a BooleanLiteralNode of the value of the given node if it's
+    a comparison of literals, or else the node itself. Comparisons which
+    raise are left to raise when they're evaluated
+    """
+    if not isinstance(node, COMPARISON_CLASSES) or \
+       not all(isinstance(child, nodes.LiteralNode) for child in node.children()):
+        return node
+    try:
+        return nodes.BooleanLiteralNode(node.execute(None))
+    except TypeError:
+        return node
+
+def simplify(condition, boolean_context=True):
+    """
+    Returns a copy of the given flattened condition with comparisons of
+    literals folded, and literals and duplicates removed from chains
+    wherever that doesn't change what the condition evaluates to
+    Arguments:
+        condition - The condition to simplify
+        boolean_context - Whether only the truthiness of the condition
+                          matters, as for the condition of a rule, rather
+                          than the value, as for the operand of a comparison
+    """
+    if type(condition) in CHAIN_CLASSES:
+        return simplify_chain(flatten(condition), boolean_context)
+    children = condition.children()
+    if not children:
+        return condition
+    return fold(condition.with_children([simplify(child, False) for child in children]))
+
+def simplify_chain(chain, boolean_context):
+    """
+    Simplifies a flattened chain of & or | operands, see `simplify`.
+    A chain stops at the first operand which decides it, e.g. `false` in
+    an & chain, so the operands after it are removed. Literals which don't
+    decide it, e.g. `true` in an & chain, only matter as the last operand,
+    since the chain's value is then the literal itself
+    """
+    chain_class = type(chain)
+    decides = operator.not_ if chain_class is nodes.AllNode else bool
+    dedupe = boolean_context or is_boolean(chain)
+    operands = []
+    seen = set()
+    skipped = None
+    pending = list(reversed(chain.operands))
+    while pending:
+        operand = simplify(pending.pop(), boolean_context)
+        if type(operand) is chain_class:
+            pending.extend(reversed(operand.operands))
+            continue
+        if isinstance(operand, nodes.LiteralNode):
+            if decides(operand.value):
+                if boolean_context or not operands:
+                    #Only the truthiness of the literal matters, and the
+                    #chain has that truthiness wherever it stops
+                    return operand
+                operands.append(operand)
+                skipped = None
+                break
+            skipped = operand
+            continue
+        key = get_key(operand)
+        if dedupe and key in seen:
+            continue
+        seen.add(key)
+        operands.append(operand)
+        skipped = None
+
+    if chain_class is nodes.AnyNode and dedupe:
+        operands = merge_memberships(operands)
+    if skipped is not None and not boolean_context:
+        operands.append(skipped)
+    if not operands:
+        return skipped
+    if len(operands) == 1:
+        return operands[0]
+    return chain_class(operands)
+
+def get_membership(node):
+    """
+    Returns the (variable, literals) that the given node checks the variable
+    is one of, if it's an equality between a variable and a literal or an in
+    node on a variable, or else None
+    """
+    if isinstance(node, nodes.InNode) and isinstance(node.left, nodes.VariableNode):
+        return node.left, node.right.items
+    if not isinstance(node, nodes.EqualsNode):
+        return None
+    variable, literal = node.left, node.right
+    if isinstance(variable, nodes.LiteralNode):
+        variable, literal = literal, variable
+    if isinstance(variable, nodes.VariableNode) and isinstance(literal, nodes.LiteralNode):
+        return variable, [literal]
+    return None
+
+def merge_memberships(operands):
+    """
+    Merges the operands of an | chain which check the same variable is one
+    of some literals, e.g. `a = 1 | a = 2`, into one InNode, e.g. `a in [1, 2]`,
+    in place of the first of them. Looking the variable up in a set is
+    constant time however many literals there are. The operands between
+    them are then only evaluated when none of the merged literals match,
+    which is no more often than before
+    """
+    merged = []
+    groups = {}
+    for operand in operands:
+        membership = get_membership(operand)
+        if membership is None:
+            merged.append(operand)
+            continue
+        variable, literals = membership
+        if variable.variable_name in groups:
+            groups[variable.variable_name][2].append(operand)
+            groups[variable.variable_name][1].extend(literals)
+        else:
+            groups[variable.variable_name] = (len(merged), list(literals), [operand])
+            merged.append(operand)
+
+    for name, (position, literals, group) in groups.items():
+        if len(group) > 1:
+            merged[position] = nodes.InNode(nodes.VariableNode(name),
+                                            nodes.ListLiteralNode(literals))
+    return merged
+
+def is_boolean(node):
+    """
+    Returns whether the given node always evaluates to True or False. The
+    operands of chains of these can be reordered without changing what the
+    chain evaluates to, as `and` and `or` return one of their operands
+    """
+    if isinstance(node, (nodes.BooleanLiteralNode,) + COMPARISON_CLASSES):
+        return True
+    if type(node) in CHAIN_CLASSES:
+        return all(is_boolean(child) for child in node.children())
+    return False
+
+def may_raise(node, known_variables=()):
+    """
+    Returns whether evaluating the given node may raise a TypeError, or a
+    ParsingError for a variable whose value is of a type rules can't use.
+    Tags, and the given `known_variables`, are known to always have values
+    of types rules can use
+    """
+    if isinstance(node, ORDERING_CLASSES):
+        return True
+    if isinstance(node, nodes.VariableNode):
+        return not node.variable_name.startswith(TAG_PREFIX) and \
+            node.variable_name not in known_variables
+    return any(may_raise(child, known_variables) for child in node.children())
+
+def estimate(node, match_rates=None):
+    """
+    Estimates the cost of evaluating the given node, and how likely it is to
+    be truthy, either from the match rates measured for it or statically
+    Arguments:
+        node - The node to estimate
+        match_rates - A dict from the text of predicates to how
+                      often they were true, see `measure_match_rates`
+    Returns:
+        A (cost, probability) pair
+    """
+    chain_class = CHAIN_CLASSES.get(type(node))
+    if chain_class is not None:
+        cost = 0.0
+        #The chance of evaluating each operand, as every operand
+        #before it has to have failed to decide the chain
+        reached = 1.0
+        for operand in node.children():
+            operand_cost, probability = estimate(operand, match_rates)
+            cost += reached * operand_cost
+            reached *= probability if chain_class is nodes.AllNode else 1 - probability
+        probability = reached if chain_class is nodes.AllNode else 1 - reached
+    elif isinstance(node, nodes.LiteralNode):
+        cost, probability = LITERAL_COST, 1.0 if node.value else 0.0
+    elif isinstance(node, nodes.VariableNode):
+        cost, probability = VARIABLE_COST, DEFAULT_SELECTIVITY
+    else:
+        children = node.children()
+        cost = OPERATOR_COST + sum(estimate(child, match_rates)[0] for child in children)
+        if isinstance(node, nodes.EqualsNode) and \
+           any(isinstance(child, nodes.LiteralNode) for child in children):
+            probability = EQUALITY_SELECTIVITY
+        elif isinstance(node, nodes.InNode):
+            probability = min(1.0, EQUALITY_SELECTIVITY * len(node.right.value))
+        else:
+            probability = DEFAULT_SELECTIVITY
+        if isinstance(node, nodes.MatchNode):
+            cost += PATTERN_COST
+
+    if match_rates and str(node) in match_rates:
+        probability = match_rates[str(node)]
+    return cost, probability
+
+def get_rank(node, chain_class, match_rates=None):
+    """
+    Returns the rank of the given operand of a chain. Evaluating the
+    operands of a chain in order of rank is cheapest on average, when
+    they're independent: the cost of each operand divided by the chance
+    that it decides the chain
+    """
+    cost, probability = estimate(node, match_rates)
+    decides = 1 - probability if chain_class is nodes.AllNode else probability
+    if decides <= 0:
+        return float('inf')
+    return cost / decides
+
+def reorder(condition, match_rates=None, boolean_context=True, known_variables=()):
+    """
+    Returns a copy of the given flattened condition with the operands of
+    every chain reordered by rank, cheapest first. Chains are only reordered
+    where just their truthiness matters, see `simplify`, or where their
+    operands are all True or False, so the chain is as truthy as before.
+    Operands which may raise, see `may_raise`, are kept in their order after
+    the rest, so they're only ever evaluated on fewer resources than
+    they were before, and never raise where they didn't before
+    """
+    children = condition.children()
+    if not children:
+        return condition
+    chain_class = CHAIN_CLASSES.get(type(condition))
+    operands_context = boolean_context and chain_class is not None
+    condition = condition.with_children([reorder(child, match_rates, operands_context,
+                                                 known_variables)
+                                         for child in children])
+    if chain_class is None or not (boolean_context or is_boolean(condition)):
+        return condition
+
+    operands = condition.children()
+    safe = [operand for operand in operands if not may_raise(operand, known_variables)]
+    unsafe = [operand for operand in operands if may_raise(operand, known_variables)]
+    safe.sort(key=lambda operand: get_rank(operand, chain_class, match_rates))
+    return condition.with_children(safe + unsafe)
+
+def get_predicates(condition):
+    """
+    Returns every comparison in the given condition
+    """
+    predicates = []
+    pending = [condition]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, COMPARISON_CLASSES):
+            predicates.append(node)
+        pending.extend(node.children())
+    return predicates
+
+def measure_match_rates(conditions, resources):
+    """
+    Measures how often every comparison in the given conditions is true
+    for the given resources, e.g. a sample of those found by an earlier
+    run, so that `reorder` can use them rather than static estimates.
+    Comparisons which can't be evaluated for a resource count as false
+    Returns:
+        A dict from the text of each comparison to how often it was true
+    """
+    match_rates = {}
+    for condition in conditions:
+        for predicate in get_predicates(condition):
+            key = str(predicate)
+            if key in match_rates or not resources:
+                continue
+            matches = 0
+            for resource in resources:
+                try:
+                    if predicate.execute(resource):
+                        matches += 1
+                except (TypeError, errors.ParsingError):
+                    pass
+            match_rates[key] = matches / len(resources)
+    return match_rates
+
+def optimize(condition, match_rates=None, boolean_context=True, known_variables=()):
+    """
+    Returns an optimized copy of the given condition, which evaluates to
+    a value just as truthy for every resource, or to the same value if
+    not `boolean_context`. Optimized conditions never raise for resources
+    that the condition didn't, but may not raise for some that it did, as
+    operands which raise may be removed or evaluated for fewer resources.
+    `known_variables` are the names of variables whose values are always
+    of types rules can use, so comparisons of them can be reordered
+    """
+    return reorder(simplify(flatten(condition), boolean_context), match_rates,
+                   boolean_context, known_variables)
+
+def optimize_rule(rule, match_rates=None, known_variables=()):
+    """
+    Replaces the condition of the given rule with an optimized copy
+    """
+    rule.condition = optimize(rule.condition, match_rates, known_variables=known_variables)
+    rule.evaluate = rule.condition.execute
+    return rule
+
+def never_matches(condition):
+    """
+    Returns whether the given optimized condition is
+    a literal which no resource could ever match
+    """
+    return isinstance(condition, nodes.LiteralNode) and not condition.value
+
+def dump_tree(condition):
+    """
+    Returns a description of the given condition's tree, with one
+    node per line and each node's children indented beneath it
+    """
+    lines = []
+    pending = [(condition, 0)]
+    while pending:
+        node, depth = pending.pop()
+        children = node.children()
+        if children:
+            lines.append('{}{}'.format('  ' * depth, type(node).__name__))
+            pending.extend((child, depth + 1) for child in reversed(children))
+        else:
+            lines.append('{}{} {}'.format('  ' * depth, type(node).__name__, node))
+    return '\n'.join(lines)
@@ -5,13 +5,17 @@ from strings
 
 import sythe.parsing.tokenizer as tokenizer
 import sythe.parsing.nodes as nodes
+from sythe.instrumentation import recorder
 
 def parse_rules_from_string(rules_string):
-    tokens = tokenizer.tokenize_string(rules_string)
+    with recorder.timer('sythe_tokenize_seconds'):
+        tokens = tokenizer.TokenStream(tokenizer.tokenize_string(rules_string))
 
     rules = []
-    while len(tokens) > 0:
-        rule = nodes.RuleNode(tokens)
-        rules.append(rule)
+    with recorder.timer('sythe_parse_seconds'):
+        while len(tokens) > 0:
+            rule = nodes.RuleNode(tokens)
+            rules.append(rule)
 
+    recorder.increment('sythe_rules_parsed_total', len(rules))
     return rules
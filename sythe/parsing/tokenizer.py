@@ -4,6 +4,50 @@ tokens, ready for parsing
 """
 
 import regex
+import sythe.parsing.errors as errors
+
+#A single master pattern, tried at every position of the input exactly once.
+#Quoted strings are consumed whole, so no lookahead over the rest of the
+#input is needed to decide whether a separator is inside a string
+TOKEN_REGEX = regex.compile(r'''
+    (?P<whitespace>\s+)
+  | (?P<separator>[()\[\]{};=&|,~])
+  | (?P<word>(?:[^\s()\[\]{};=&|,~'"]+|"[^"]*"?|'[^']*'?)+)
+''', regex.VERBOSE)
+
+class Token(str):
+    """
+    A token from a rules script. Behaves exactly like the string it
+    was read from, but also remembers the line and column (both starting
+    at 1) that it started at, for error reporting
+    """
+    def __new__(cls, value, line=None, column=None):
+        token = str.__new__(cls, value)
+        token.line = line
+        token.column = column
+        return token
+
+def iter_tokens(string):
+    """
+    Scans a given string in a single pass, yielding tokens as they are found
+    Arguments:
+        string - The string to scan
+    Returns:
+        A generator of Tokens from the string
+    """
+    line = 1
+    line_start = 0
+    for match in TOKEN_REGEX.finditer(string):
+        text = match.group()
+        start = match.start()
+        if match.lastgroup != 'whitespace':
+            yield Token(text, line, start - line_start + 1)
+
+        if match.lastgroup != 'separator':
+            newlines = text.count('\n')
+            if newlines:
+                line += newlines
+                line_start = start + text.rindex('\n') + 1
 
 def tokenize_string(string):
     """
@@ -13,14 +57,85 @@ def tokenize_string(string):
     Returns:
         A list of tokens from the string
     """
-    #This regex splits on borders between tokens
-    split_anchors = [r'\s+(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)',
-                     r'(?=[()\[\]{};=&\|,])(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)',
-                     r'(?<=[()\[\]{};=&\|,])(?=(?:[^\'"]*[\'"][^\'"]*[\'"])*[^\'"]*$)']
-    border_regex = '|'.join(split_anchors)
-    tokens = regex.split(border_regex, string, flags=regex.VERSION1)
+    return list(iter_tokens(string))
+
+class TokenStream(object):
+    """
+    A cursor over a list of tokens. Parsing consumes tokens by
+    moving the cursor forward rather than removing them from the
+    front of the list, so every operation is constant time.
+    Indexing and iterating are relative to the cursor
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
 
-    #Remove empty tokens
-    tokens = [token for token in tokens if token and len(token) > 0]
+    def __len__(self):
+        return len(self.tokens) - self.position
 
-    return tokens
+    def __getitem__(self, index):
+        if index < 0:
+            raise IndexError('Negative indexes are not supported')
+        return self.tokens[self.position + index]
+
+    def __iter__(self):
+        for i in range(self.position, len(self.tokens)):
+            yield self.tokens[i]
+
+    def peek(self, offset=0):
+        """
+        Returns the token `offset` tokens ahead of the cursor
+        without consuming it. Raises an IndexError at EOF
+        """
+        return self[offset]
+
+    def advance(self, count=1):
+        """
+        Consumes `count` tokens, returning the last one
+        consumed. Raises an IndexError at EOF
+        """
+        token = self[count - 1]
+        self.position += count
+        return token
+
+    def expect(self, token):
+        """
+        Consumes the next token, raising a ParsingError if
+        it isn't the given token
+        """
+        if self.peek() != token:
+            raise errors.ParsingError('Invalid next token. Expected {}, got {}{}'.format(
+                token, self.peek(), describe_position(self.peek())
+            ))
+        self.position += 1
+
+    def mark(self):
+        """
+        Returns the current position of the cursor, which
+        can later be passed to `reset`
+        """
+        return self.position
+
+    def reset(self, mark):
+        """
+        Moves the cursor back to a position returned by `mark`
+        """
+        self.position = mark
+
+def as_token_stream(tokens):
+    """
+    Wraps a list of tokens in a TokenStream, returning
+    it as is if it already is one
+    """
+    if isinstance(tokens, TokenStream):
+        return tokens
+    return TokenStream(tokens)
+
+def describe_position(token):
+    """
+    Returns a suffix for error messages describing where
+    the given token is, or nothing if it's not known
+    """
+    if getattr(token, 'line', None) is None:
+        return ''
+    return ' at line {}, column {}'.format(token.line, token.column)
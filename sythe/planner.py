@@ -0,0 +1,207 @@
+"""
+This module plans how to fetch the resources a rule needs, pushing as
+much of the rule's condition as possible down to the API as filters, so
+that fewer resources have to be fetched and checked client side, and
+how to look the resources matching it up in indexes once they're fetched
+"""
+
+from collections import namedtuple, OrderedDict
+import copy
+import sythe.parsing.nodes as nodes
+
+#Characters which API filters treat as wildcards, or as escaping a
+#wildcard, so values containing them can't be used as exact match filters
+FILTER_WILDCARDS = ('*', '?', '\\')
+
+#The most sweeps over every target to make with different filters. Each
+#sweep costs a describe call per page per target, so past this many it's
+#cheaper to fetch every resource once
+MAX_FILTERED_SWEEPS = 4
+
+#The API filters to fetch resources with, and the part of the condition
+#which still has to be evaluated client side (or None if there isn't any)
+QueryPlan = namedtuple('QueryPlan', ['filters', 'residual'])
+
+#The (variable name, values) lookups in indexes which find the resources that
+#could match a condition, and the part of the condition which still has to
+#be evaluated on them (or None if there isn't any)
+IndexPlan = namedtuple('IndexPlan', ['lookups', 'residual'])
+
+def split_conjuncts(condition):
+    """
+    Returns the operands of a chain of & nodes, in order. A condition
+    which isn't an & node is a chain of one
+    """
+    conjuncts = []
+    pending = [condition]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, nodes.AndNode):
+            pending.append(node.right)
+            pending.append(node.left)
+        elif isinstance(node, nodes.AllNode):
+            pending.extend(reversed(node.operands))
+        else:
+            conjuncts.append(node)
+    return conjuncts
+
+def join_conjuncts(conjuncts):
+    """
+    Joins the given nodes into a chain of & nodes, returning
+    None if there aren't any
+    """
+    if not conjuncts:
+        return None
+    condition = conjuncts[0]
+    for conjunct in conjuncts[1:]:
+        condition = nodes.AndNode(condition, conjunct)
+    return condition
+
+def get_comparison(condition):
+    """
+    Returns the (variable, literal values) that the given condition checks
+    the variable is one of, if it's an equality between a variable and a
+    literal, or an in node on a variable, or else None
+    """
+    if isinstance(condition, nodes.InNode):
+        if not isinstance(condition.left, nodes.VariableNode):
+            return None
+        return condition.left, [item.value for item in condition.right.items]
+    if not isinstance(condition, nodes.EqualsNode):
+        return None
+
+    variable, literal = condition.left, condition.right
+    if isinstance(variable, nodes.LiteralNode):
+        variable, literal = literal, variable
+    if not isinstance(variable, nodes.VariableNode) or \
+       not isinstance(literal, nodes.LiteralNode):
+        return None
+    return variable, [literal.value]
+
+def get_filter(condition, filterable_fields):
+    """
+    Returns the (filter name, values) that the given condition is equivalent
+    to, or None if it can't be pushed down. Only equality between a filterable
+    variable and a string literal, or an in node on a filterable variable and
+    a list of strings, can be. Variables of the form `tag:<Key>` are
+    filterable by the tag with that key
+    """
+    comparison = get_comparison(condition)
+    if comparison is None:
+        return None
+    variable, values = comparison
+    if not values or not all(isinstance(value, str) for value in values):
+        return None
+    if any(wildcard in value for value in values for wildcard in FILTER_WILDCARDS):
+        return None
+
+    name = variable.variable_name
+    values = sorted(values)
+    if name in filterable_fields:
+        return (filterable_fields[name], values)
+    if name.startswith('tag:') and len(variable.path) == 1:
+        return (name, values)
+    return None
+
+def plan_query(condition, filterable_fields):
+    """
+    Plans how to fetch the resources matching the given condition, pushing
+    every top level conjunct which is an equality or in node on a filterable
+    field down into a filter. Only one conjunct can be pushed per filter,
+    as filters with many values match any of them
+    Arguments:
+        condition - The condition to plan
+        filterable_fields - A dict from variable names to the names of the
+                            API filters that match them
+    Returns:
+        A QueryPlan
+    """
+    filters = OrderedDict()
+    residual = []
+    for conjunct in split_conjuncts(condition):
+        pushed = get_filter(conjunct, filterable_fields)
+        if pushed is not None and pushed[0] not in filters:
+            filters[pushed[0]] = pushed[1]
+        else:
+            residual.append(conjunct)
+
+    filters = [{'Name': name, 'Values': values} for name, values in filters.items()]
+    return QueryPlan(filters, join_conjuncts(residual))
+
+def get_lookup(condition):
+    """
+    Returns the (variable name, values) that the given condition is equivalent
+    to looking up in an index, or None if it can't be looked up. Only
+    equality between a variable and a literal, or an in node on a
+    variable, can be. A match node on a variable with a string literal
+    pattern is looked up as its compiled Pattern rather than values
+    """
+    if isinstance(condition, nodes.MatchNode):
+        if condition.pattern is None or not isinstance(condition.left, nodes.VariableNode):
+            return None
+        return (condition.left.variable_name, condition.pattern)
+    comparison = get_comparison(condition)
+    if comparison is None:
+        return None
+    variable, values = comparison
+    return (variable.variable_name, values)
+
+def plan_index_lookups(condition):
+    """
+    Plans how to find the resources matching the given condition with
+    indexes, looking up every top level conjunct which is an equality
+    between a variable and a literal, or an in or match node on a variable,
+    so that only the resources with one of those values for each have the
+    rest of the condition evaluated on them
+    Returns:
+        An IndexPlan
+    """
+    lookups = []
+    residual = []
+    for conjunct in split_conjuncts(condition):
+        lookup = get_lookup(conjunct)
+        if lookup is not None:
+            lookups.append(lookup)
+        else:
+            residual.append(conjunct)
+    return IndexPlan(lookups, join_conjuncts(residual))
+
+def plan_rule(rule, filterable_fields):
+    """
+    Plans how to fetch the resources matching the given rule, returning
+    the filters to fetch them with, and a copy of the rule which only
+    evaluates the part of the condition that wasn't pushed down
+    """
+    plan = plan_query(rule.condition, filterable_fields)
+    residual_rule = copy.copy(rule)
+    residual_rule.condition = plan.residual or nodes.BooleanLiteralNode(True)
+    residual_rule.evaluate = residual_rule.condition.execute
+    return plan.filters, residual_rule
+
+def group_rules_by_filters(rules, filterable_fields, max_sweeps=MAX_FILTERED_SWEEPS):
+    """
+    Plans every rule, grouping together the rules that can be fetched with
+    the same filters so they share one fetch. Filters are only worth using when
+    they save fetching every resource and the rules still run in the order
+    they're given, so every rule is put in one group fetched without filters if
+    any rule can't be filtered, if there are more than `max_sweeps` groups,
+    or if the rules with the same filters aren't next to each other
+    Returns:
+        A list of (filters, rules) pairs, where the rules only evaluate
+        the part of their condition which wasn't pushed down
+    """
+    rules = list(rules)
+    groups = OrderedDict()
+    last_key = None
+    for rule in rules:
+        filters, residual_rule = plan_rule(rule, filterable_fields)
+        key = tuple((item['Name'], tuple(item['Values'])) for item in filters)
+        if not key or (key in groups and key != last_key):
+            return [([], rules)]
+        if key not in groups:
+            groups[key] = (filters, [])
+        groups[key][1].append(residual_rule)
+        last_key = key
+    if len(groups) > max_sweeps:
+        return [([], rules)]
+    return list(groups.values())
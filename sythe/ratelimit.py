@@ -0,0 +1,201 @@
+"""
+This module provides client side rate limiting for AWS calls, with
+token buckets that slow down when AWS starts throttling requests and
+speed back up once it stops
+"""
+
+import random
+import threading
+import time
+from sythe.instrumentation import recorder
+
+#Error codes AWS uses to say a request was throttled
+THROTTLING_ERROR_CODES = frozenset([
+    'RequestLimitExceeded',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException'
+])
+
+#Operations starting with these prefixes only read state, and are
+#limited by the read budget. Everything else is limited by the mutate budget
+READ_OPERATION_PREFIXES = ('describe_', 'get_', 'list_')
+
+DEFAULT_READ_RATE = 20.0
+DEFAULT_MUTATE_RATE = 5.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_BACKOFF = 0.1
+
+def get_error_code(err):
+    """
+    Returns the AWS error code of the given exception, as raised
+    by boto3, or None if it isn't an error from AWS
+    """
+    response = getattr(err, 'response', None)
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
+
+def is_throttling_error(err):
+    """
+    Returns whether the given exception, as raised by
+    boto3, means the request was throttled
+    """
+    return get_error_code(err) in THROTTLING_ERROR_CODES
+
+class TokenBucket(object):
+    """
+    A token bucket which lets through `rate` calls per second on average,
+    with bursts of up to `capacity` calls. The rate halves every time a
+    call is throttled, down to `min_rate`, and creeps back up to the
+    starting rate as calls succeed
+    """
+    def __init__(self, rate, capacity=None, min_rate=None, clock=time.monotonic):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min_rate if min_rate is not None else self.max_rate / 50
+        self.capacity = capacity if capacity is not None else self.max_rate * 2
+        self.increase = self.max_rate / 20
+        self.tokens = self.capacity
+        self.clock = clock
+        self.last_refill = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token from the bucket, returning how long
+        the caller has to wait before it may use it
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def on_throttle(self):
+        """
+        Halves the rate of this bucket, and drops any saved up burst
+        """
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self):
+        """
+        Moves the rate of this bucket back towards its starting rate
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+class RateLimitMetrics(object):
+    """
+    Counts calls, throttle events, retries and time spent waiting,
+    per rate limiting budget
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.budgets = {}
+
+    def record(self, budget, calls=0, throttle_events=0, retries=0, wait_time=0.0):
+        """
+        Adds the given counts to the given budget's metrics
+        """
+        with self.lock:
+            if budget not in self.budgets:
+                self.budgets[budget] = {
+                    'calls': 0,
+                    'throttle_events': 0,
+                    'retries': 0,
+                    'wait_time': 0.0
+                }
+            metrics = self.budgets[budget]
+            metrics['calls'] += calls
+            metrics['throttle_events'] += throttle_events
+            metrics['retries'] += retries
+            metrics['wait_time'] += wait_time
+
+    def as_dict(self):
+        """
+        Returns a copy of the metrics of every budget, keyed by budget name
+        """
+        with self.lock:
+            return dict((budget, dict(metrics)) for budget, metrics in self.budgets.items())
+
+class RateLimiter(object):
+    """
+    A pair of TokenBucket budgets, one for reads and one for mutations,
+    which can be shared by many clients
+    """
+    def __init__(self, read_rate=DEFAULT_READ_RATE, mutate_rate=DEFAULT_MUTATE_RATE,
+                 clock=time.monotonic):
+        self.buckets = {
+            'read': TokenBucket(read_rate, clock=clock),
+            'mutate': TokenBucket(mutate_rate, clock=clock)
+        }
+        self.metrics = RateLimitMetrics()
+
+    def budget_for(self, operation):
+        """
+        Returns the name of the budget that the given operation is limited by
+        """
+        return 'read' if operation.startswith(READ_OPERATION_PREFIXES) else 'mutate'
+
+class RateLimitedClient(object):
+    """
+    Wraps an AWS client so that every call waits for its budget in the given
+    RateLimiter, and throttled calls are retried with exponential backoff
+    """
+    def __init__(self, client, limiter, max_retries=DEFAULT_MAX_RETRIES,
+                 base_backoff=DEFAULT_BASE_BACKOFF, sleep=time.sleep):
+        self.client = client
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.sleep = sleep
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        budget = self.limiter.budget_for(name)
+        def call(*args, **kwargs):
+            """
+            Calls the wrapped client once there's room in the budget,
+            retrying if the call is throttled
+            """
+            return self.call(budget, attribute, args, kwargs, name)
+        return call
+
+    def call(self, budget, method, args, kwargs, operation=None):
+        """
+        Calls the given method, limited by the given budget. The latency
+        of each attempt is recorded under the name of the operation
+        """
+        bucket = self.limiter.buckets[budget]
+        metrics = self.limiter.metrics
+        for attempt in range(self.max_retries + 1):
+            wait = bucket.reserve()
+            if wait > 0:
+                self.sleep(wait)
+            metrics.record(budget, calls=1, wait_time=wait)
+            try:
+                with recorder.timer('sythe_api_call_seconds', operation=operation):
+                    result = method(*args, **kwargs)
+            except Exception as err:
+                recorder.increment('sythe_api_errors_total', operation=operation)
+                if not is_throttling_error(err):
+                    raise
+                bucket.on_throttle()
+                metrics.record(budget, throttle_events=1)
+                if attempt == self.max_retries:
+                    raise
+                backoff = random.uniform(0, self.base_backoff * 2 ** attempt)
+                self.sleep(backoff)
+                metrics.record(budget, retries=1, wait_time=backoff)
+            else:
+                bucket.on_success()
+                return result
@@ -1,4 +1,15 @@
+import importlib
 from sythe.errors import RegistryCollisionError
+
+class LazyEntry(object):
+    """
+    A name registered without importing the module that defines the
+    class. The module is imported when the class is first looked up,
+    and registers the class itself
+    """
+    def __init__(self, module_name):
+        self.module_name = module_name
+
 class Registry:
     """
     A class which provides a registration service.
@@ -11,17 +22,36 @@ class Registry:
     def register(self, name):
         """Used as a decorator, to register a class under a given name"""
         def register_class(klass):
-            if name in self.registered:
+            if name in self.registered and not isinstance(self.registered[name], LazyEntry):
                 raise RegistryCollisionError('Name {} already in Registry'.format(name))
             self.registered[name] = klass
             return klass
         return register_class
 
+    def register_lazy(self, name, module_name):
+        """
+        Registers a name for a class that the given module registers when
+        it's imported, without importing it until the class is looked up
+        """
+        if name in self.registered:
+            raise RegistryCollisionError('Name {} already in Registry'.format(name))
+        self.registered[name] = LazyEntry(module_name)
+
     def __contains__(self, key):
         return key in self.registered
 
     def __getitem__(self, key):
-        return self.registered[key]
+        entry = self.registered[key]
+        if isinstance(entry, LazyEntry):
+            importlib.import_module(entry.module_name)
+            entry = self.registered[key]
+            if isinstance(entry, LazyEntry):
+                raise KeyError('{} didn\'t register {}'.format(entry.module_name, key))
+        return entry
 
 resource_registry = Registry()
 operator_registry = Registry()
+
+#Resources are registered by the modules that define them, which
+#import their SDKs, so they're only imported once they're needed
+resource_registry.register_lazy('ec2_instance', 'sythe.resources.ec2_resources')
@@ -0,0 +1,161 @@
+"""
+This module provides a compact representation of EC2 instances, which only
+keeps the values that rules reference rather than the whole describe_instances
+payload, loading the rest only if an action needs it
+"""
+
+import sys
+from datetime import datetime
+from sythe.resources.core import get_deletion_time, resource_action
+from sythe.resources.ec2_resources import EC2Instance
+
+TAG_PREFIX = 'tag:'
+
+#Stands in for the values of fields that an instance doesn't have
+MISSING = object()
+
+def get_fields(paths):
+    """
+    Returns the top level keys of instances needed to look up the values at
+    the given paths, e.g. from `analysis.required_paths`, mapped to the
+    position of their values in compact instances. Tags are always kept, so
+    aren't included
+    """
+    keys = sorted(set(path[0] for path in paths if not path[0].startswith(TAG_PREFIX)))
+    return dict((sys.intern(key), i) for i, key in enumerate(keys))
+
+def get_tags(data):
+    """
+    Returns the tags in the given describe_instances payload as a dict. Keys
+    and values are interned, since the same ones are used across most of a fleet
+    """
+    return dict((sys.intern(tag['Key']), sys.intern(tag['Value'])) for tag in data.get('Tags', ()))
+
+class InstanceNotFoundError(Exception):
+    """
+    Raised when a compact instance is described again, but no longer exists
+    """
+    pass
+
+class CompactEC2Instance(object):
+    """
+    An EC2 instance which only keeps its ID, its tags, and the top level values
+    of the given fields, in a tuple laid out by the mapping from `get_fields`
+    that all instances share. It can be used in place of
+    an EC2Instance: looking up any other value, or performing an action which
+    needs more than the instance's ID and tags, describes the instance again
+    and keeps the whole payload from then on
+    """
+    __slots__ = ('instance_id', 'fields', 'values', 'tags', 'client',
+                 'region', 'account', 'full_instance')
+    id_key = 'InstanceId'
+
+    def __init__(self, data, client, fields):
+        self.instance_id = data['InstanceId']
+        self.fields = fields
+        self.values = tuple(data.get(key, MISSING) for key in fields)
+        self.tags = get_tags(data)
+        self.client = client
+        self.region = None
+        self.account = None
+        self.full_instance = None
+
+    def __getitem__(self, key):
+        position = self.fields.get(key)
+        if position is not None:
+            value = self.values[position]
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        if key.startswith(TAG_PREFIX):
+            return self.tags[key[len(TAG_PREFIX):]]
+        if key == self.id_key:
+            return self.instance_id
+        return self.load()[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __getattr__(self, name):
+        #Only called for attributes that aren't slots or methods, so
+        #this is an action of EC2Instance, which needs the whole payload
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attribute = getattr(self.load(), name)
+        if not callable(attribute):
+            return attribute
+
+        def perform(*args, **kwargs):
+            """
+            Performs the action on the whole instance, then picks up any tags it changed
+            """
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self.tags = get_tags(self.full_instance.data)
+        return perform
+
+    def __str__(self):
+        values = dict((key, self.values[position]) for key, position in self.fields.items()
+                      if self.values[position] is not MISSING)
+        return str(dict(values, InstanceId=self.instance_id, Tags=self.tags))
+
+    def __repr__(self):
+        return 'CompactEC2Instance({})'.format(self)
+
+    def load(self):
+        """
+        Returns the whole EC2Instance, describing it if it hasn't been already
+        """
+        if self.full_instance is None:
+            response = self.client.describe_instances(InstanceIds=[self.instance_id])
+            found = [instance for reservation in response['Reservations']
+                     for instance in reservation['Instances']]
+            if not found:
+                raise InstanceNotFoundError(
+                    'Instance {} no longer exists'.format(self.instance_id)
+                )
+            data = found[0]
+            self.full_instance = EC2Instance(data, self.client)
+            self.full_instance.region = self.region
+            self.full_instance.account = self.account
+        return self.full_instance
+
+    @resource_action(['key', 'value'])
+    def tag(self, args):
+        """
+        Adds a tag to this instance, without needing the whole payload
+        """
+        key = args['key']
+        value = args['value']
+        if self.full_instance is not None:
+            self.full_instance.tag(args)
+        else:
+            self.client.create_tags(
+                Resources=[self.instance_id],
+                Tags=[{'Key': key, 'Value': value}]
+            )
+        self.tags[sys.intern(key)] = value
+
+    @resource_action([])
+    def delete(self, args):
+        """
+        Terminates this instance, without needing the whole payload
+        """
+        self.client.terminate_instances(InstanceIds=[self.instance_id])
+
+    @resource_action(['after'])
+    def mark_for_deletion(self, args):
+        """
+        Marks this instance for deletion after a given period of time, and
+        deletes it once that's passed, using the tags it keeps rather
+        than the whole payload
+        """
+        if 'SytheDeletionTime' not in self.tags:
+            self.tag({'key': 'SytheDeletionTime', 'value': get_deletion_time(args['after'])})
+        if datetime.now().timestamp() >= float(self.tags['SytheDeletionTime']):
+            self.delete(args)
@@ -1,5 +1,4 @@
 from datetime import datetime
-import parsedatetime
 import sythe.errors as errors
 
 def filter_resources(resources, condition):
@@ -26,11 +25,33 @@ def resource_action(required_args):
         return wrapper
     return enforce_args
 
+def get_deletion_time(after):
+    """
+    Returns the value of the SytheDeletionTime tag for a resource
+    to be deleted after the given timespan, e.g. "3 days"
+    """
+    import parsedatetime
+    cal = parsedatetime.Calendar()
+    time_struct, parse_status = cal.parse(after)
+    if parse_status == 0:
+        raise errors.InvalidArgumentError(
+            'Invalid timespan: {}'.format(after)
+        )
+    return str(datetime(*time_struct[:6]).timestamp())
+
 class Resource(object):
     """
     A Base Resource class which is the parent class of all resources that
     we can define rules over. Defines a number of default actions.
     """
+    #The region and account this resource was discovered in, if known
+    region = None
+    account = None
+    #The key of the value which identifies this resource, if it has one
+    id_key = None
+    #Variables that actions look up themselves, by action name
+    action_variables = {'mark_for_deletion': ['tag:SytheDeletionTime']}
+
     def __init__(self, data, client):
         self.data = data
         self.client = client
@@ -72,18 +93,12 @@ class Resource(object):
         If resources continue to match the rule, they are deleted after a time
         """
         if not 'tag:SytheDeletionTime' in self.data:
-            cal = parsedatetime.Calendar()
-            time_struct, parse_status = cal.parse(args['after'])
-            if parse_status == 0:
-                raise errors.InvalidArgumentError(
-                    'Invalid timespan: {}'.format(args['after'])
-                )
-            time = datetime(*time_struct[:6])
-            self.tag({'key': 'SytheDeletionTime', 'value': str(time.timestamp())})
-            self.data['tag:SytheDeletionTime'] = str(time.timestamp())
+            deletion_time = get_deletion_time(args['after'])
+            self.tag({'key': 'SytheDeletionTime', 'value': deletion_time})
+            self.data['tag:SytheDeletionTime'] = deletion_time
             self.data['Tags'].append({
                 'Key': 'SytheDeletionTime',
-                'Value': str(time.timestamp())
+                'Value': deletion_time
             })
         now = datetime.now().timestamp()
         deletion_time = float(self.data['tag:SytheDeletionTime'])
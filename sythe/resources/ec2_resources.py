@@ -2,12 +2,29 @@ from sythe.resources.core import Resource
 from sythe.resources.core import resource_action
 from sythe.registry import resource_registry
 from sythe.aws import get_ec2_client
+from sythe.analysis import build_path_tree, project
+
+#Variables of EC2 instances that describe_instances can filter on,
+#and the names of the filters that match them exactly
+EC2_INSTANCE_FILTERS = {
+    'InstanceId': 'instance-id',
+    'InstanceType': 'instance-type',
+    'ImageId': 'image-id',
+    'KeyName': 'key-name',
+    'Placement.AvailabilityZone': 'availability-zone',
+    'PrivateIpAddress': 'private-ip-address',
+    'State.Name': 'instance-state-name',
+    'SubnetId': 'subnet-id',
+    'VpcId': 'vpc-id'
+}
 
 @resource_registry.register('ec2_instance')
 class EC2Instance(Resource):
     """
     A resource for an instance in EC2.
     """
+    id_key = 'InstanceId'
+
     def __init__(self, data, client):
         if 'Tags' in data:
             for tag in data['Tags']:
@@ -32,19 +49,53 @@ class EC2Instance(Resource):
     def delete(self, args):
         self.client.terminate_instances(InstanceIds=[self.data['InstanceId']])
 
-def get_ec2_instances(ec2_client=get_ec2_client()):
+def iter_ec2_instance_pages(ec2_client, filters=None, make_instance=EC2Instance):
+    """
+    Gets the EC2 instances visible to a given ec2 client a page at a time,
+    yielding a list of the instances in each page as it's fetched. If
+    `filters` are given, only instances matching them are fetched. Instances
+    are built by calling `make_instance` with their data and the client
+    """
+    arguments = {'Filters': filters} if filters else {}
+    instance_page = ec2_client.describe_instances(**arguments)
+    while True:
+        yield [make_instance(instance, ec2_client) for reservation in instance_page['Reservations']
+               for instance in reservation['Instances']]
+        next_token = instance_page.get('NextToken')
+        if not next_token:
+            break
+        instance_page = ec2_client.describe_instances(NextToken=next_token, **arguments)
+
+def build_ec2_instance_projection(paths):
+    """
+    Builds a function which returns a copy of the describe_instances data of
+    an instance with only the values at the given paths, e.g. from
+    `analysis.required_paths`. `tag:` paths keep just those tags, and the
+    copy always has a list of Tags for actions to add to
+    """
+    tag_keys = frozenset(path[0][len('tag:'):] for path in paths if path[0].startswith('tag:'))
+    tree = build_path_tree(path for path in paths if not path[0].startswith('tag:'))
+    keep_all_tags = 'Tags' in tree
+
+    def project_ec2_instance(data):
+        """
+        Returns the projected copy of the given instance data
+        """
+        projected = project(data, tree)
+        if not keep_all_tags:
+            projected['Tags'] = [tag for tag in data.get('Tags', ()) if tag['Key'] in tag_keys]
+        return projected
+    return project_ec2_instance
+
+def get_ec2_instances(ec2_client=None):
     """
     Gets all the EC2 instances using the configuration from a given
-    ec2 client. Handles pagination basically.
+    ec2 client, or a client for the default region if none is given.
+    Handles pagination basically.
     """
+    if ec2_client is None:
+        ec2_client = get_ec2_client()
     instances = []
-    instance_page = ec2_client.describe_instances()
-    instance_from_page = [instance for reservation in instance_page['Reservations']
-                          for instance in reservation['Instances']]
-    instances = instances + instance_from_page
-    while 'NextToken' in instance_page and instance_page['NextToken']:
-        instance_page = ec2_client.describe_instances(NextToken=instance_page['NextToken'])
-        instance_from_page = [instance for reservation in instance_page['Reservations']
-                              for instance in reservation['Instances']]
-        instances = instances + instance_from_page
-    return [EC2Instance(instance, ec2_client) for instance in instances]
+    for instance_page in iter_ec2_instance_pages(ec2_client):
+        instances.extend(instance_page)
+    return instances
@@ -0,0 +1,176 @@
+"""
+This module provides a store of resources with hash indexes over their
+values, so that the resources a rule could match are found by looking
+them up rather than by checking every resource
+"""
+
+import bisect
+import itertools
+import sythe.parsing.errors as errors
+import sythe.parsing.nodes as nodes
+from sythe.planner import plan_index_lookups
+from sythe.resources.table import ResourceTable
+
+class InventoryStore(object):
+    """
+    A batch of resources, with a hash index per variable from each of its
+    values to the positions of the resources with that value. Indexes are
+    only built when they're first looked up in, so only the variables that
+    rules compare with literals are ever indexed, and each is built once
+    however many rules look it up
+    """
+    def __init__(self, resources):
+        self.resources = resources
+        self.table = ResourceTable(resources)
+        self.indexes = {}
+        self.sorted_keys = {}
+
+    def __len__(self):
+        return len(self.resources)
+
+    def index(self, variable_name):
+        """
+        Returns the index of the given variable, a dict from each of its values
+        to the positions of the resources with that value in order, or None
+        if it can't be indexed because a resource has a value of an unknown type
+        """
+        try:
+            return self.indexes[variable_name]
+        except KeyError:
+            pass
+
+        variable = nodes.VariableNode(variable_name)
+        try:
+            column = self.table.column(variable_name, variable.build_column)
+        except errors.ParsingError:
+            index = None
+        else:
+            index = {}
+            for position, value in enumerate(column):
+                try:
+                    index[value].append(position)
+                except KeyError:
+                    index[value] = [position]
+        self.indexes[variable_name] = index
+        return index
+
+    def get_sorted_keys(self, variable_name):
+        """
+        Returns the string values in the given variable's index, sorted, so
+        that the values starting with some text are next to each other
+        """
+        if variable_name not in self.sorted_keys:
+            self.sorted_keys[variable_name] = sorted(
+                value for value in self.index(variable_name) if isinstance(value, str)
+            )
+        return self.sorted_keys[variable_name]
+
+    def match(self, variable_name, pattern):
+        """
+        Returns the positions of the resources whose value of the given
+        variable the given Pattern matches. The pattern is run once per distinct
+        value rather than once per resource, and if every match has to start
+        with some literal text, only on the range of values starting with it
+        """
+        index = self.index(variable_name)
+        keys = self.get_sorted_keys(variable_name)
+        if pattern.anchored and pattern.prefix:
+            start = bisect.bisect_left(keys, pattern.prefix)
+            keys = itertools.takewhile(lambda key: key.startswith(pattern.prefix),
+                                       itertools.islice(keys, start, None))
+        positions = set()
+        for key in keys:
+            if pattern.matches(key):
+                positions.update(index[key])
+        return positions
+
+    def lookup(self, lookups):
+        """
+        Finds the resources with one of the values of every given (variable
+        name, values), by intersecting their positions in the indexes,
+        smallest first. The values may instead be a Pattern to match
+        Returns:
+            The positions of the resources found in order, or None if none
+            of the lookups could be made, and a list of the lookups which
+            couldn't be made because their variable can't be indexed
+        """
+        found = []
+        unanswered = []
+        for variable_name, values in lookups:
+            index = self.index(variable_name)
+            if index is None:
+                unanswered.append((variable_name, values))
+            elif isinstance(values, nodes.Pattern):
+                found.append(self.match(variable_name, values))
+            elif len(values) == 1:
+                found.append(index.get(values[0], ()))
+            else:
+                positions = set()
+                for value in values:
+                    positions.update(index.get(value, ()))
+                found.append(positions)
+        if not found:
+            return None, unanswered
+
+        found.sort(key=len)
+        if len(found) == 1:
+            return sorted(found[0]), unanswered
+        positions = set(found[0])
+        for other in found[1:]:
+            if not positions:
+                break
+            positions.intersection_update(other)
+        return sorted(positions), unanswered
+
+    def invalidate(self):
+        """
+        Drops every index built so far, so that they're built
+        again after the resources have been changed
+        """
+        self.indexes = {}
+        self.sorted_keys = {}
+        self.table.invalidate()
+
+class IndexedRule(object):
+    """
+    A rule planned to be evaluated over an InventoryStore. The equalities
+    between variables and literals, and the in and match nodes on variables,
+    in its condition are looked up in the store's indexes, and only the rest of
+    the condition is evaluated, on just the resources found
+    """
+    def __init__(self, rule):
+        self.rule = rule
+        plan = plan_index_lookups(rule.condition)
+        self.lookups = plan.lookups
+        residual = plan.residual or nodes.BooleanLiteralNode(True)
+        self.evaluate_residual = residual.compile()
+
+    def select(self, store):
+        """
+        Returns the resources in the given InventoryStore that this rule matches
+        """
+        positions, unanswered = store.lookup(self.lookups)
+        #Equalities that couldn't be looked up still have to be checked,
+        #so the whole condition is evaluated rather than the residual
+        evaluate = self.rule.evaluate if unanswered else self.evaluate_residual
+        if positions is None:
+            resources = store.resources
+        else:
+            resources = map(store.resources.__getitem__, positions)
+        return [resource for resource in resources if evaluate(resource)]
+
+    def execute(self, store):
+        """
+        Performs this rule's actions on every resource in
+        the given InventoryStore that it matches
+        """
+        matched = self.select(store)
+        for resource in matched:
+            for action in self.rule.actions:
+                action.execute(resource)
+        if matched and self.rule.actions:
+            #Actions may have changed the resources, e.g. by tagging them
+            store.invalidate()
+
+    def __str__(self):
+        return str(self.rule)
@@ -0,0 +1,107 @@
+"""
+This module provides a columnar view over a batch of resources, so that
+conditions can be evaluated a column at a time rather than a resource
+at a time
+"""
+
+import itertools
+from sythe.resources.core import Resource
+
+def as_record(resource):
+    """
+    Returns what the values of the given resource can be looked up in
+    directly. For Resources which don't change how values are looked up
+    that's their data dict, which saves a method call per lookup
+    """
+    if type(resource).__getitem__ is Resource.__getitem__:
+        return resource.data
+    return resource
+
+def filter_resources_batch(resources, condition):
+    """
+    Filters the given resources with the given condition, evaluating
+    it a column at a time over all of them rather than one resource at a time
+    """
+    table = ResourceTable(resources)
+    return table.select(condition.execute_batch(table))
+
+class ResourceTable(object):
+    """
+    A batch of resources, with one column of values per variable that
+    has been looked up in them. Columns are only built when they're first
+    asked for, so only the variables a condition references are ever read
+    """
+    def __init__(self, resources, parent=None, positions=None):
+        self.resources = resources
+        self.parent = parent
+        self.positions = positions
+        self.columns = {}
+        self._records = None
+        self._records_are_dicts = None
+
+    def __len__(self):
+        return len(self.resources)
+
+    @property
+    def records(self):
+        """
+        The things that the values of each resource can be looked up in,
+        see `as_record`
+        """
+        if self._records is None:
+            self._records = [as_record(resource) for resource in self.resources]
+        return self._records
+
+    @property
+    def records_are_dicts(self):
+        """
+        Whether every record in this table is a plain dict, so
+        that its values can be looked up with `dict.get`
+        """
+        if self._records_are_dicts is None:
+            self._records_are_dicts = all(type(record) is dict for record in self.records) # pylint: disable=unidiomatic-typecheck
+        return self._records_are_dicts
+
+    def column(self, variable_name, build_column):
+        """
+        Returns the values of the given variable in every resource in
+        this table, in order. `build_column` is called with this table to
+        build the column if it hasn't been built yet
+        """
+        try:
+            return self.columns[variable_name]
+        except KeyError:
+            pass
+
+        if self.parent is not None and variable_name in self.parent.columns:
+            parent_column = self.parent.columns[variable_name]
+            column = list(map(parent_column.__getitem__, self.positions))
+        else:
+            column = build_column(self)
+        self.columns[variable_name] = column
+        return column
+
+    def invalidate(self):
+        """
+        Drops every column built so far, so that they're looked up
+        again after the resources have been changed
+        """
+        self.columns = {}
+
+    def subset(self, positions):
+        """
+        Returns a table of the resources at the given positions in this one.
+        Columns already built in this table are reused rather than looked up again
+        """
+        resources = list(map(self.resources.__getitem__, positions))
+        table = ResourceTable(resources, self, positions)
+        if self._records is not None:
+            table._records = list(map(self._records.__getitem__, positions))
+            table._records_are_dicts = self._records_are_dicts or None
+        return table
+
+    def select(self, mask):
+        """
+        Returns the resources in this table whose value in the given mask is truthy
+        """
+        return list(itertools.compress(self.resources, mask))
@@ -0,0 +1,175 @@
+"""
+This module compiles many rules together, so that parts of their
+conditions which they have in common are evaluated once per resource
+rather than once per rule
+"""
+
+import sythe.parsing.errors as errors
+import sythe.parsing.nodes as nodes
+from sythe.planner import split_conjuncts
+
+#Marks a shared predicate which hasn't been evaluated for the current resource yet
+UNEVALUATED = object()
+
+class SlotNode(nodes.Node):
+    """
+    Stands in for a shared predicate in the generated source of the
+    predicates built on it, looking its value up in the memo
+    """
+    def __init__(self, function):
+        self.function = function
+
+    def to_source(self, namespace):
+        return '{}(resource, memo)'.format(nodes.bind(namespace, self.function))
+
+def build_slot_function(index, compute):
+    """
+    Returns a function which computes the value of the shared predicate
+    in the given slot of the memo, if it hasn't been computed already
+    """
+    def evaluate_slot(resource, memo):
+        value = memo[index]
+        if value is UNEVALUATED:
+            value = memo[index] = compute(resource, memo)
+        return value
+    return evaluate_slot
+
+def compile_slot(node):
+    """
+    Compiles the given node, whose children are SlotNodes,
+    into a function of the resource and the memo
+    """
+    namespace = {}
+    source = 'lambda resource, memo: {}'.format(node.to_source(namespace))
+    return eval(compile(source, '<rule set>', 'eval'), namespace) # pylint: disable=eval-used
+
+class RuleSet(object):
+    """
+    A set of rules whose conditions have been hash-consed, so that every
+    distinct predicate is evaluated at most once per resource however
+    many rules it appears in. Predicates which are conjuncts of more than
+    one rule's condition are evaluated first, and when they are false every
+    rule depending on them is skipped without being evaluated
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.slots = {}
+        self.slot_functions = []
+        self.node_slots = {}
+        self.predicate_count = 0
+        self.rule_slots = [self.intern(rule.condition) for rule in self.rules]
+        self.shared_conjuncts = self.find_shared_conjuncts()
+
+    @property
+    def deduplicated(self):
+        """
+        The number of predicates which are evaluated through another,
+        identical, predicate rather than on their own
+        """
+        return self.predicate_count - len(self.slot_functions)
+
+    def intern(self, condition):
+        """
+        Adds every predicate in the given condition to this rule set, reusing
+        the slots of identical predicates that are already in it, and returns
+        the slot of the condition as a whole
+        """
+        stack = [(condition, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in self.node_slots or (node is not condition and not node.children()):
+                continue
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+
+            children = node.children()
+            key = (node.signature(), tuple(self.child_key(child) for child in children))
+            self.predicate_count += 1
+            if key not in self.slots:
+                stand_in = node.with_children([self.child_stand_in(child) for child in children])
+                self.slots[key] = len(self.slot_functions)
+                self.slot_functions.append(build_slot_function(
+                    len(self.slot_functions), compile_slot(stand_in)
+                ))
+            self.node_slots[id(node)] = self.slots[key]
+        return self.node_slots[id(condition)]
+
+    def child_key(self, child):
+        """
+        Returns what identifies the given child of a predicate
+        """
+        if id(child) in self.node_slots:
+            return ('slot', self.node_slots[id(child)])
+        return ('leaf', child.signature())
+
+    def child_stand_in(self, child):
+        """
+        Returns the node to generate the source of a predicate's child from
+        """
+        if id(child) in self.node_slots:
+            return SlotNode(self.slot_functions[self.node_slots[id(child)]])
+        return child
+
+    def find_shared_conjuncts(self):
+        """
+        Returns the slots of predicates which are top level conjuncts of more
+        than one rule, for each rule in order, most widely shared first
+        """
+        dependents = {}
+        for i, rule in enumerate(self.rules):
+            for conjunct in split_conjuncts(rule.condition):
+                if id(conjunct) in self.node_slots and conjunct is not rule.condition:
+                    dependents.setdefault(self.node_slots[id(conjunct)], set()).add(i)
+        shared = [(slot, rules) for slot, rules in dependents.items() if len(rules) > 1]
+        shared.sort(key=lambda item: (-len(item[1]), item[0]))
+        return [[slot for slot, rule_indexes in shared if i in rule_indexes]
+                for i in range(len(self.rules))]
+
+    def new_memo(self):
+        """
+        Returns a memo of the values of this set's predicates for a
+        resource, which `matches` fills in as they're evaluated
+        """
+        return [UNEVALUATED] * len(self.slot_functions)
+
+    def matches(self, index, resource, memo):
+        """
+        Returns whether the rule at the given index matches the given resource,
+        evaluating its shared conjuncts first, so that when one of them is false
+        every other rule depending on it is skipped without being evaluated
+        """
+        for slot in self.shared_conjuncts[index]:
+            try:
+                value = self.slot_functions[slot](resource, memo)
+            except (TypeError, errors.ParsingError):
+                #This rule's other conjuncts may have stopped the predicate
+                #being evaluated at all, so leave it to the rule
+                continue
+            if not value:
+                return False
+        return self.slot_functions[self.rule_slots[index]](resource, memo)
+
+    def matching_rules(self, resource):
+        """
+        Returns the rules in this set whose conditions match the given resource
+        """
+        memo = self.new_memo()
+        return [rule for i, rule in enumerate(self.rules) if self.matches(i, resource, memo)]
+
+    def execute(self, resource):
+        """
+        Performs the actions of every rule in this set that matches the given
+        resource. Rules are evaluated in order, each after the actions of the
+        rules before it, so they see what those actions changed
+        """
+        memo = self.new_memo()
+        for i, rule in enumerate(self.rules):
+            if not self.matches(i, resource, memo):
+                continue
+            for action in rule.actions:
+                action.execute(resource)
+            if rule.actions:
+                #Actions may have changed the resource, e.g. by tagging it
+                memo = self.new_memo()
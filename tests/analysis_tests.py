@@ -0,0 +1,64 @@
+import unittest
+import sythe.analysis as analysis
+import sythe.parsing.strings as strings
+from sythe.resources.ec2_resources import EC2Instance, build_ec2_instance_projection
+
+RULES = '''
+    ec2_instance(State.Name = "running" & tag:env = "dev") { tag(key: "owner", value: tag:team) }
+    ec2_instance(Placement.AvailabilityZone = "a" | Placement = "b") { mark_for_deletion(after: "1 day") }
+    ec2_instance(LaunchIndex > 1) {}
+'''
+
+def make_data():
+    return {
+        'InstanceId': 'i-1',
+        'LaunchIndex': 2,
+        'Placement': {'AvailabilityZone': 'a', 'Tenancy': 'default'},
+        'State': {'Code': 16, 'Name': 'running'},
+        'SecurityGroups': [{'GroupId': 'sg-1'}],
+        'Tags': [{'Key': 'env', 'Value': 'dev'}, {'Key': 'team', 'Value': 'a'},
+                 {'Key': 'other', 'Value': 'x'}]
+    }
+
+class RequiredPathsTests(unittest.TestCase):
+    def test_finds_paths_in_conditions_and_actions(self):
+        rules = strings.parse_rules_from_string(RULES)
+        self.assertEqual(analysis.required_paths(rules, EC2Instance), frozenset([
+            ('State', 'Name'), ('tag:env',), ('tag:team',), ('Placement', 'AvailabilityZone'),
+            ('Placement',), ('LaunchIndex',), ('InstanceId',), ('tag:SytheDeletionTime',)
+        ]))
+
+    def test_builds_path_tree(self):
+        tree = analysis.build_path_tree([('a', 'b', 'c'), ('a', 'b'), ('a', 'd'), ('e',)])
+        self.assertEqual(tree, {'a': {'b': None, 'd': None}, 'e': None})
+
+    def test_projects_values(self):
+        tree = analysis.build_path_tree([('State', 'Name'), ('Placement',), ('Missing', 'x')])
+        self.assertEqual(analysis.project(make_data(), tree), {
+            'State': {'Name': 'running'},
+            'Placement': {'AvailabilityZone': 'a', 'Tenancy': 'default'}
+        })
+
+class EC2InstanceProjectionTests(unittest.TestCase):
+    def test_projects_instances(self):
+        rules = strings.parse_rules_from_string(RULES)
+        project = build_ec2_instance_projection(analysis.required_paths(rules, EC2Instance))
+        self.assertEqual(project(make_data()), {
+            'InstanceId': 'i-1',
+            'LaunchIndex': 2,
+            'Placement': {'AvailabilityZone': 'a', 'Tenancy': 'default'},
+            'State': {'Name': 'running'},
+            'Tags': [{'Key': 'env', 'Value': 'dev'}, {'Key': 'team', 'Value': 'a'}]
+        })
+
+    def test_projected_instances_match_like_whole_ones(self):
+        rules = strings.parse_rules_from_string(RULES)
+        project = build_ec2_instance_projection(analysis.required_paths(rules, EC2Instance))
+        whole = EC2Instance(make_data(), None)
+        projected = EC2Instance(project(make_data()), None)
+        for rule in rules:
+            self.assertEqual(rule.condition.execute(projected),
+                             rule.condition.execute(whole), str(rule))
+            for action in rule.actions:
+                for name, argument in action.arguments.items():
+                    self.assertEqual(argument.execute(projected), argument.execute(whole), name)
@@ -0,0 +1,14 @@
+import unittest
+from unittest.mock import patch
+from sythe.aws import get_ec2_client
+
+class GetEC2ClientTests(unittest.TestCase):
+    def test_creates_a_session_per_client(self):
+        with patch('boto3.session.Session') as session_class, \
+             patch('boto3.client') as default_client:
+            get_ec2_client('us-east-1')
+            get_ec2_client('us-west-2', 'prod')
+        default_client.assert_not_called()
+        self.assertEqual(session_class.call_args_list[0][1], {'profile_name': None})
+        self.assertEqual(session_class.call_args_list[1][1], {'profile_name': 'prod'})
+        session_class.return_value.client.assert_called_with('ec2', region_name='us-west-2')
@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import MagicMock, call
+from botocore.exceptions import ClientError
+from sythe.batching import BatchingEC2Client, ActionResult
+from sythe.resources.ec2_resources import EC2Instance
+
+def make_client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'TerminateInstances')
+
+class BatchingEC2ClientTests(unittest.TestCase):
+    def get_instances(self, client, count):
+        return [EC2Instance({'InstanceId': 'i-{}'.format(i), 'Tags': []}, client)
+                for i in range(count)]
+
+    def test_coalesces_identical_tags(self):
+        """
+        Tests that tagging many resources with the same tag makes one call
+        """
+        stub = MagicMock()
+        client = BatchingEC2Client(stub)
+        for instance in self.get_instances(client, 5):
+            instance.tag({'key': 'a', 'value': 'b'})
+        stub.create_tags.assert_not_called()
+
+        results = client.flush()
+        stub.create_tags.assert_called_once_with(
+            Resources=['i-0', 'i-1', 'i-2', 'i-3', 'i-4'],
+            Tags=[{'Key': 'a', 'Value': 'b'}]
+        )
+        self.assertEqual(results, [ActionResult('create_tags', 'i-{}'.format(i), None)
+                                   for i in range(5)])
+
+    def test_groups_by_payload(self):
+        stub = MagicMock()
+        client = BatchingEC2Client(stub)
+        instances = self.get_instances(client, 4)
+        for i, instance in enumerate(instances):
+            instance.tag({'key': 'a', 'value': str(i % 2)})
+            instance.delete({})
+
+        client.flush()
+        self.assertEqual(stub.create_tags.call_args_list, [
+            call(Resources=['i-0', 'i-2'], Tags=[{'Key': 'a', 'Value': '0'}]),
+            call(Resources=['i-1', 'i-3'], Tags=[{'Key': 'a', 'Value': '1'}])
+        ])
+        stub.terminate_instances.assert_called_once_with(
+            InstanceIds=['i-0', 'i-1', 'i-2', 'i-3']
+        )
+
+    def test_flushes_in_chunks(self):
+        stub = MagicMock()
+        client = BatchingEC2Client(stub, max_batch_size=3)
+        for instance in self.get_instances(client, 7):
+            instance.delete({})
+
+        self.assertEqual(len(client.flush()), 7)
+        self.assertEqual(stub.terminate_instances.call_args_list, [
+            call(InstanceIds=['i-0', 'i-1', 'i-2']),
+            call(InstanceIds=['i-3', 'i-4', 'i-5']),
+            call(InstanceIds=['i-6'])
+        ])
+        self.assertEqual(client.flush(), [])
+
+    def test_reports_failures_per_resource(self):
+        """
+        Tests that a chunk which fails because of some of its resources is
+        split up, so that only the resources which failed are reported as failing
+        """
+        error = make_client_error('InvalidInstanceID.NotFound')
+        def terminate_instances(InstanceIds):
+            if 'i-1' in InstanceIds:
+                raise error
+        stub = MagicMock()
+        stub.terminate_instances.side_effect = terminate_instances
+        client = BatchingEC2Client(stub)
+        for instance in self.get_instances(client, 3):
+            instance.delete({})
+
+        self.assertEqual(client.flush(), [
+            ActionResult('terminate_instances', 'i-0', None),
+            ActionResult('terminate_instances', 'i-1', error),
+            ActionResult('terminate_instances', 'i-2', None)
+        ])
+        self.assertEqual(stub.terminate_instances.call_args_list, [
+            call(InstanceIds=['i-0', 'i-1', 'i-2']),
+            call(InstanceIds=['i-0']),
+            call(InstanceIds=['i-1', 'i-2']),
+            call(InstanceIds=['i-1']),
+            call(InstanceIds=['i-2'])
+        ])
+
+    def test_fails_whole_chunks_for_other_errors(self):
+        """
+        Tests that a chunk which fails for a reason other than its resources,
+        e.g. throttling, isn't retried, as that would only make more calls
+        """
+        for error in [make_client_error('RequestLimitExceeded'), ValueError('broken')]:
+            stub = MagicMock()
+            stub.terminate_instances.side_effect = error
+            client = BatchingEC2Client(stub)
+            for instance in self.get_instances(client, 3):
+                instance.delete({})
+
+            self.assertEqual(client.flush(), [
+                ActionResult('terminate_instances', 'i-{}'.format(i), error) for i in range(3)
+            ])
+            stub.terminate_instances.assert_called_once_with(InstanceIds=['i-0', 'i-1', 'i-2'])
+
+    def test_passes_other_calls_through(self):
+        stub = MagicMock()
+        stub.describe_instances.return_value = 'pages'
+        client = BatchingEC2Client(stub)
+        self.assertEqual(client.describe_instances(NextToken='a'), 'pages')
+        stub.describe_instances.assert_called_once_with(NextToken='a')
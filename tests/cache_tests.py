@@ -0,0 +1,116 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import sythe.cache as cache
+import sythe.discovery as discovery
+import sythe.parsing.strings as strings
+from sythe.resources.ec2_resources import EC2Instance, iter_ec2_instance_pages
+from tests.resources.ec2_instances_tests import MockEC2Client
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class InventoryCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.clock = FakeClock()
+        self.target = discovery.DiscoveryTarget('account', 'region')
+        self.fetches = []
+
+    def make_cache(self, mode=cache.USE):
+        return cache.InventoryCache(self.directory, 'ec2_instance', EC2Instance, ttl=60,
+                                    mode=mode, clock=self.clock, page_size=2)
+
+    def fetch_pages(self, client):
+        self.fetches.append(client)
+        return iter_ec2_instance_pages(client)
+
+    def get_ids(self, inventory_cache, client):
+        pages = inventory_cache.pages(self.target, self.fetch_pages, lambda target: client)
+        return [[instance['InstanceId'] for instance in page] for page in pages]
+
+    def test_serves_fresh_resources_from_cache(self):
+        client = MockEC2Client([
+            [{'InstanceId': 'i-1', 'Tags': [{'Key': 'env', 'Value': 'dev'}]}, {'InstanceId': 'i-2'}],
+            [{'InstanceId': 'i-3', 'LaunchTime': datetime.datetime(2017, 1, 1)}]
+        ])
+        self.assertEqual(self.get_ids(self.make_cache(), client), [['i-1', 'i-2'], ['i-3']])
+        self.assertEqual(len(self.fetches), 1)
+
+        self.clock.now += 30
+        pages = list(self.make_cache().pages(self.target, self.fetch_pages, lambda target: client))
+        self.assertEqual(len(self.fetches), 1)
+        self.assertEqual([[instance['InstanceId'] for instance in page] for page in pages],
+                         [['i-1', 'i-2'], ['i-3']])
+        self.assertEqual(pages[0][0]['tag:env'], 'dev')
+        self.assertEqual(pages[1][0]['LaunchTime'], '2017-01-01 00:00:00')
+        self.assertIs(pages[0][0].client, client)
+
+    def test_fetches_stale_resources_again(self):
+        client = MockEC2Client([[{'InstanceId': 'i-1'}]])
+        self.get_ids(self.make_cache(), client)
+        self.clock.now += 61
+        client.pages = [[{'InstanceId': 'i-2'}]]
+        self.assertEqual(self.get_ids(self.make_cache(), client), [['i-2']])
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_refresh_always_fetches(self):
+        client = MockEC2Client([[{'InstanceId': 'i-1'}]])
+        self.get_ids(self.make_cache(), client)
+        client.pages = [[{'InstanceId': 'i-2'}]]
+        self.assertEqual(self.get_ids(self.make_cache(cache.REFRESH), client), [['i-2']])
+        self.assertEqual(self.get_ids(self.make_cache(), client), [['i-2']])
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_offline_never_fetches(self):
+        offline_cache = self.make_cache(cache.OFFLINE)
+        with self.assertRaises(cache.CacheMissError):
+            self.get_ids(offline_cache, None)
+
+        self.get_ids(self.make_cache(), MockEC2Client([[{'InstanceId': 'i-1'}]]))
+        self.clock.now += 3600
+        pages = list(offline_cache.pages(self.target, self.fetch_pages, None))
+        self.assertEqual([instance['InstanceId'] for instance in pages[0]], ['i-1'])
+        self.assertIsNone(pages[0][0].client)
+        self.assertEqual(len(self.fetches), 1)
+
+    def test_keeps_previous_segment_when_stopped_early(self):
+        client = MockEC2Client([[{'InstanceId': 'i-1'}]])
+        self.get_ids(self.make_cache(), client)
+
+        client.pages = [[{'InstanceId': 'i-2'}], [{'InstanceId': 'i-3'}]]
+        pages = self.make_cache(cache.REFRESH).pages(self.target, self.fetch_pages,
+                                                     lambda target: client)
+        next(pages)
+        pages.close()
+        self.assertEqual(self.get_ids(self.make_cache(), client), [['i-1']])
+        segment_directory = os.path.join(self.directory, 'account', 'region')
+        self.assertEqual(os.listdir(segment_directory), ['ec2_instance.jsonl'])
+
+    def test_discovery_uses_cache(self):
+        targets = discovery.get_targets([None], ['r1', 'r2'])
+        inventory_cache = self.make_cache()
+        client = MockEC2Client([[{'InstanceId': 'i-1'}]])
+        for _ in range(2):
+            resources = [resource for page in discovery.discover_resource_pages(
+                iter_ec2_instance_pages, targets, lambda target: client, cache=inventory_cache
+            ) for resource in page]
+            self.assertEqual(sorted(resource.region for resource in resources), ['r1', 'r2'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'default'))),
+                         ['r1', 'r2'])
+
+    def test_rules_with_actions_fetch_again(self):
+        rules = strings.parse_rules_from_string('''
+            ec2_instance(true) {}
+            ec2_instance(true) { mark_for_deletion(after: "3 days") }
+        ''')
+        self.assertEqual(cache.get_mode(cache.USE, rules[:1]), cache.USE)
+        self.assertEqual(cache.get_mode(cache.USE, rules), cache.REFRESH)
+        self.assertEqual(cache.get_mode(cache.OFFLINE, rules), cache.OFFLINE)
@@ -0,0 +1,39 @@
+import unittest
+import sythe.parsing.strings as strings
+from sythe.cli import iter_rule_matches
+from sythe.resources.core import resource_action
+from sythe.resources.ec2_resources import EC2Instance
+from sythe.resources.store import IndexedRule
+from sythe.ruleset import RuleSet
+
+RULES = '''
+    ec2_instance(State.Name = "stopped") { tag(key: "stage", value: "marked") }
+    ec2_instance(tag:stage = "marked") { tag(key: "seen", value: "yes") }
+'''
+
+class TaggingEC2Instance(EC2Instance):
+    """
+    An EC2Instance which tags itself without a client
+    """
+    @resource_action(['key', 'value'])
+    def tag(self, args):
+        self.data['tag:{}'.format(args['key'])] = args['value']
+
+class IterRuleMatchesTests(unittest.TestCase):
+    def test_later_rules_see_changes_made_by_earlier_actions(self):
+        for evaluation in ['compiled', 'shared', 'batch', 'indexed']:
+            rules = strings.parse_rules_from_string(RULES)
+            if evaluation == 'shared':
+                rules = RuleSet(rules)
+            elif evaluation == 'indexed':
+                rules = [IndexedRule(rule) for rule in rules]
+            resources = [TaggingEC2Instance({'InstanceId': 'i-{}'.format(i), 'Tags': [],
+                                             'State': {'Name': state}}, None)
+                         for i, state in enumerate(['stopped', 'running'])]
+            matches = []
+            for rule, matched in iter_rule_matches(rules, resources, evaluation):
+                matches.append([resource['InstanceId'] for resource in matched])
+                for resource in matched:
+                    for action in rule.actions:
+                        action.execute(resource)
+            self.assertEqual(matches, [['i-0'], ['i-0']], evaluation)
@@ -0,0 +1,126 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+import sythe.discovery as discovery
+from sythe.resources.ec2_resources import get_ec2_instances, iter_ec2_instance_pages
+from tests.resources.ec2_instances_tests import MockEC2Client
+
+class GetTargetsTests(unittest.TestCase):
+    def test_targets_every_region_of_every_account(self):
+        targets = discovery.get_targets(['a', 'b'], ['r1', 'r2'])
+        self.assertEqual(targets, [
+            discovery.DiscoveryTarget('a', 'r1'),
+            discovery.DiscoveryTarget('a', 'r2'),
+            discovery.DiscoveryTarget('b', 'r1'),
+            discovery.DiscoveryTarget('b', 'r2')
+        ])
+
+class DiscoverResourcesTests(unittest.TestCase):
+    def get_clients(self, targets):
+        """
+        Returns a MockEC2Client per target, with two pages
+        of instances named after the target
+        """
+        clients = {}
+        for target in targets:
+            name = '{}/{}'.format(target.account, target.region)
+            clients[target] = MockEC2Client([
+                [{'InstanceId': name + '/1'}],
+                [{'InstanceId': name + '/2'}]
+            ])
+        return clients
+
+    def test_merges_all_targets(self):
+        """
+        Tests that resources from every target are found, and are
+        tagged with the region and account they were found in
+        """
+        targets = discovery.get_targets(['a', 'b'], ['r1', 'r2', 'r3'])
+        clients = self.get_clients(targets)
+        resources = list(discovery.discover_resources(
+            get_ec2_instances, targets, clients.__getitem__, max_workers=4
+        ))
+
+        self.assertEqual(len(resources), 12)
+        for resource in resources:
+            account, region, _ = resource['InstanceId'].split('/')
+            self.assertEqual(resource.account, account)
+            self.assertEqual(resource.region, region)
+            self.assertIs(resource.client, clients[(account, region)])
+
+    def test_fetches_concurrently(self):
+        """
+        Tests that targets are fetched at the same time, by making
+        each fetch wait until every other one has started
+        """
+        targets = discovery.get_targets(['a'], ['r1', 'r2', 'r3'])
+        clients = self.get_clients(targets)
+        barrier = threading.Barrier(len(targets), timeout=5)
+
+        def fetch(client):
+            barrier.wait()
+            return get_ec2_instances(client)
+
+        resources = list(discovery.discover_resources(
+            fetch, targets, clients.__getitem__, max_workers=len(targets)
+        ))
+        self.assertEqual(len(resources), 6)
+
+    def test_raises_fetch_errors(self):
+        def fetch(client):
+            raise ValueError('Failed')
+
+        with self.assertRaises(ValueError):
+            list(discovery.discover_resources(
+                fetch, discovery.get_targets([None], ['r1']), lambda target: None
+            ))
+
+class DiscoverResourcePagesTests(unittest.TestCase):
+    def test_yields_every_page(self):
+        targets = discovery.get_targets(['a'], ['r1', 'r2'])
+        clients = dict((target, MockEC2Client([[{'InstanceId': target.region}]] * 3))
+                       for target in targets)
+        pages = list(discovery.discover_resource_pages(
+            iter_ec2_instance_pages, targets, clients.__getitem__
+        ))
+        self.assertEqual(len(pages), 6)
+        for page in pages:
+            self.assertEqual(len(page), 1)
+            self.assertEqual(page[0].region, page[0]['InstanceId'])
+
+    def test_yields_pages_before_fetching_finishes(self):
+        """
+        Tests that a page is yielded while later pages are still being
+        fetched, and that only `max_pending_pages` pages are fetched ahead
+        """
+        fetched = []
+        release = threading.Event()
+
+        def fetch_pages(client):
+            for i in range(5):
+                if i == 3:
+                    release.wait(5)
+                fetched.append(i)
+                yield [MagicMock()]
+
+        pages = discovery.discover_resource_pages(
+            fetch_pages, discovery.get_targets([None], ['r1']), lambda target: None,
+            max_workers=1, max_pending_pages=1
+        )
+        next(pages)
+        self.assertLess(len(fetched), 4)
+        release.set()
+        self.assertEqual(len(list(pages)), 4)
+        self.assertEqual(fetched, [0, 1, 2, 3, 4])
+
+    def test_stops_fetching_when_closed(self):
+        def fetch_pages(client):
+            while True:
+                yield [MagicMock()]
+
+        pages = discovery.discover_resource_pages(
+            fetch_pages, discovery.get_targets([None], ['r1']), lambda target: None,
+            max_pending_pages=1
+        )
+        next(pages)
+        pages.close()
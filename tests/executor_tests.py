@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from sythe.executor import ActionExecutor
+
+class FakeAction(object):
+    """
+    An action which records the resources it's performed on,
+    sleeping first, and failing on resources named 'bad'
+    """
+    def __init__(self, name, performed, delay=0):
+        self.action_name = name
+        self.performed = performed
+        self.delay = delay
+
+    def execute(self, resource):
+        time.sleep(self.delay)
+        if resource['name'] == 'bad':
+            raise ValueError('bad resource')
+        self.performed.append((resource['name'], self.action_name))
+
+class ActionExecutorTests(unittest.TestCase):
+    def test_orders_actions_per_resource(self):
+        performed = []
+        executor = ActionExecutor(max_workers=4)
+        resources = [{'name': str(i)} for i in range(10)]
+        actions = [FakeAction('first', performed, 0.002), FakeAction('second', performed),
+                   FakeAction('third', performed, 0.001)]
+        for action in actions:
+            for resource in resources:
+                executor.submit('rule', resource, action)
+        outcomes = executor.wait()
+        executor.shutdown()
+
+        self.assertEqual(len(outcomes), 30)
+        for resource in resources:
+            self.assertEqual([action for name, action in performed if name == resource['name']],
+                             ['first', 'second', 'third'])
+
+    def test_isolates_failures(self):
+        performed = []
+        executor = ActionExecutor(max_workers=2)
+        action = FakeAction('tag', performed)
+        for name in ['a', 'bad', 'b']:
+            executor.submit('rule', {'name': name}, action)
+        outcomes = executor.wait()
+        executor.shutdown()
+
+        self.assertEqual(sorted(performed), [('a', 'tag'), ('b', 'tag')])
+        errors = [outcome for outcome in outcomes if outcome.error is not None]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].resource, {'name': 'bad'})
+        self.assertIsInstance(errors[0].error, ValueError)
+        self.assertTrue(all(outcome.duration >= 0 for outcome in outcomes))
+
+    def test_runs_resources_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        class WaitingAction(object):
+            action_name = 'wait'
+            def execute(self, resource):
+                barrier.wait()
+
+        executor = ActionExecutor(max_workers=3)
+        for i in range(3):
+            executor.submit('rule', {'name': str(i)}, WaitingAction())
+        outcomes = executor.wait()
+        executor.shutdown()
+        self.assertEqual([outcome.error for outcome in outcomes], [None, None, None])
+
+    def test_bounds_pending_actions(self):
+        performed = []
+        executor = ActionExecutor(max_workers=1, max_pending=2)
+        action = FakeAction('tag', performed, 0.001)
+        for i in range(10):
+            executor.submit('rule', {'name': str(i)}, action)
+            self.assertLessEqual(executor.pending, 2)
+        executor.shutdown()
+        self.assertEqual(len(performed), 10)
@@ -0,0 +1,94 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import sythe.fileio as fileio
+import sythe.parsing.strings as strings
+
+RULES = '''
+ec2_instance(State.Name = "running" & (tag:env = "dev" | LaunchIndex > 2)) {
+    tag(key: "owner", value: tag:team)
+}
+ec2_instance(true) {}
+'''
+
+class BrokenPickle(object):
+    """
+    Pickles into a call which raises a ValueError when it's loaded
+    """
+    def __reduce__(self):
+        return (int, ('not a number',))
+
+class RuleCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.rules_path = os.path.join(self.directory, 'rules.sr')
+        self.write_rules(RULES)
+
+    def write_rules(self, rules):
+        with open(self.rules_path, 'w') as rules_file:
+            rules_file.write(rules)
+
+    def parse(self):
+        """
+        Parses the rules file with the cache, returning the
+        rules and how many times the rules were parsed
+        """
+        with patch('sythe.parsing.strings.parse_rules_from_string',
+                   wraps=strings.parse_rules_from_string) as parse:
+            rules = fileio.parse_rules_from_file(self.rules_path, self.cache_dir)
+        return rules, parse.call_count
+
+    def test_reuses_parsed_rules(self):
+        rules, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+        cached_rules, parsed = self.parse()
+        self.assertEqual(parsed, 0)
+        self.assertEqual([str(rule) for rule in cached_rules], [str(rule) for rule in rules])
+
+        resource = {'State': {'Name': 'running'}, 'tag:env': 'dev', 'LaunchIndex': 0}
+        for rule in cached_rules:
+            self.assertTrue(rule.evaluate(resource))
+            rule.compile()
+            self.assertTrue(rule.evaluate(resource))
+
+    def test_parses_changed_files_again(self):
+        self.parse()
+        self.write_rules('ec2_instance(false) {}')
+        rules, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(str(rules[0].condition), 'False')
+
+    def test_parses_again_for_other_versions(self):
+        self.parse()
+        with patch('sythe.__version__', 'other'):
+            _, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+
+    def test_parses_again_when_the_parser_changes(self):
+        self.parse()
+        with patch('sythe.fileio.get_parser_digest', return_value='other'):
+            _, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+
+    def test_ignores_cache_files_which_fail_to_load(self):
+        self.parse()
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'wb') as cache_file:
+                pickle.dump(BrokenPickle(), cache_file)
+        rules, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(len(rules), 2)
+
+    def test_ignores_broken_cache_files(self):
+        self.parse()
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'wb') as cache_file:
+                cache_file.write(b'not a pickle')
+        rules, parsed = self.parse()
+        self.assertEqual(parsed, 1)
+        self.assertEqual(len(rules), 2)
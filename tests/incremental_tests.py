@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sythe.parsing.strings as strings
+from sythe.batching import ActionResult
+from sythe.incremental import IncrementalEngine
+from sythe.resources.core import resource_action
+from sythe.resources.ec2_resources import EC2Instance
+
+class RecordingEC2Instance(EC2Instance):
+    """
+    An EC2Instance which records the actions performed on it
+    """
+    def __init__(self, data, calls):
+        EC2Instance.__init__(self, data, None)
+        self.calls = calls
+
+    @resource_action(['key', 'value'])
+    def tag(self, args):
+        self.calls.append(('tag', self.data['InstanceId'], args['value']))
+
+    def delete(self, args):
+        self.calls.append(('delete', self.data['InstanceId']))
+
+def make_instances(states, calls):
+    return [RecordingEC2Instance({'InstanceId': 'i-{}'.format(i), 'State': {'Name': state},
+                                  'Tags': [{'Key': 'env', 'Value': 'dev'}]}, calls)
+            for i, state in enumerate(states)]
+
+class IncrementalEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.rules = strings.parse_rules_from_string('''
+            ec2_instance(State.Name = "stopped") { tag(key: "idle", value: tag:env) }
+            ec2_instance(State.Name = "terminated") { delete() }
+        ''')
+
+    def run_engine(self, state, states):
+        calls = []
+        engine = IncrementalEngine(state)
+        for rule in self.rules:
+            engine.apply(rule, make_instances(states, calls))
+        return engine, calls
+
+    def test_only_tags_new_matches(self):
+        engine, calls = self.run_engine(None, ['stopped', 'running'])
+        self.assertEqual(calls, [('tag', 'i-0', 'dev')])
+        self.assertEqual((engine.evaluated, engine.reused), (4, 0))
+
+        engine, calls = self.run_engine(engine.finish(), ['stopped', 'running'])
+        self.assertEqual(calls, [])
+        self.assertEqual((engine.evaluated, engine.reused), (0, 4))
+
+        engine, calls = self.run_engine(engine.finish(), ['stopped', 'stopped'])
+        self.assertEqual(calls, [('tag', 'i-1', 'dev')])
+        self.assertEqual((engine.evaluated, engine.reused), (2, 2))
+
+    def test_always_performs_level_triggered_actions(self):
+        engine, calls = self.run_engine(None, ['terminated'])
+        self.assertEqual(calls, [('delete', 'i-0')])
+        engine, calls = self.run_engine(engine.finish(), ['terminated'])
+        self.assertEqual(calls, [('delete', 'i-0')])
+
+    def test_retags_when_action_arguments_change(self):
+        engine, calls = self.run_engine(None, ['stopped'])
+        instances = make_instances(['stopped'], calls)
+        instances[0].data['tag:env'] = 'prod'
+        engine = IncrementalEngine(engine.finish())
+        engine.apply(self.rules[0], instances)
+        self.assertEqual(calls, [('tag', 'i-0', 'dev'), ('tag', 'i-0', 'prod')])
+
+    def test_forgets_unseen_resources(self):
+        engine, _ = self.run_engine(None, ['stopped', 'stopped'])
+        engine, _ = self.run_engine(engine.finish(), ['stopped'])
+        engine, calls = self.run_engine(engine.finish(), ['stopped', 'stopped'])
+        self.assertEqual(calls, [('tag', 'i-1', 'dev')])
+
+    def test_saves_and_loads_state(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        state_path = os.path.join(directory, 'state.json')
+
+        engine = IncrementalEngine.load(state_path)
+        for rule in self.rules:
+            engine.apply(rule, make_instances(['stopped'], []))
+        engine.save(state_path)
+
+        engine = IncrementalEngine.load(state_path)
+        calls = []
+        for rule in self.rules:
+            engine.apply(rule, make_instances(['stopped'], calls))
+        self.assertEqual(calls, [])
+        self.assertEqual(os.listdir(directory), ['state.json'])
+
+    def test_passes_actions_to_perform(self):
+        performed = []
+        engine = IncrementalEngine()
+        calls = []
+        for rule in self.rules:
+            engine.apply(rule, make_instances(['stopped', 'terminated'], calls),
+                         lambda rule, resource, action: performed.append(
+                             (resource['InstanceId'], action.action_name)))
+        self.assertEqual(calls, [])
+        self.assertEqual(performed, [('i-0', 'tag'), ('i-1', 'delete')])
+
+    def test_tags_again_after_failed_tag(self):
+        engine, calls = self.run_engine(None, ['stopped', 'stopped'])
+        engine.record_results([ActionResult('create_tags', 'i-0', Exception('throttled')),
+                               ActionResult('create_tags', 'i-1', None)])
+        engine, calls = self.run_engine(engine.finish(), ['stopped', 'stopped'])
+        self.assertEqual(calls, [('tag', 'i-0', 'dev')])
+        engine, calls = self.run_engine(engine.finish(), ['stopped', 'stopped'])
+        self.assertEqual(calls, [])
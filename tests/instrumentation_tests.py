@@ -0,0 +1,87 @@
+import unittest
+import sythe.parsing.strings as strings
+from sythe.instrumentation import Instrumentation, recorder
+from sythe.ratelimit import RateLimiter, RateLimitedClient
+from tests.ratelimit_tests import FakeClock, ThrottlingEC2Client
+
+class InstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.instrumentation = Instrumentation(clock=self.clock)
+        self.instrumentation.enable()
+
+    def test_records_nothing_until_enabled(self):
+        instrumentation = Instrumentation()
+        instrumentation.increment('calls')
+        instrumentation.observe('latency', 1.0)
+        with instrumentation.timer('latency'):
+            pass
+        self.assertEqual(instrumentation.as_dict(), {'counters': [], 'histograms': []})
+
+    def test_records_counters_and_histograms(self):
+        self.instrumentation.increment('calls', rule='1')
+        self.instrumentation.increment('calls', 2, rule='1')
+        self.instrumentation.increment('calls', rule='2')
+        with self.instrumentation.timer('latency', operation='describe'):
+            self.clock.sleep(0.005)
+        self.instrumentation.observe('latency', 20.0, operation='describe')
+
+        report = self.instrumentation.as_dict()
+        self.assertEqual(report['counters'], [
+            {'name': 'calls', 'labels': {'rule': '1'}, 'value': 3},
+            {'name': 'calls', 'labels': {'rule': '2'}, 'value': 1}
+        ])
+        histogram = report['histograms'][0]
+        self.assertEqual((histogram['count'], histogram['sum'], histogram['mean']),
+                         (2, 20.005, 10.0025))
+        self.assertEqual(histogram['buckets']['0.001'], 0)
+        self.assertEqual(histogram['buckets']['0.01'], 1)
+        self.assertEqual(histogram['buckets']['10.0'], 1)
+
+    def test_formats_prometheus_text(self):
+        self.instrumentation.increment('sythe_calls_total', rule='say "hi"')
+        self.instrumentation.observe('sythe_latency_seconds', 0.5)
+        lines = self.instrumentation.to_prometheus().splitlines()
+        self.assertEqual(lines[:2], ['# TYPE sythe_calls_total counter',
+                                     'sythe_calls_total{rule="say \\"hi\\""} 1'])
+        self.assertIn('# TYPE sythe_latency_seconds histogram', lines)
+        self.assertIn('sythe_latency_seconds_bucket{le="0.1"} 0', lines)
+        self.assertIn('sythe_latency_seconds_bucket{le="1.0"} 1', lines)
+        self.assertIn('sythe_latency_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('sythe_latency_seconds_sum 0.5', lines)
+        self.assertIn('sythe_latency_seconds_count 1', lines)
+
+    def test_instruments_rules(self):
+        rule = strings.parse_rules_from_string('ec2_instance(LaunchIndex > 1) {}')[0]
+        self.instrumentation.instrument_rule(rule, '1')
+        for launch_index in [0, 2, 3]:
+            rule.evaluate({'LaunchIndex': launch_index})
+        report = self.instrumentation.as_dict()
+        self.assertEqual(report['counters'], [
+            {'name': 'sythe_rule_matches_total', 'labels': {'rule': '1'}, 'value': 2}
+        ])
+        self.assertEqual(report['histograms'][0]['name'], 'sythe_rule_evaluation_seconds')
+        self.assertEqual(report['histograms'][0]['count'], 3)
+
+class RecorderTests(unittest.TestCase):
+    def setUp(self):
+        recorder.enable()
+        self.addCleanup(setattr, recorder, 'enabled', False)
+        self.addCleanup(recorder.reset)
+
+    def test_records_parsing_and_api_calls(self):
+        strings.parse_rules_from_string('ec2_instance(true) {}')
+        clock = FakeClock()
+        client = RateLimitedClient(ThrottlingEC2Client(throttles=1), RateLimiter(clock=clock),
+                                   sleep=clock.sleep)
+        client.describe_instances()
+
+        report = recorder.as_dict()
+        histograms = dict(((histogram['name'], tuple(histogram['labels'].items())),
+                           histogram['count']) for histogram in report['histograms'])
+        self.assertEqual(histograms[('sythe_api_call_seconds',
+                                     (('operation', 'describe_instances'),))], 2)
+        self.assertEqual(histograms[('sythe_parse_seconds', ())], 1)
+        self.assertIn({'name': 'sythe_api_errors_total',
+                       'labels': {'operation': 'describe_instances'}, 'value': 1},
+                      report['counters'])
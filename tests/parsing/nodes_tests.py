@@ -1,7 +1,10 @@
+import pickle
 import unittest
 from unittest.mock import MagicMock
 import sythe.parsing.nodes as nodes
 import sythe.parsing.errors as errors
+from sythe.parsing.tokenizer import TokenStream
+from sythe.resources.table import ResourceTable
 
 class RuleNodeTests(unittest.TestCase):
     """
@@ -43,6 +46,21 @@ class RuleNodeTests(unittest.TestCase):
             except errors.ParsingError:
                 self.fail('Error parsing valid rule: {}'.format(test_case_str))
 
+    def test_consumes_one_rule(self):
+        """
+        Tests that a RuleNode consumes exactly its own tokens
+        from a shared token stream
+        """
+        tokens = TokenStream([
+            'ec2_instance', '(', 'A', '=', '"a"', ')', '{', '}',
+            'ec2_instance', '(', 'B', '=', '"b"', ')', '{', '}'
+        ])
+        first = nodes.RuleNode(tokens)
+        second = nodes.RuleNode(tokens)
+        self.assertEqual(str(first.condition), '(A = "a")')
+        self.assertEqual(str(second.condition), '(B = "b")')
+        self.assertEqual(len(tokens), 0)
+
 class ResourceNodeTests(unittest.TestCase):
     """
     Tests for the ResourceNode which determines the resource
@@ -136,6 +154,71 @@ class EqualsNodeTests(unittest.TestCase):
         for left, right, output in test_cases:
             self.assertEqual(nodes.EqualsNode(left, right).execute(None), output)
 
+class MatchNodeTests(unittest.TestCase):
+    def test_matches_patterns_anywhere(self):
+        test_cases = [
+            ('"web-1"', '"^web-[0-9]$"', True),
+            ('"a-web-1"', '"^web-"', False),
+            ('"a-web-1"', '"web-"', True),
+            ('"WEB-1"', '"web"', False),
+            ('"abbbc"', '"ab*c"', True),
+            ('"ac"', '"ab*c"', True),
+            ('"cat"', '"dog|cat"', True),
+            ('1', '"1"', False),
+            ('true', '"True"', False)
+        ]
+        for left, right, output in test_cases:
+            node = nodes.parse_condition_to_ast(['(', left, '~', right, ')'])
+            self.assertEqual(node.execute(None), output, (left, right))
+            self.assertEqual(node.compile()(None), output, (left, right))
+
+    def test_compiles_literal_patterns_when_parsed(self):
+        node = nodes.parse_condition_to_ast(['(', 'a', '~', '"^x+"', ')'])
+        self.assertEqual(node.pattern.source, '^x+')
+        with self.assertRaises(errors.ParsingError):
+            nodes.parse_condition_to_ast(['(', 'a', '~', '"[x"', ')'])
+
+    def test_caches_dynamic_patterns(self):
+        node = nodes.parse_condition_to_ast(['(', 'a', '~', 'b', ')'])
+        self.assertIsNone(node.pattern)
+        nodes.get_pattern.cache_clear()
+        resources = [{'a': 'xyz', 'b': 'y'}, {'a': 'abc', 'b': 'y'}, {'a': 'y', 'b': None}]
+        self.assertEqual([node.execute(resource) for resource in resources], [True, False, False])
+        self.assertEqual(node.execute_batch(ResourceTable(resources)), [True, False, False])
+        info = nodes.get_pattern.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 3))
+
+    def test_invalid_dynamic_patterns_never_match(self):
+        node = nodes.parse_condition_to_ast(['(', 'a', '~', 'b', ')'])
+        nodes.get_pattern.cache_clear()
+        resources = [{'a': '(', 'b': '('}, {'a': 'x', 'b': '('}]
+        self.assertEqual([node.execute(resource) for resource in resources], [False, False])
+        self.assertEqual(node.compile()(resources[0]), False)
+        self.assertEqual(node.execute_batch(ResourceTable(resources)), [False, False])
+        info = nodes.get_pattern.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 4))
+
+    def test_pickles_without_compiled_patterns(self):
+        node = nodes.parse_condition_to_ast(['(', 'a', '~', '"^x"', ')'])
+        loaded = pickle.loads(pickle.dumps(node))
+        self.assertEqual(loaded.pattern.source, '^x')
+        self.assertTrue(loaded.execute({'a': 'xy'}))
+
+    def test_finds_literal_prefixes(self):
+        test_cases = [
+            ('^web-[0-9]+', ('web-', True)),
+            ('web-', ('web-', False)),
+            ('^abc*', ('ab', True)),
+            ('^ab{2}', ('a', True)),
+            ('^a\\.b', ('a', True)),
+            ('^web|^db', ('', True)),
+            ('(?i)web', ('', False)),
+            ('^', ('', True)),
+            ('.*web', ('', False))
+        ]
+        for source, expected in test_cases:
+            self.assertEqual(nodes.get_literal_prefix(source), expected, source)
+
 class VariableNodeTests(unittest.TestCase):
     def test_invalid_paths_returns_none(self):
         test_cases = [
@@ -169,6 +252,106 @@ class VariableNodeTests(unittest.TestCase):
             }
             node.execute(resource)
 
+class CompileTests(unittest.TestCase):
+    """
+    Tests that compiled conditions behave the same as
+    walking the condition tree
+    """
+    def test_compiled_matches_interpreted(self):
+        conditions = [
+            '( a = 3 )',
+            '( b.c = "x" )',
+            '( a > 2 & b.c = "x" )',
+            '( a < 2 | b.c = "y" )',
+            '( ( a = 3 | d = true ) & missing.path = "x" )',
+            '( 3 = a )',
+            '( a = a )',
+            '( a & d )',
+            '( a | d )'
+        ]
+        resources = [
+            {'a': 3, 'b': {'c': 'x'}, 'd': True},
+            {'a': 1, 'b': {'c': 'y'}, 'd': False},
+            {'a': 0, 'b': {}, 'd': True, 'missing': {'path': 'x'}}
+        ]
+
+        for condition in conditions:
+            node = nodes.parse_condition_to_ast(condition.split(' '))
+            compiled = node.compile()
+            for resource in resources:
+                self.assertEqual(compiled(resource), node.execute(resource),
+                                 '{} on {}'.format(condition, resource))
+
+    def test_long_chains_compile(self):
+        """
+        Tests that long chains of the same operator are compiled
+        into one flat expression rather than falling back
+        """
+        tokens = ['(']
+        for i in range(500):
+            tokens.extend(['a', '=', str(i), '|'])
+        tokens[-1] = ')'
+        node = nodes.parse_condition_to_ast(tokens)
+        compiled = node.compile()
+        self.assertNotEqual(compiled, node.execute)
+        self.assertTrue(compiled({'a': 499}))
+        self.assertFalse(compiled({'a': 500}))
+
+    def test_batch_matches_interpreted(self):
+        """
+        Tests that evaluating conditions a column at a time gives the
+        same values as evaluating them one resource at a time, and only
+        evaluates the right side of & and | where execute would
+        """
+        conditions = [
+            '( a = 3 )',
+            '( b.c = "x" & a > 2 )',
+            '( ( a = 3 | d = true ) & missing.path = "x" )',
+            '( a & d )',
+            '( a | d )',
+            '( d = true & a > 2 )',
+            '( d = false | a < 2 )'
+        ]
+        resources = [
+            {'a': 3, 'b': {'c': 'x'}, 'd': True},
+            {'a': 1, 'b': {'c': 'y'}, 'd': False},
+            {'a': 0, 'b': {}, 'd': True, 'missing': {'path': 'x'}},
+            {'b': {}, 'd': False}
+        ]
+
+        table = ResourceTable(resources)
+        for condition in conditions:
+            node = nodes.parse_condition_to_ast(condition.split(' '))
+            expected = [node.execute(resource) for resource in resources]
+            self.assertEqual(node.execute_batch(table), expected, condition)
+
+    def test_compiled_rule_runs_actions(self):
+        rule = nodes.RuleNode([
+            'ec2_instance', '(', 'a', '=', '3', ')', '{',
+            'action', '(', ')',
+            '}'
+        ])
+        rule.compile()
+        matching = MagicMock()
+        matching.__getitem__.side_effect = {'a': 3}.__getitem__
+        other = MagicMock()
+        other.__getitem__.side_effect = {'a': 4}.__getitem__
+        rule.execute(matching)
+        rule.execute(other)
+        matching.action.assert_called_once_with({})
+        other.action.assert_not_called()
+
+    def test_long_paths(self):
+        resource = {'a': {'b': {'c': {'d': 'e'}}}}
+        self.assertEqual(nodes.VariableNode('a.b.c.d').execute(resource), 'e')
+        self.assertEqual(nodes.VariableNode('a.b.x.d').execute(resource), None)
+
+    def test_rejects_unknown_datatypes(self):
+        resource = {'a': {'b': [1, 2]}, 'c': 1.5}
+        for path in ['a', 'a.b', 'c']:
+            with self.assertRaises(errors.ParsingError):
+                nodes.VariableNode(path).execute(resource)
+
 class IsolateConditionTests(unittest.TestCase):
     """
     Tests the isolate_condition function which scans
@@ -232,6 +415,38 @@ class ConditionalNodeTests(unittest.TestCase):
             with self.assertRaises(errors.ParsingError):
                 nodes.parse_condition_to_ast(condition)
 
+    def test_parses_lists(self):
+        node = nodes.parse_condition_to_ast(
+            '( A in [ "a" , 1 , "a" , true ] & B = 2 )'.split(' ')
+        )
+        self.assertEqual(str(node), '((A in ["a", 1, True]) & (B = 2))')
+        self.assertEqual(node.left.right.value, frozenset(['a', 1]))
+        self.assertTrue(node.execute({'A': 'a', 'B': 2}))
+        self.assertTrue(node.execute({'A': True, 'B': 2}))
+        self.assertFalse(node.execute({'A': 'b', 'B': 2}))
+        self.assertFalse(node.compile()({'A': None, 'B': 2}))
+        self.assertEqual(str(nodes.parse_condition_to_ast(['(', 'A', 'in', '[', ']', ')'])),
+                         '(A in [])')
+
+    def test_rejects_invalid_lists(self):
+        test_cases = [
+            '( A [ B )',
+            '( A in [ B ] )',
+            '( A in [ "a" , ] )',
+            '( A in [ , "a" ] )',
+            '( A in [ "a" "b" ] )',
+            '( A in [ "a" , ( ] )',
+            '( A in [ [ "a" ] ] )',
+            '( A in [ 1 ) ]',
+            '( A in B )',
+            '( A = [ 1 ] )',
+            '( [ 1 ] in [ 1 ] )',
+            '( [ 1 ] )'
+        ]
+        for test_case in test_cases:
+            with self.assertRaises(errors.ParsingError, msg=test_case):
+                nodes.parse_condition_to_ast(test_case.split(' '))
+
     def test_rejects_unclosed_strings(self):
         """
         This test makes sure that improperly closed strings
@@ -267,3 +482,19 @@ class ConditionalNodeTests(unittest.TestCase):
                 nodes.parse_condition_to_ast(test_case)
             except errors.ParsingError as err:
                 self.fail('Expected {} to parse correctly. Got: {}'.format(test_case_str, err.message))
+
+    def test_precedence(self):
+        """
+        This test makes sure that comparisons bind tighter than
+        & and |, and that & binds tighter than |
+        """
+        test_cases = [
+            ('( A = B | C = D )', '((A = B) | (C = D))'),
+            ('( A = B | C = D | E = F )', '(((A = B) | (C = D)) | (E = F))'),
+            ('( A = B & C = D | E = F )', '(((A = B) & (C = D)) | (E = F))'),
+            ('( A = B | C = D & E = F )', '((A = B) | ((C = D) & (E = F)))')
+        ]
+
+        for condition, expected in test_cases:
+            node = nodes.parse_condition_to_ast(condition.split(' '))
+            self.assertEqual(str(node), expected)
@@ -0,0 +1,282 @@
+import random
+import unittest
+import sythe.parsing.errors as errors
+import sythe.parsing.nodes as nodes
+import sythe.parsing.optimizer as optimizer
+import sythe.parsing.strings as strings
+from sythe.resources.table import ResourceTable
+
+CONDITIONS = [
+    'State.Name = "running" & tag:env = "dev" & LaunchIndex > 1',
+    'LaunchIndex > 1 & (tag:env = "dev" & (State.Name = "running" & tag:team = "a"))',
+    'tag:env = "dev" | LaunchIndex < 2 | State.Name = "stopped" | tag:team = "b"',
+    '(tag:env = "dev" | tag:env = "qa") & LaunchIndex > 0 & tag:team = "a"',
+    'tag:env & State.Name = "running"',
+    'tag:team | tag:env = "dev"',
+    'LaunchIndex > 1 & tag:env > 1 & State.Name = "running"',
+    'true & State.Name = "running" | false',
+    '(State.Name = "running" & tag:env = "qa") = (LaunchIndex > 1 | tag:team = "b")'
+]
+
+#Variables of the test resources, which all have values of types rules can use
+KNOWN_VARIABLES = ['a', 'b', 'c', 'LaunchIndex', 'State.Name']
+
+def parse_condition(condition):
+    return strings.parse_rules_from_string('ec2_instance({}) {{}}'.format(condition))[0].condition
+
+def generate_instances(count, seed=0):
+    rand = random.Random(seed)
+    return [{
+        'LaunchIndex': rand.choice([0, 1, 2, 3, 'x']),
+        'State': {'Name': rand.choice(['running', 'stopped'])},
+        'tag:env': rand.choice(['dev', 'qa', 1, None]),
+        'tag:team': rand.choice(['a', 'b', ''])
+    } for _ in range(count)]
+
+LEAVES = [
+    'State.Name = "running"',
+    'tag:env = "dev"',
+    'tag:team = "a"',
+    'LaunchIndex > 1',
+    'LaunchIndex < 3',
+    'tag:env',
+    'tag:team',
+    'true',
+    'false',
+    '1 < 2',
+    '"a" = "b"',
+    '0',
+    '"x"',
+    'tag:env in ["dev", "qa"]',
+    'tag:env = "qa"',
+    'LaunchIndex = 1',
+    '"dev" = tag:env',
+    'tag:env ~ "^d"',
+    'tag:team ~ tag:env'
+]
+
+def generate_condition(rand, depth):
+    """
+    Generates a random condition of & and | chains over comparisons, variables and
+    literals, with some of its operands repeated and some comparisons of literals
+    """
+    if depth <= 1 or rand.random() < 0.2:
+        return rand.choice(LEAVES)
+    if rand.random() < 0.1:
+        return '({} = {})'.format(generate_condition(rand, depth - 1),
+                                  generate_condition(rand, depth - 1))
+    operator = rand.choice([' & ', ' | '])
+    operands = [generate_condition(rand, depth - 1) for _ in range(rand.randint(2, 4))]
+    return '({})'.format(operator.join(operands))
+
+def evaluate(function, resource):
+    try:
+        return ('value', function(resource))
+    except (TypeError, errors.ParsingError):
+        return ('error', None)
+
+class ChainNodeTests(unittest.TestCase):
+    def test_chains_return_operands_like_and_or(self):
+        values = [1, '', 'x']
+        operands = [nodes.VariableNode(str(i)) for i in range(3)]
+        resource = dict((str(i), value) for i, value in enumerate(values))
+        self.assertEqual(nodes.AllNode(operands).execute(resource), '')
+        self.assertEqual(nodes.AnyNode(operands).execute(resource), 1)
+        self.assertEqual(nodes.AllNode(operands[::2]).execute(resource), 'x')
+        self.assertEqual(nodes.AnyNode(operands[1:2]).execute(resource), '')
+
+    def test_chains_compile_and_batch_like_execute(self):
+        instances = generate_instances(100)
+        for condition in CONDITIONS:
+            flattened = optimizer.flatten(parse_condition(condition))
+            compiled = flattened.compile()
+            for instance in instances:
+                self.assertEqual(evaluate(compiled, instance),
+                                 evaluate(flattened.execute, instance), condition)
+            safe_instances = [instance for instance in instances
+                              if evaluate(flattened.execute, instance)[0] == 'value']
+            self.assertEqual(flattened.execute_batch(ResourceTable(safe_instances)),
+                             [flattened.execute(instance) for instance in safe_instances])
+
+class OptimizerTests(unittest.TestCase):
+    def test_flattens_chains(self):
+        condition = optimizer.flatten(parse_condition(
+            'a = 1 & (b = 2 & (c = 3 | d = 4 | (e = 5 | f = 6))) & g = 7'
+        ))
+        self.assertIsInstance(condition, nodes.AllNode)
+        self.assertEqual(len(condition.operands), 4)
+        self.assertIsInstance(condition.operands[2], nodes.AnyNode)
+        self.assertEqual(len(condition.operands[2].operands), 4)
+        self.assertEqual(str(condition),
+                         '((a = 1) & (b = 2) & ((c = 3) | (d = 4) | (e = 5) | (f = 6)) & (g = 7))')
+
+    def test_evaluates_cheap_equalities_first(self):
+        condition = optimizer.optimize(parse_condition(
+            'LaunchIndex > 1 & (tag:env = tag:team) & State.Name = "running"'
+        ), known_variables=KNOWN_VARIABLES)
+        self.assertEqual(str(condition),
+                         '((State.Name = "running") & (tag:env = tag:team) & (LaunchIndex > 1))')
+
+    def test_keeps_order_of_comparisons_that_may_raise(self):
+        condition = optimizer.optimize(parse_condition('b > 1 & a < 2 & c = 3'),
+                                       known_variables=KNOWN_VARIABLES)
+        self.assertEqual(str(condition), '((c = 3) & (b > 1) & (a < 2))')
+
+    def test_keeps_order_of_variables_that_may_raise(self):
+        condition = parse_condition('tag:kind ~ "^plain" & Tags = "x"')
+        optimized = optimizer.optimize(condition)
+        self.assertEqual(str(optimized), str(optimizer.flatten(condition)))
+        self.assertFalse(optimized.execute({'tag:kind': 'other', 'Tags': []}))
+        with self.assertRaises(errors.ParsingError):
+            optimized.execute({'tag:kind': 'plain', 'Tags': []})
+
+        condition = parse_condition('tag:kind ~ "^plain" & State.Name = "running"')
+        self.assertEqual(str(optimizer.optimize(condition)), str(optimizer.flatten(condition)))
+        self.assertEqual(str(optimizer.optimize(condition, known_variables=['State.Name'])),
+                         '((State.Name = "running") & (tag:kind ~ "^plain"))')
+
+    def test_reordered_dynamic_patterns_never_raise(self):
+        condition = parse_condition('tag:x = "a" & tag:n ~ tag:p')
+        optimized = optimizer.optimize(condition, {'(tag:x = "a")': 0.99,
+                                                   '(tag:n ~ tag:p)': 0.0})
+        self.assertEqual(str(optimized), '((tag:n ~ tag:p) & (tag:x = "a"))')
+        self.assertFalse(optimized.execute({'tag:x': 'b', 'tag:p': '('}))
+        self.assertFalse(optimized.compile()({'tag:x': 'a', 'tag:n': '(', 'tag:p': '('}))
+
+    def test_reorders_non_boolean_chains_only_for_truthiness(self):
+        match_rates = {'tag:env': 0.9}
+        condition = parse_condition('tag:env & State.Name = "running"')
+        self.assertEqual(str(optimizer.optimize(condition, match_rates, boolean_context=False)),
+                         '(tag:env & (State.Name = "running"))')
+        self.assertEqual(str(optimizer.optimize(condition, match_rates,
+                                                known_variables=KNOWN_VARIABLES)),
+                         '((State.Name = "running") & tag:env)')
+        condition = parse_condition('(tag:env & State.Name = "running") = true')
+        self.assertEqual(str(optimizer.optimize(condition, match_rates)),
+                         '((tag:env & (State.Name = "running")) = True)')
+
+    def test_uses_match_rates(self):
+        condition = parse_condition('a = 1 & b = 2')
+        self.assertEqual(str(optimizer.optimize(condition)), '((a = 1) & (b = 2))')
+        optimized = optimizer.optimize(condition, {'(a = 1)': 0.9, '(b = 2)': 0.2},
+                                       known_variables=KNOWN_VARIABLES)
+        self.assertEqual(str(optimized), '((b = 2) & (a = 1))')
+        optimized = optimizer.optimize(parse_condition('a = 1 | b = 2'),
+                                       {'(a = 1)': 0.2, '(b = 2)': 0.9},
+                                       known_variables=KNOWN_VARIABLES)
+        self.assertEqual(str(optimized), '((b = 2) | (a = 1))')
+
+    def test_measures_match_rates(self):
+        conditions = [parse_condition('a = 1 & b > 1'), parse_condition('a = 1')]
+        resources = [{'a': 1, 'b': 2}, {'a': 2, 'b': 'x'}, {'a': 1, 'b': 0}, {'a': 3}]
+        self.assertEqual(optimizer.measure_match_rates(conditions, resources), {
+            '(a = 1)': 0.5,
+            '(b > 1)': 0.25
+        })
+
+    def test_optimized_conditions_are_equivalent(self):
+        """
+        Tests that optimized conditions evaluate to the same values as the
+        ones they were optimized from, and never raise where they didn't
+        """
+        instances = generate_instances(500)
+        match_rates = optimizer.measure_match_rates(
+            [parse_condition(condition) for condition in CONDITIONS], instances[:50]
+        )
+        rand = random.Random(0)
+        conditions = CONDITIONS + [generate_condition(rand, 4) for _ in range(300)]
+        for condition in conditions:
+            original = parse_condition(condition)
+            for rates, known in ((None, ()), (match_rates, KNOWN_VARIABLES)):
+                optimized = optimizer.optimize(original, rates, known_variables=known)
+                exact = optimizer.optimize(original, rates, boolean_context=False,
+                                           known_variables=known)
+                for instance in instances[:100]:
+                    expected = evaluate(original.execute, instance)
+                    #Conditions which raised may no longer reach the operand that raised
+                    if expected[0] == 'value':
+                        self.assertEqual(evaluate(exact.execute, instance),
+                                         expected, condition)
+                        self.assertEqual(bool(optimized.execute(instance)),
+                                         bool(expected[1]), condition)
+
+    def test_folds_comparisons_of_literals(self):
+        self.assertEqual(str(optimizer.optimize(parse_condition('1 < 2'))), 'True')
+        self.assertEqual(str(optimizer.optimize(parse_condition('"a" = "b"'))), 'False')
+        self.assertEqual(str(optimizer.optimize(parse_condition('a = (2 > 1)'))), '(a = True)')
+        #Comparisons which raise are left to raise when they're evaluated
+        self.assertEqual(str(optimizer.optimize(parse_condition('1 < "a"'))), '(1 < "a")')
+
+    def test_removes_literals_which_dont_decide_chains(self):
+        test_cases = [
+            ('true & a = 1', '(a = 1)'),
+            ('false | a = 1', '(a = 1)'),
+            ('a = 1 & true', '(a = 1)'),
+            ('a = 1 & false & b = 2', 'False'),
+            ('a = 1 | true', 'True'),
+            ('a = 1 & (b = 2 | 1 < 2)', '(a = 1)'),
+            ('a = 1 & (1 > 2 | b = 2) & c = 3', '((a = 1) & (b = 2) & (c = 3))')
+        ]
+        for condition, expected in test_cases:
+            self.assertEqual(str(optimizer.optimize(parse_condition(condition))), expected,
+                             condition)
+
+    def test_keeps_literals_which_are_values(self):
+        test_cases = [
+            ('tag:env & true', '(tag:env & True)'),
+            ('tag:env | false', '(tag:env | False)'),
+            ('tag:env & false & tag:team', '(tag:env & False)'),
+            ('true & tag:env', 'tag:env')
+        ]
+        for condition, expected in test_cases:
+            optimized = optimizer.optimize(parse_condition(condition), boolean_context=False)
+            self.assertEqual(str(optimized), expected, condition)
+
+    def test_removes_duplicate_operands(self):
+        condition = optimizer.optimize(parse_condition(
+            'a = 1 & (b = 2 & a = 1) & (c = 3 | c = 3)'
+        ))
+        self.assertEqual(str(condition), '((a = 1) & (b = 2) & (c = 3))')
+        condition = optimizer.optimize(parse_condition('a & b & a'), boolean_context=False)
+        self.assertEqual(str(condition), '(a & b & a)')
+
+    def test_merges_equalities_into_lists(self):
+        test_cases = [
+            ('a = "x" | a = "y" | "z" = a', '(a in ["x", "y", "z"])'),
+            ('a = 1 | b = 2 | a in [3, 1] | b > 1',
+             '((a in [1, 3]) | (b = 2) | (b > 1))'),
+            ('a = 1 | b = 2', '((a = 1) | (b = 2))'),
+            ('c = 1 & (a = "x" | a = "y")', '((c = 1) & (a in ["x", "y"]))'),
+            ('a in ["x"] | a in ["x", "y"]', '(a in ["x", "y"])')
+        ]
+        for condition, expected in test_cases:
+            self.assertEqual(str(optimizer.optimize(parse_condition(condition))), expected,
+                             condition)
+
+    def test_only_merges_equalities_where_values_dont_matter(self):
+        condition = parse_condition('a = 1 | b | a = 2')
+        self.assertEqual(str(optimizer.optimize(condition, boolean_context=False)),
+                         '((a = 1) | b | (a = 2))')
+        self.assertEqual(str(optimizer.optimize(condition, known_variables=KNOWN_VARIABLES)),
+                         '(b | (a in [1, 2]))')
+
+    def test_never_matches(self):
+        self.assertTrue(optimizer.never_matches(optimizer.optimize(parse_condition('1 > 2'))))
+        self.assertTrue(optimizer.never_matches(optimizer.optimize(parse_condition('a & 0'))))
+        self.assertFalse(optimizer.never_matches(optimizer.optimize(parse_condition('a'))))
+
+    def test_dumps_tree(self):
+        self.assertEqual(optimizer.dump_tree(parse_condition('a = 1 & b')), '\n'.join([
+            'AndNode',
+            '  EqualsNode',
+            '    VariableNode a',
+            '    IntLiteralNode 1',
+            '  VariableNode b'
+        ]))
+
+    def test_optimize_rule_replaces_condition(self):
+        rule = strings.parse_rules_from_string('ec2_instance(a > 1 & b = 2) {}')[0]
+        optimizer.optimize_rule(rule, known_variables=KNOWN_VARIABLES)
+        self.assertEqual(str(rule.condition), '((b = 2) & (a > 1))')
+        self.assertFalse(rule.evaluate({'a': 2, 'b': 3}))
+        self.assertTrue(rule.evaluate({'a': 2, 'b': 2}))
@@ -1,5 +1,6 @@
 import unittest
 from sythe.parsing import tokenizer
+import sythe.parsing.errors as errors
 
 class TokenizerTests(unittest.TestCase):
     def test_tokenizer_tests(self):
@@ -42,9 +43,95 @@ class TokenizerTests(unittest.TestCase):
 
             ('ec2_instance(state="up") {mark_for_deletion(after: "3 days, 2 seconds")}',
              ['ec2_instance', '(', 'state', '=', '"up"', ')', '{', 'mark_for_deletion', '(',
-              'after:', '"3 days, 2 seconds"', ')', '}'])
+              'after:', '"3 days, 2 seconds"', ')', '}']),
+
+            #Check matches are split, but not inside patterns
+            ('ec2_instance(tag:Name~"^web~[0-9]+")',
+             ['ec2_instance', '(', 'tag:Name', '~', '"^web~[0-9]+"', ')'])
         ]
 
         for test_input, output in test_cases:
             tokenized = tokenizer.tokenize_string(test_input)
             self.assertEqual(tokenized, output)
+
+    def test_tokenizer_positions(self):
+        """
+        Tests that tokens remember the line and column
+        they started at
+        """
+        tokens = tokenizer.tokenize_string(
+            'ec2_instance(state = "up") {\n'
+            '    mark_for_deletion(after: "3\ndays")\n'
+            '}'
+        )
+        positions = [(token, token.line, token.column) for token in tokens]
+        self.assertEqual(positions, [
+            ('ec2_instance', 1, 1),
+            ('(', 1, 13),
+            ('state', 1, 14),
+            ('=', 1, 20),
+            ('"up"', 1, 22),
+            (')', 1, 26),
+            ('{', 1, 28),
+            ('mark_for_deletion', 2, 5),
+            ('(', 2, 22),
+            ('after:', 2, 23),
+            ('"3\ndays"', 2, 30),
+            (')', 3, 6),
+            ('}', 4, 1)
+        ])
+
+    def test_tokenizer_keeps_separators_in_strings(self):
+        """
+        Tests that separators and the other quote character
+        inside a string don't split it
+        """
+        test_cases = [
+            ('a = "x(y)|z"', ['a', '=', '"x(y)|z"']),
+            ("a = 'it\"s'", ['a', '=', "'it\"s'"]),
+            ('a="b"&c="d"', ['a', '=', '"b"', '&', 'c', '=', '"d"'])
+        ]
+
+        for test_input, output in test_cases:
+            self.assertEqual(tokenizer.tokenize_string(test_input), output)
+
+class TokenStreamTests(unittest.TestCase):
+    def test_stream_moves_cursor(self):
+        """
+        Tests that peeking doesn't consume tokens, and that
+        advancing, marking and resetting move the cursor
+        """
+        stream = tokenizer.TokenStream(['a', '(', 'b', ')'])
+        self.assertEqual(stream.peek(), 'a')
+        self.assertEqual(stream.peek(1), '(')
+        self.assertEqual(len(stream), 4)
+
+        mark = stream.mark()
+        self.assertEqual(stream.advance(), 'a')
+        self.assertEqual(stream[0], '(')
+        self.assertEqual(stream.advance(2), 'b')
+        self.assertEqual(list(stream), [')'])
+
+        stream.reset(mark)
+        self.assertEqual(len(stream), 4)
+
+    def test_stream_raises_at_eof(self):
+        """
+        Tests that reading past the end of the stream raises an IndexError
+        """
+        stream = tokenizer.TokenStream(['a'])
+        stream.advance()
+        with self.assertRaises(IndexError):
+            stream.peek()
+        with self.assertRaises(IndexError):
+            stream.advance()
+
+    def test_expect_reports_position(self):
+        """
+        Tests that expect consumes the expected token, and
+        reports where an unexpected one was found
+        """
+        stream = tokenizer.TokenStream(tokenizer.tokenize_string('(\n  }'))
+        stream.expect('(')
+        with self.assertRaisesRegex(errors.ParsingError, 'line 2, column 3'):
+            stream.expect(')')
@@ -0,0 +1,188 @@
+import random
+import unittest
+import sythe.parsing.nodes as nodes
+import sythe.parsing.strings as strings
+import sythe.planner as planner
+from sythe.resources.ec2_resources import iter_ec2_instance_pages, EC2_INSTANCE_FILTERS
+
+def parse_condition(condition):
+    return strings.parse_rules_from_string('ec2_instance({}) {{}}'.format(condition))[0].condition
+
+class FilteringEC2Client(object):
+    """
+    A fake EC2 client which serves the given instances a page at
+    a time, applying describe_instances filters like EC2 does
+    """
+    def __init__(self, instances, page_size=3):
+        self.instances = instances
+        self.page_size = page_size
+        self.filter_paths = dict((name, path) for path, name in EC2_INSTANCE_FILTERS.items())
+
+    def filter_value(self, instance, name):
+        if name.startswith('tag:'):
+            for tag in instance.get('Tags', []):
+                if tag['Key'] == name[4:]:
+                    return tag['Value']
+            return None
+        return nodes.VariableNode(self.filter_paths[name]).execute(instance)
+
+    def describe_instances(self, Filters=(), NextToken=0):
+        matching = [instance for instance in self.instances
+                    if all(self.filter_value(instance, item['Name']) in item['Values']
+                           for item in Filters)]
+        page = matching[NextToken:NextToken + self.page_size]
+        next_token = NextToken + self.page_size
+        return {
+            'Reservations': [{'Instances': [dict(instance) for instance in page]}],
+            'NextToken': next_token if next_token < len(matching) else None
+        }
+
+class PlanQueryTests(unittest.TestCase):
+    def test_pushes_down_equalities(self):
+        plan = planner.plan_query(parse_condition(
+            'State.Name = "running" & tag:env = "dev" & LaunchIndex > 1 & "t2.micro" = InstanceType'
+        ), EC2_INSTANCE_FILTERS)
+        self.assertEqual(plan.filters, [
+            {'Name': 'instance-state-name', 'Values': ['running']},
+            {'Name': 'tag:env', 'Values': ['dev']},
+            {'Name': 'instance-type', 'Values': ['t2.micro']}
+        ])
+        self.assertEqual(str(plan.residual), '(LaunchIndex > 1)')
+
+    def test_pushes_down_lists_of_values(self):
+        plan = planner.plan_query(parse_condition(
+            'tag:env in ["qa", "dev"] & State.Name in ["running", 1] & InstanceType in []'
+        ), EC2_INSTANCE_FILTERS)
+        self.assertEqual(plan.filters, [{'Name': 'tag:env', 'Values': ['dev', 'qa']}])
+        self.assertEqual(str(plan.residual),
+                         '((State.Name in ["running", 1]) & (InstanceType in []))')
+
+    def test_keeps_unpushable_conditions(self):
+        test_cases = [
+            'State.Name = "running" | tag:env = "dev"',
+            'State.Code = "16"',
+            'State.Name = 16',
+            'tag:env = "d*v"',
+            'tag:env = "d\\v"',
+            'tag:stack.state = "live"',
+            'State.Name = InstanceType'
+        ]
+
+        for condition in test_cases:
+            plan = planner.plan_query(parse_condition(condition), EC2_INSTANCE_FILTERS)
+            self.assertEqual(plan.filters, [], condition)
+            self.assertEqual(str(plan.residual), str(parse_condition(condition)))
+
+    def test_only_pushes_one_value_per_filter(self):
+        plan = planner.plan_query(parse_condition(
+            'State.Name = "running" & State.Name = "stopped"'
+        ), EC2_INSTANCE_FILTERS)
+        self.assertEqual(plan.filters, [{'Name': 'instance-state-name', 'Values': ['running']}])
+        self.assertEqual(str(plan.residual), '(State.Name = "stopped")')
+
+    def test_plans_index_lookups(self):
+        plan = planner.plan_index_lookups(parse_condition(
+            'State.Name = "running" & LaunchIndex > 1 & 2 = LaunchIndex & '
+            '(tag:env = "dev" | tag:env = "qa") & Monitoring.Enabled = true'
+        ))
+        self.assertEqual(plan.lookups, [
+            ('State.Name', ['running']),
+            ('LaunchIndex', [2]),
+            ('Monitoring.Enabled', [True])
+        ])
+        self.assertEqual(str(plan.residual),
+                         '((LaunchIndex > 1) & ((tag:env = "dev") | (tag:env = "qa")))')
+        self.assertIsNone(planner.plan_index_lookups(parse_condition('tag:env = "dev"')).residual)
+
+        plan = planner.plan_index_lookups(parse_condition('tag:Name ~ "^web" & a ~ b'))
+        self.assertEqual(len(plan.lookups), 1)
+        self.assertEqual(plan.lookups[0][0], 'tag:Name')
+        self.assertEqual(plan.lookups[0][1].source, '^web')
+        self.assertEqual(str(plan.residual), '(a ~ b)')
+
+    def test_splits_flattened_conjunctions(self):
+        condition = nodes.AllNode([
+            parse_condition('a = 1'),
+            parse_condition('b = 2 & c = 3'),
+            parse_condition('d = 4 | e = 5')
+        ])
+        self.assertEqual([str(conjunct) for conjunct in planner.split_conjuncts(condition)],
+                         ['(a = 1)', '(b = 2)', '(c = 3)', '((d = 4) | (e = 5))'])
+
+    def get_groups(self, rules_string, max_sweeps=planner.MAX_FILTERED_SWEEPS):
+        rules = strings.parse_rules_from_string(rules_string)
+        groups = planner.group_rules_by_filters(rules, EC2_INSTANCE_FILTERS, max_sweeps)
+        return [(filters, [str(rule.condition) for rule in group]) for filters, group in groups]
+
+    def test_groups_rules_by_filters(self):
+        self.assertEqual(self.get_groups('''
+            ec2_instance(State.Name = "running" & LaunchIndex > 1) {}
+            ec2_instance(State.Name = "running") {}
+            ec2_instance(State.Name = "stopped" & LaunchIndex > 2) {}
+        '''), [
+            ([{'Name': 'instance-state-name', 'Values': ['running']}],
+             ['(LaunchIndex > 1)', 'True']),
+            ([{'Name': 'instance-state-name', 'Values': ['stopped']}],
+             ['(LaunchIndex > 2)'])
+        ])
+
+    def test_fetches_everything_once_rather_than_sweeping_again(self):
+        unfiltered = [([], ['((State.Name = "running") & (LaunchIndex > 1))',
+                            '(LaunchIndex > 2)',
+                            '(State.Name = "running")'])]
+        #One rule needs every resource anyway
+        self.assertEqual(self.get_groups('''
+            ec2_instance(State.Name = "running" & LaunchIndex > 1) {}
+            ec2_instance(LaunchIndex > 2) {}
+            ec2_instance(State.Name = "running") {}
+        '''), unfiltered)
+        #Rules with the same filters would run out of order
+        self.assertEqual(self.get_groups('''
+            ec2_instance(State.Name = "running" & LaunchIndex > 1) {}
+            ec2_instance(State.Name = "stopped" & LaunchIndex > 2) {}
+            ec2_instance(State.Name = "running") {}
+        '''), [([], ['((State.Name = "running") & (LaunchIndex > 1))',
+                       '((State.Name = "stopped") & (LaunchIndex > 2))',
+                       '(State.Name = "running")'])])
+        #There would be too many sweeps
+        self.assertEqual(len(self.get_groups('''
+            ec2_instance(State.Name = "running") {}
+            ec2_instance(State.Name = "stopped") {}
+        ''', max_sweeps=1)), 1)
+
+    def test_pushdown_never_changes_results(self):
+        """
+        Tests that fetching with the planned filters and evaluating the
+        residual matches the same instances as fetching everything and
+        evaluating the whole condition
+        """
+        rand = random.Random(0)
+        instances = [{
+            'InstanceId': 'i-{}'.format(i),
+            'InstanceType': rand.choice(['t2.micro', 't2.large']),
+            'LaunchIndex': rand.randint(0, 3),
+            'State': {'Name': rand.choice(['running', 'stopped'])},
+            'Tags': [{'Key': 'env', 'Value': rand.choice(['dev', 'prod'])}]
+        } for i in range(50)]
+        client = FilteringEC2Client(instances)
+
+        conditions = [
+            'State.Name = "running"',
+            'State.Name = "running" & tag:env = "dev"',
+            'tag:env = "prod" & LaunchIndex > 1 & InstanceType = "t2.micro"',
+            'State.Name = "running" & (tag:env = "dev" | LaunchIndex = 0)',
+            'State.Name = "running" & State.Name = "stopped"',
+            'tag:missing = "x" & State.Name = "running"',
+            'tag:env in ["dev", "qa"] & InstanceType in ["t2.large", "m5.large"]',
+            'State.Name in ["running", "stopped"] & tag:env in ["prod", 1]',
+            'State.Name in []'
+        ]
+        for condition in conditions:
+            rule = strings.parse_rules_from_string('ec2_instance({}) {{}}'.format(condition))[0]
+            expected = [instance['InstanceId'] for page in iter_ec2_instance_pages(client)
+                        for instance in page if rule.condition.execute(instance)]
+
+            filters, residual_rule = planner.plan_rule(rule, EC2_INSTANCE_FILTERS)
+            actual = [instance['InstanceId'] for page in iter_ec2_instance_pages(client, filters)
+                      for instance in page if residual_rule.evaluate(instance)]
+            self.assertEqual(actual, expected, condition)
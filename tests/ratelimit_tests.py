@@ -0,0 +1,122 @@
+import unittest
+from botocore.exceptions import ClientError
+from sythe.ratelimit import TokenBucket, RateLimiter, RateLimitedClient, is_throttling_error
+
+class FakeClock(object):
+    """
+    A clock which only moves when something sleeps
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def throttling_error(operation):
+    return ClientError({'Error': {'Code': 'RequestLimitExceeded', 'Message': 'Slow down'}},
+                       operation)
+
+class ThrottlingEC2Client(object):
+    """
+    A fake EC2 client which throttles the first `throttles` calls
+    """
+    def __init__(self, throttles=0):
+        self.throttles = throttles
+        self.calls = []
+
+    def describe_instances(self, **kwargs):
+        self.calls.append('describe_instances')
+        if len(self.calls) <= self.throttles:
+            raise throttling_error('DescribeInstances')
+        return {'Reservations': []}
+
+    def terminate_instances(self, InstanceIds):
+        self.calls.append('terminate_instances')
+        if len(self.calls) <= self.throttles:
+            raise throttling_error('TerminateInstances')
+
+    def create_tags(self, Resources, Tags):
+        raise ValueError('Not a throttle')
+
+class TokenBucketTests(unittest.TestCase):
+    def test_allows_bursts_then_limits(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, capacity=2, clock=clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+        clock.now += 1
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_adapts_rate(self):
+        bucket = TokenBucket(10, clock=FakeClock())
+        bucket.on_throttle()
+        bucket.on_throttle()
+        self.assertEqual(bucket.rate, 2.5)
+        for _ in range(100):
+            bucket.on_success()
+        self.assertEqual(bucket.rate, 10)
+        for _ in range(100):
+            bucket.on_throttle()
+        self.assertEqual(bucket.rate, bucket.min_rate)
+
+class RateLimitedClientTests(unittest.TestCase):
+    def get_client(self, fake, clock, max_retries=5):
+        limiter = RateLimiter(read_rate=10, mutate_rate=1, clock=clock)
+        return RateLimitedClient(fake, limiter, max_retries=max_retries, sleep=clock.sleep), limiter
+
+    def test_retries_throttled_calls(self):
+        clock = FakeClock()
+        fake = ThrottlingEC2Client(throttles=3)
+        client, limiter = self.get_client(fake, clock)
+        self.assertEqual(client.describe_instances(), {'Reservations': []})
+        self.assertEqual(len(fake.calls), 4)
+
+        metrics = limiter.metrics.as_dict()['read']
+        self.assertEqual(metrics['calls'], 4)
+        self.assertEqual(metrics['throttle_events'], 3)
+        self.assertEqual(metrics['retries'], 3)
+        self.assertAlmostEqual(metrics['wait_time'], sum(clock.sleeps))
+        self.assertLess(limiter.buckets['read'].rate, 10)
+
+    def test_gives_up_after_max_retries(self):
+        clock = FakeClock()
+        fake = ThrottlingEC2Client(throttles=10)
+        client, _ = self.get_client(fake, clock, max_retries=2)
+        with self.assertRaises(ClientError):
+            client.terminate_instances(InstanceIds=['i-1'])
+        self.assertEqual(len(fake.calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        clock = FakeClock()
+        client, limiter = self.get_client(ThrottlingEC2Client(), clock)
+        with self.assertRaises(ValueError):
+            client.create_tags(Resources=[], Tags=[])
+        self.assertEqual(limiter.metrics.as_dict()['mutate']['calls'], 1)
+
+    def test_budgets_are_separate(self):
+        """
+        Tests that reads and mutations are limited by their own budgets
+        """
+        clock = FakeClock()
+        client, limiter = self.get_client(ThrottlingEC2Client(), clock)
+        for _ in range(20):
+            client.describe_instances()
+        self.assertEqual(clock.now, 0)
+        for _ in range(4):
+            client.terminate_instances(InstanceIds=['i-1'])
+        self.assertAlmostEqual(clock.now, 2)
+        self.assertEqual(set(limiter.metrics.as_dict()), set(['read', 'mutate']))
+
+    def test_detects_throttling(self):
+        self.assertTrue(is_throttling_error(throttling_error('DescribeInstances')))
+        self.assertFalse(is_throttling_error(ValueError()))
+        self.assertFalse(is_throttling_error(ClientError(
+            {'Error': {'Code': 'InvalidInstanceID.NotFound', 'Message': ''}}, 'TerminateInstances'
+        )))
@@ -1,5 +1,5 @@
 import unittest
-from sythe.registry import Registry
+from sythe.registry import Registry, resource_registry
 from sythe.errors import RegistryCollisionError
 
 class RegistryTests(unittest.TestCase):
@@ -22,3 +22,25 @@ class RegistryTests(unittest.TestCase):
             @registry.register('A')
             class BClass:
                 pass
+
+    def test_registry_imports_lazy_entries(self):
+        registry = Registry()
+        registry.register_lazy('A', 'tests.registry_tests')
+        self.assertTrue('A' in registry)
+
+        with self.assertRaises(KeyError):
+            registry['A']
+
+        registry.register('A')(RegistryTests)
+        self.assertEqual(registry['A'], RegistryTests)
+
+    def test_registry_throws_on_double_lazy_register(self):
+        registry = Registry()
+        registry.register_lazy('A', 'module')
+        with self.assertRaises(RegistryCollisionError):
+            registry.register_lazy('A', 'module')
+
+    def test_resources_are_registered_lazily(self):
+        self.assertTrue('ec2_instance' in resource_registry)
+        from sythe.resources.ec2_resources import EC2Instance
+        self.assertEqual(resource_registry['ec2_instance'], EC2Instance)
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import MagicMock
+import sythe.parsing.strings as strings
+from sythe.resources.compact import CompactEC2Instance, InstanceNotFoundError, MISSING
+from sythe.resources.compact import get_fields
+from sythe.resources.ec2_resources import EC2Instance
+
+def make_data():
+    return {
+        'InstanceId': 'i-1',
+        'InstanceType': 't2.micro',
+        'ImageId': 'ami-1',
+        'State': {'Code': 16, 'Name': 'running'},
+        'Tags': [{'Key': 'env', 'Value': 'dev'}]
+    }
+
+class CompactEC2InstanceTests(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.describe_instances.return_value = {
+            'Reservations': [{'Instances': [make_data()]}]
+        }
+        self.instance = CompactEC2Instance(
+            make_data(), self.client, get_fields([('State', 'Name'), ('KeyName',), ('tag:env',)])
+        )
+
+    def test_only_keeps_referenced_fields(self):
+        self.assertEqual(get_fields([('State', 'Name'), ('KeyName',), ('tag:env',)]),
+                         {'KeyName': 0, 'State': 1})
+        self.assertEqual(self.instance.values, (MISSING, {'Code': 16, 'Name': 'running'}))
+        self.assertEqual(self.instance.tags, {'env': 'dev'})
+
+    def test_evaluates_like_full_instances(self):
+        rules = strings.parse_rules_from_string('''
+            ec2_instance(State.Name = "running" & tag:env = "dev") {}
+            ec2_instance(KeyName = "key" | tag:missing = "x") {}
+            ec2_instance(InstanceId = "i-1") {}
+        ''')
+        full_instance = EC2Instance(make_data(), None)
+        for rule in rules:
+            self.assertEqual(rule.condition.execute(self.instance),
+                             rule.condition.execute(full_instance), str(rule))
+        self.client.describe_instances.assert_not_called()
+
+    def test_loads_unreferenced_fields(self):
+        self.assertEqual(self.instance['ImageId'], 'ami-1')
+        self.assertEqual(self.instance['ImageId'], 'ami-1')
+        self.client.describe_instances.assert_called_once_with(InstanceIds=['i-1'])
+
+    def test_tags_without_loading(self):
+        self.instance.tag({'key': 'owner', 'value': 'me'})
+        self.client.create_tags.assert_called_once_with(
+            Resources=['i-1'], Tags=[{'Key': 'owner', 'Value': 'me'}]
+        )
+        self.assertEqual(self.instance['tag:owner'], 'me')
+        self.instance.delete({})
+        self.client.terminate_instances.assert_called_once_with(InstanceIds=['i-1'])
+        self.client.describe_instances.assert_not_called()
+
+    def test_marks_for_deletion_without_loading(self):
+        self.instance.mark_for_deletion({'after': 'in 3 days'})
+        self.assertIn('tag:SytheDeletionTime', self.instance)
+        self.client.create_tags.assert_called_once()
+        self.client.terminate_instances.assert_not_called()
+        self.client.describe_instances.assert_not_called()
+
+        self.instance.tags['SytheDeletionTime'] = '0'
+        self.instance.mark_for_deletion({'after': 'in 3 days'})
+        self.client.create_tags.assert_called_once()
+        self.client.terminate_instances.assert_called_once_with(InstanceIds=['i-1'])
+
+    def test_fails_to_load_terminated_instances(self):
+        self.client.describe_instances.return_value = {'Reservations': []}
+        with self.assertRaises(InstanceNotFoundError):
+            self.instance['ImageId']
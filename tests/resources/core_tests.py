@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock
 import sythe.resources.core as resources
+import sythe.resources.table as table
 import sythe.parsing.nodes as nodes
 from sythe.errors import InvalidArgumentError
 from sythe.errors import MissingArgumentError
@@ -55,6 +56,7 @@ class ConditionNodeTests(unittest.TestCase):
 
         for condition, expected in test_cases:
             self.assertEqual(resources.filter_resources(test_resources, condition), expected)
+            self.assertEqual(table.filter_resources_batch(test_resources, condition), expected)
 
 class ResourceTests(unittest.TestCase):
     def test_get_item_gets(self):
@@ -64,6 +64,22 @@ class GetEC2InstancesTests(unittest.TestCase):
             expected_output = [ec2_resources.EC2Instance(item, client) for sublist in instance_page for item in sublist]
             self.assertEqual(expected_output, instances)
 
+    def test_iter_yields_pages(self):
+        """
+        Tests that pages are yielded one at a time, as they're fetched
+        """
+        pages = [
+            [{'instance-id': 'an instance'}, {'instance-id': 'another instance'}],
+            [{'instance-id': 'a second page instance'}]
+        ]
+        client = MockEC2Client(pages)
+        client.describe_instances = MagicMock(side_effect=client.describe_instances)
+        instance_pages = ec2_resources.iter_ec2_instance_pages(client)
+        self.assertEqual(next(instance_pages), [ec2_resources.EC2Instance(item, client) for item in pages[0]])
+        self.assertEqual(client.describe_instances.call_count, 1)
+        self.assertEqual(next(instance_pages), [ec2_resources.EC2Instance(item, client) for item in pages[1]])
+        self.assertEqual(list(instance_pages), [])
+
 class EC2InstanceTests(unittest.TestCase):
     def test_augments_correctly(self):
         test_cases = [
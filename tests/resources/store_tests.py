@@ -0,0 +1,117 @@
+import random
+import unittest
+from unittest.mock import MagicMock
+import sythe.parsing.nodes as nodes
+import sythe.parsing.strings as strings
+from sythe.resources.store import IndexedRule, InventoryStore
+
+RULES = '''
+    ec2_instance(State.Name = "running" & tag:env = "dev") {}
+    ec2_instance(LaunchIndex > 1 & "running" = State.Name & LaunchIndex = 3) {}
+    ec2_instance(tag:env = "prod" | LaunchIndex < 2) {}
+    ec2_instance(tag:env = "qa" & tag:team = "a") {}
+    ec2_instance(tag:env in ["dev", "qa"] & LaunchIndex in [0, 1] & tag:team = "b") {}
+    ec2_instance(tag:env ~ "^d" & State.Name ~ "run") {}
+    ec2_instance(tag:team ~ "a|b" & LaunchIndex ~ "1") {}
+    ec2_instance(true) {}
+'''
+
+def generate_instances(count, seed=0):
+    rand = random.Random(seed)
+    return [{
+        'LaunchIndex': rand.randint(0, 3),
+        'State': {'Name': rand.choice(['running', 'stopped'])},
+        'tag:env': rand.choice(['dev', 'prod', 'qa', None]),
+        'tag:team': rand.choice(['a', 'b'])
+    } for _ in range(count)]
+
+class InventoryStoreTests(unittest.TestCase):
+    def test_index_maps_values_to_positions(self):
+        store = InventoryStore([{'a': 1}, {'a': 2}, {}, {'a': 1}])
+        self.assertEqual(store.index('a'), {1: [0, 3], 2: [1], None: [2]})
+
+    def test_indexes_are_built_once(self):
+        store = InventoryStore([{'a': 1}])
+        self.assertIs(store.index('a'), store.index('a'))
+        self.assertEqual(list(store.indexes), ['a'])
+
+    def test_unknown_types_are_not_indexed(self):
+        store = InventoryStore([{'a': 1}, {'a': [1]}])
+        self.assertIsNone(store.index('a'))
+        positions, unanswered = store.lookup([('a', [1])])
+        self.assertIsNone(positions)
+        self.assertEqual(unanswered, [('a', [1])])
+
+    def test_lookup_intersects_indexes(self):
+        store = InventoryStore([
+            {'a': 1, 'b': 'x'},
+            {'a': 2, 'b': 'x'},
+            {'a': 1, 'b': 'y'},
+            {'a': 1, 'b': 'x'}
+        ])
+        self.assertEqual(store.lookup([('a', [1]), ('b', ['x'])]), ([0, 3], []))
+        self.assertEqual(store.lookup([('a', [3]), ('b', ['x'])]), ([], []))
+        self.assertEqual(store.lookup([]), (None, []))
+
+    def test_lookup_unions_values(self):
+        store = InventoryStore([{'a': 1}, {'a': 2}, {'a': 3}, {'a': 1}])
+        self.assertEqual(store.lookup([('a', [1, 3, 4])]), ([0, 2, 3], []))
+        self.assertEqual(store.lookup([('a', [])]), ([], []))
+
+    def test_matches_patterns_once_per_value(self):
+        resources = [{'a': value} for value in ['web-1', 'db-1', 'web-2', 'xweb-3', 1, None,
+                                                'web-1', 'wea']]
+        store = InventoryStore(resources)
+        pattern = nodes.Pattern('^web-[0-9]')
+        pattern.regex = MagicMock(wraps=pattern.regex)
+        self.assertEqual(store.lookup([('a', pattern)]), ([0, 2, 6], []))
+        #Only the distinct values starting with the prefix are searched
+        self.assertEqual(pattern.regex.search.call_count, 2)
+        self.assertEqual(store.lookup([('a', nodes.Pattern('web'))]), ([0, 2, 3, 6], []))
+
+    def test_invalidate_drops_indexes(self):
+        resources = [{'a': 1}]
+        store = InventoryStore(resources)
+        store.index('a')
+        resources[0]['a'] = 2
+        store.invalidate()
+        self.assertEqual(store.index('a'), {2: [0]})
+
+class IndexedRuleTests(unittest.TestCase):
+    def test_selects_like_full_scan(self):
+        rules = strings.parse_rules_from_string(RULES)
+        instances = generate_instances(300)
+        store = InventoryStore(instances)
+        for rule in rules:
+            expected = [instance for instance in instances if rule.condition.execute(instance)]
+            self.assertEqual(IndexedRule(rule).select(store), expected, str(rule))
+
+    def test_only_indexes_looked_up_variables(self):
+        rule = strings.parse_rules_from_string(RULES)[1]
+        indexed_rule = IndexedRule(rule)
+        self.assertEqual(indexed_rule.lookups, [('State.Name', ['running']), ('LaunchIndex', [3])])
+        store = InventoryStore(generate_instances(10))
+        indexed_rule.select(store)
+        self.assertEqual(sorted(store.indexes), ['LaunchIndex', 'State.Name'])
+
+    def test_evaluates_only_candidates(self):
+        rule = strings.parse_rules_from_string(
+            'ec2_instance(State.Name = "running" & LaunchIndex > 1) {}'
+        )[0]
+        indexed_rule = IndexedRule(rule)
+        indexed_rule.evaluate_residual = MagicMock(return_value=True)
+        instances = [{'State': {'Name': name}} for name in ['running', 'stopped', 'running']]
+        self.assertEqual(indexed_rule.select(InventoryStore(instances)),
+                         [instances[0], instances[2]])
+        self.assertEqual(indexed_rule.evaluate_residual.call_count, 2)
+
+    def test_execute_invalidates_after_actions(self):
+        rule = strings.parse_rules_from_string(
+            'ec2_instance(State.Name = "running") { delete() }'
+        )[0]
+        resource = MagicMock()
+        resource.__getitem__.side_effect = {'State': {'Name': 'running'}}.__getitem__
+        store = InventoryStore([resource])
+        IndexedRule(rule).execute(store)
+        resource.delete.assert_called_once_with({})
+        self.assertEqual(store.indexes, {})
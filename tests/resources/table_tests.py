@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import MagicMock
+from sythe.resources.core import Resource
+from sythe.resources.table import ResourceTable
+
+class ResourceTableTests(unittest.TestCase):
+    def test_columns_are_built_once(self):
+        build = MagicMock(side_effect=lambda table: [record['a'] for record in table.records])
+        table = ResourceTable([{'a': 1}, {'a': 2}])
+        self.assertEqual(table.column('a', build), [1, 2])
+        self.assertEqual(table.column('a', build), [1, 2])
+        build.assert_called_once_with(table)
+
+    def test_subsets_reuse_columns(self):
+        build = MagicMock(side_effect=lambda table: [record['a'] for record in table.records])
+        table = ResourceTable([{'a': 1}, {'a': 2}, {'a': 3}])
+        table.column('a', build)
+        subset = table.subset([0, 2])
+        self.assertEqual(len(subset), 2)
+        self.assertEqual(subset.column('a', build), [1, 3])
+        build.assert_called_once_with(table)
+
+    def test_records_are_resource_data(self):
+        data = {'a': 1}
+        other = MagicMock()
+        table = ResourceTable([Resource(data, None), data, other])
+        self.assertIs(table.records[0], data)
+        self.assertIs(table.records[1], data)
+        self.assertIs(table.records[2], other)
+        self.assertFalse(table.records_are_dicts)
+        self.assertTrue(ResourceTable([Resource(data, None), data]).records_are_dicts)
+
+    def test_invalidate_drops_columns(self):
+        resources = [{'a': 1}]
+        table = ResourceTable(resources)
+        build = lambda table: [record['a'] for record in table.records]
+        table.column('a', build)
+        resources[0]['a'] = 2
+        table.invalidate()
+        self.assertEqual(table.column('a', build), [2])
+
+    def test_select_uses_mask(self):
+        table = ResourceTable(['a', 'b', 'c'])
+        self.assertEqual(table.select([True, None, 'x']), ['a', 'c'])
@@ -0,0 +1,80 @@
+import random
+import unittest
+import sythe.parsing.strings as strings
+from sythe.ruleset import RuleSet
+from sythe.resources.core import resource_action
+from sythe.resources.ec2_resources import EC2Instance
+
+RULES = '''
+    ec2_instance(State.Name = "running" & tag:env = "dev") {}
+    ec2_instance(State.Name = "running" & LaunchIndex > 1) {}
+    ec2_instance(LaunchIndex > 1 & State.Name = "running") {}
+    ec2_instance(State.Name = "running" & (tag:env = "dev" | LaunchIndex = 0)) {}
+    ec2_instance(tag:env = "prod" | LaunchIndex < 2) {}
+    ec2_instance(LaunchIndex > 2 & tag:env > 1) {}
+    ec2_instance(true) {}
+'''
+
+class RuleSetTests(unittest.TestCase):
+    def test_counts_deduplicated_predicates(self):
+        rule_set = RuleSet(strings.parse_rules_from_string(RULES))
+        #State.Name = "running" is repeated 3 times, and tag:env = "dev"
+        #and LaunchIndex > 1 are each repeated once
+        self.assertEqual(rule_set.predicate_count, 21)
+        self.assertEqual(rule_set.deduplicated, 5)
+
+    def test_matches_like_separate_rules(self):
+        rules = strings.parse_rules_from_string(RULES)
+        rule_set = RuleSet(rules)
+        rand = random.Random(0)
+        for _ in range(200):
+            instance = {
+                'LaunchIndex': rand.randint(0, 3),
+                'State': {'Name': rand.choice(['running', 'stopped'])},
+                'tag:env': rand.choice(['dev', 'prod', None])
+            }
+            expected = []
+            for rule in rules:
+                try:
+                    if rule.condition.execute(instance):
+                        expected.append(rule)
+                except TypeError:
+                    pass
+            try:
+                actual = rule_set.matching_rules(instance)
+            except TypeError:
+                #Separate rules are evaluated one at a time, so only
+                #the rule that can't be evaluated fails
+                continue
+            self.assertEqual(actual, expected, instance)
+
+    def test_executes_actions_of_matching_rules(self):
+        rule_set = RuleSet(strings.parse_rules_from_string('''
+            ec2_instance(State.Name = "running") { tag(key: "a", value: "1") }
+            ec2_instance(State.Name = "running" & LaunchIndex > 0) { tag(key: "b", value: "2") }
+            ec2_instance(State.Name = "stopped") { tag(key: "c", value: "3") }
+        '''))
+        calls = []
+        class FakeEC2Instance(EC2Instance):
+            @resource_action(['key', 'value'])
+            def tag(self, args):
+                calls.append((args['key'], args['value']))
+
+        rule_set.execute(FakeEC2Instance({'State': {'Name': 'running'}, 'LaunchIndex': 1}, None))
+        self.assertEqual(calls, [('a', '1'), ('b', '2')])
+
+    def test_later_rules_see_changes_made_by_earlier_actions(self):
+        rule_set = RuleSet(strings.parse_rules_from_string('''
+            ec2_instance(tag:stage = "marked" & LaunchIndex = 0) { tag(key: "early", value: "yes") }
+            ec2_instance(LaunchIndex = 1) { tag(key: "stage", value: "marked") }
+            ec2_instance(tag:stage = "marked" & State.Name = "running") { tag(key: "seen", value: "yes") }
+        '''))
+        calls = []
+        class FakeEC2Instance(EC2Instance):
+            @resource_action(['key', 'value'])
+            def tag(self, args):
+                calls.append((args['key'], args['value']))
+                self.data['tag:{}'.format(args['key'])] = args['value']
+
+        rule_set.execute(FakeEC2Instance({'State': {'Name': 'running'}, 'LaunchIndex': 1}, None))
+        self.assertEqual(calls, [('stage', 'marked'), ('seen', 'yes')])